@@ -0,0 +1,8 @@
+# Pipeline benchmarks on synthetic data
+"""
+Benchmarks of the pipeline on synthetic SCoRE-like data.
+
+Modules:
+    synthetic: Synthetic survey and CBS admin data
+    run: Benchmark runner and result comparison
+"""
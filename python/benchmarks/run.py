@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# =============================================================================
+# run.py - Pipeline Benchmarks
+# =============================================================================
+"""
+Time the pipeline's transforms, model fits and dashboard loaders on
+synthetic data at several scales, and compare runs between commits.
+
+Every benchmark is run --repeat times per scale, each repeat measured with
+a RunLog stage (wall time, CPU time, peak memory). Results are written to
+benchmarks/results/<timestamp>-<commit>.json together with the commit,
+library versions and the data shape, so runs on different commits can be
+compared with --compare.
+
+Usage (from the python/ directory):
+    python -m benchmarks.run                          # Default scales
+    python -m benchmarks.run --scales 8000 100000     # Respondents per scale
+    python -m benchmarks.run --only merge recode      # Matching benchmarks only
+    python -m benchmarks.run --compare BASE.json      # BASE vs latest result
+    python -m benchmarks.run --compare BASE.json NEW.json
+
+Functions:
+    run_benchmarks: Time every benchmark at every scale
+    write_results: Write results and run metadata as JSON
+    compare_results: Median wall times of two result files side by side
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BENCHMARK_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent))
+
+from benchmarks.synthetic import make_dataset
+from src.instrument import RunLog, count_rows
+from run_pipeline import PIPELINE_MODULES
+
+# Where result files are written
+RESULTS_DIR = BENCHMARK_DIR / "results"
+
+# Respondents per scale; 8,000 is the size of the 2017 SCoRE wave
+DEFAULT_SCALES = [8_000, 50_000, 200_000]
+
+# Model fits are skipped above this many respondents (they dominate the run)
+FIT_MAX_ROWS = 50_000
+
+# Columns the dashboard pages read (Data Explorer / Geographic View)
+DASHBOARD_COLUMNS = [
+    "DV_single", "age", "sex", "education", "employment_status",
+    "buurt_id", "wijk_id", "gemeente_id", "b_perc_low40_hh",
+]
+
+
+# =============================================================================
+# Benchmark Definitions
+# =============================================================================
+
+def _prepare_inputs(survey: pd.DataFrame, admin: pd.DataFrame, work_dir: Path) -> Dict:
+    """Run the pipeline once (untimed) to build every benchmark's input."""
+    from src.transform import (
+        create_geo_ids, prepare_admin_by_level, recode_survey_variables,
+        create_inequality_indices, add_geographic_names_from_admin,
+        standardize_context_vars
+    )
+    from src.merge import merge_survey_admin, create_analysis_sample
+    from src.storage import save_analysis_data
+
+    inputs = {"survey": survey, "admin": admin}
+    inputs["survey_geo"] = create_geo_ids(survey)
+    inputs["admin_by_level"] = prepare_admin_by_level(admin)
+    inputs["merged"] = merge_survey_admin(inputs["survey_geo"], inputs["admin_by_level"])
+    recoded = recode_survey_variables(inputs["merged"])
+    with_names = add_geographic_names_from_admin(create_inequality_indices(recoded), admin)
+    inputs["with_names"] = with_names
+    inputs["final"] = standardize_context_vars(with_names, level_tables=inputs["admin_by_level"])
+    inputs["sample"] = create_analysis_sample(inputs["final"], include_occupation=False)
+
+    inputs["parquet_path"] = save_analysis_data(inputs["final"], work_dir / "analysis.parquet")
+    inputs["csv_path"] = save_analysis_data(inputs["final"], work_dir / "analysis.csv")
+    return inputs
+
+
+def _dashboard_helpers() -> Optional[Dict[str, Callable]]:
+    """The dashboard's data helpers without their Streamlit cache, if importable."""
+    try:
+        from dashboard.utils import data_loader
+    except ImportError:
+        return None
+    # st.cache_data keeps the undecorated function as __wrapped__
+    return {
+        name: getattr(getattr(data_loader, name), "__wrapped__", getattr(data_loader, name))
+        for name in ["get_summary_stats", "get_filtered_data"]
+    }
+
+
+def define_benchmarks(
+    inputs: Dict,
+    fits: bool = True,
+    n_jobs: int = 1
+) -> List[Tuple[str, Callable[[], object]]]:
+    """
+    Benchmarks as (name, zero-argument callable) pairs.
+
+    Parameters
+    ----------
+    inputs : dict
+        Inputs built by _prepare_inputs
+    fits : bool
+        Include the model fits
+    n_jobs : int
+        Worker processes for the model fits
+
+    Returns
+    -------
+    list of tuple
+        Benchmarks in pipeline order
+    """
+    from src.transform import (
+        create_geo_ids, prepare_admin_by_level, recode_survey_variables,
+        standardize_context_vars, decompose_between_within
+    )
+    from src.merge import merge_survey_admin
+    from src.storage import load_analysis_data
+
+    benchmarks = [
+        ("create_geo_ids", lambda: create_geo_ids(inputs["survey"])),
+        ("prepare_admin_by_level", lambda: prepare_admin_by_level(inputs["admin"])),
+        ("merge_survey_admin",
+         lambda: merge_survey_admin(inputs["survey_geo"], inputs["admin_by_level"])),
+        ("recode_survey_variables", lambda: recode_survey_variables(inputs["merged"])),
+        ("standardize_context_vars",
+         lambda: standardize_context_vars(inputs["with_names"])),
+        ("standardize_context_vars/unit_within_gemeente",
+         lambda: standardize_context_vars(
+             inputs["with_names"], weighting="unit",
+             level_tables=inputs["admin_by_level"], center_within="gemeente"
+         )),
+        ("decompose_between_within",
+         lambda: decompose_between_within(
+             inputs["final"], levels=["buurt_id", "wijk_id", "gemeente_id"]
+         )),
+    ]
+
+    if fits:
+        from src.analyze import (
+            fit_two_level_models, fit_four_level_models, run_sensitivity,
+            test_h3_cross_level_interaction
+        )
+        benchmarks += [
+            ("fit_two_level_models",
+             lambda: fit_two_level_models(inputs["sample"], n_jobs=n_jobs)),
+            ("fit_four_level_models",
+             lambda: fit_four_level_models(inputs["final"], n_jobs=n_jobs)),
+            ("run_sensitivity", lambda: run_sensitivity(inputs["final"], n_jobs=n_jobs)),
+            ("test_h3_cross_level_interaction",
+             lambda: test_h3_cross_level_interaction(inputs["final"])),
+        ]
+
+    columns = [c for c in DASHBOARD_COLUMNS if c in inputs["final"].columns]
+    benchmarks += [
+        ("dashboard/load_parquet", lambda: load_analysis_data(inputs["parquet_path"])),
+        ("dashboard/load_parquet_columns",
+         lambda: load_analysis_data(inputs["parquet_path"], columns=columns)),
+        ("dashboard/load_csv", lambda: load_analysis_data(inputs["csv_path"])),
+    ]
+
+    helpers = _dashboard_helpers()
+    if helpers is not None:
+        gemeenten = inputs["final"]["gemeente_id"].dropna().astype(str).unique()[:10].tolist()
+        benchmarks += [
+            ("dashboard/summary_stats", lambda: helpers["get_summary_stats"](inputs["final"])),
+            ("dashboard/filtered_data",
+             lambda: helpers["get_filtered_data"](inputs["final"], gemeente_filter=gemeenten)),
+        ]
+    return benchmarks
+
+
+# =============================================================================
+# Running
+# =============================================================================
+
+def _run_scale(
+    n: int,
+    work_dir: Path,
+    repeat: int,
+    only: Optional[List[str]],
+    fits: bool,
+    n_jobs: int,
+    hierarchy: Dict[str, int],
+    seed: int
+) -> List[Dict]:
+    """Time the benchmarks at one scale; returns one record per repetition."""
+    start = time.perf_counter()
+    survey, admin = make_dataset(n, seed=seed, **hierarchy)
+    with contextlib.redirect_stdout(io.StringIO()):
+        inputs = _prepare_inputs(survey, admin, work_dir)
+    print(f"  Data: {len(admin):,} admin units, prepared in "
+          f"{time.perf_counter() - start:.1f}s")
+
+    records = []
+    for name, func in define_benchmarks(inputs, fits=fits, n_jobs=n_jobs):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        run_log = RunLog()
+        for _ in range(repeat):
+            with run_log.activate(), contextlib.redirect_stdout(io.StringIO()):
+                with run_log.stage(name) as record:
+                    record.rows_out = count_rows(func())
+        # Model fits also record per-model sub-stages; keep the benchmark's own
+        timed = [r for r in run_log.records if r.stage == name]
+        for i, r in enumerate(timed):
+            records.append({
+                "benchmark": name, "n_respondents": n, "repeat": i,
+                "wall_seconds": r.wall_seconds, "cpu_seconds": r.cpu_seconds,
+                "peak_rss_mb": r.peak_rss_mb, "rows_out": r.rows_out,
+            })
+        wall = np.median([r.wall_seconds for r in timed])
+        print(f"  {name:<34} {wall:8.3f}s (median of {len(timed)})")
+    return records
+
+
+def run_benchmarks(
+    scales: List[int] = DEFAULT_SCALES,
+    repeat: int = 3,
+    only: Optional[List[str]] = None,
+    fit_max_rows: int = FIT_MAX_ROWS,
+    n_jobs: int = 1,
+    hierarchy: Optional[Dict[str, int]] = None,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Time every benchmark at every scale.
+
+    Parameters
+    ----------
+    scales : list of int
+        Number of respondents per scale
+    repeat : int
+        Timed repetitions per benchmark and scale
+    only : list of str, optional
+        Run only benchmarks whose name contains one of these strings
+    fit_max_rows : int
+        Skip the model fits at scales above this many respondents
+    n_jobs : int
+        Worker processes for the model fits
+    hierarchy : dict, optional
+        n_gemeenten / wijken_per_gemeente / buurten_per_wijk for make_dataset
+    seed : int
+        Random seed of the synthetic data
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per repetition: benchmark, n_respondents, repeat,
+        wall_seconds, cpu_seconds, peak_rss_mb, rows_out
+    """
+    hierarchy = hierarchy or {}
+    records = []
+
+    # Stages import their dependencies lazily; load them up front so the
+    # first benchmark of a run does not include import time
+    for module in PIPELINE_MODULES:
+        with contextlib.suppress(ImportError):
+            importlib.import_module(module)
+
+    for n in scales:
+        print(f"\nScale: {n:,} respondents")
+        with tempfile.TemporaryDirectory() as tmp:
+            records.extend(_run_scale(n, Path(tmp), repeat, only, n <= fit_max_rows,
+                                      n_jobs, hierarchy, seed))
+
+    return pd.DataFrame(records)
+
+
+# =============================================================================
+# Results
+# =============================================================================
+
+def _git_commit() -> str:
+    """Short commit hash of the working tree, "+dirty" if it has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BENCHMARK_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}+dirty" if dirty else commit
+
+
+def write_results(
+    results: pd.DataFrame,
+    settings: Dict,
+    output_dir: Path = RESULTS_DIR
+) -> Path:
+    """
+    Write benchmark results and run metadata as JSON.
+
+    Returns
+    -------
+    Path
+        Path of the result file (<timestamp>-<commit>.json)
+    """
+    import scipy
+    import statsmodels
+
+    commit = _git_commit()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{datetime.now():%Y%m%d-%H%M%S}-{commit.replace('+', '-')}.json"
+
+    with open(path, "w") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "versions": {
+                "numpy": np.__version__, "pandas": pd.__version__,
+                "scipy": scipy.__version__, "statsmodels": statsmodels.__version__,
+            },
+            "settings": settings,
+            "results": results.to_dict("records"),
+        }, f, indent=2, default=float)
+
+    print(f"\nResults written to {path}")
+    return path
+
+
+def _load_results(path: Path) -> Tuple[str, pd.DataFrame]:
+    with open(path) as f:
+        content = json.load(f)
+    return content["commit"], pd.DataFrame(content["results"])
+
+
+def compare_results(base_path: Path, new_path: Optional[Path] = None) -> pd.DataFrame:
+    """
+    Median wall times of two result files side by side.
+
+    Parameters
+    ----------
+    base_path : Path
+        Result file of the baseline run
+    new_path : Path, optional
+        Result file to compare (default: the newest file in RESULTS_DIR)
+
+    Returns
+    -------
+    pd.DataFrame
+        benchmark, n_respondents, base and new median seconds, and
+        speedup (base / new)
+    """
+    if new_path is None:
+        candidates = sorted(RESULTS_DIR.glob("*.json"))
+        if not candidates:
+            raise FileNotFoundError(f"No benchmark results in {RESULTS_DIR}")
+        new_path = candidates[-1]
+
+    base_commit, base = _load_results(base_path)
+    new_commit, new = _load_results(new_path)
+
+    keys = ["benchmark", "n_respondents"]
+    medians = [
+        df.groupby(keys, sort=False)["wall_seconds"].median().rename(label)
+        for df, label in [(base, "base_seconds"), (new, "new_seconds")]
+    ]
+    table = pd.concat(medians, axis=1, join="inner").reset_index()
+    table["speedup"] = table["base_seconds"] / table["new_seconds"]
+
+    print(f"Benchmarks: {base_commit} (base) vs {new_commit} (new)")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return table
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline on synthetic SCoRE-like data"
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="Respondents per scale")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed repetitions per benchmark")
+    parser.add_argument("--only", nargs="+", metavar="PATTERN",
+                        help="Run only benchmarks whose name contains PATTERN")
+    parser.add_argument("--fit-max-rows", type=int, default=FIT_MAX_ROWS,
+                        help="Skip model fits above this many respondents")
+    parser.add_argument("--n-jobs", type=int, default=1,
+                        help="Worker processes for the model fits")
+    parser.add_argument("--gemeenten", type=int, default=380,
+                        help="Number of gemeenten")
+    parser.add_argument("--wijken-per-gemeente", type=int, default=8)
+    parser.add_argument("--buurten-per-wijk", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--compare", type=Path, nargs="+", metavar="RESULT",
+                        help="Compare BASE [NEW] result files instead of running")
+
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_results(*args.compare[:2])
+        return
+
+    hierarchy = {
+        "n_gemeenten": args.gemeenten,
+        "wijken_per_gemeente": args.wijken_per_gemeente,
+        "buurten_per_wijk": args.buurten_per_wijk,
+    }
+    results = run_benchmarks(
+        scales=args.scales, repeat=args.repeat, only=args.only,
+        fit_max_rows=args.fit_max_rows, n_jobs=args.n_jobs,
+        hierarchy=hierarchy, seed=args.seed
+    )
+    write_results(results, {
+        "scales": args.scales, "repeat": args.repeat, "only": args.only,
+        "fit_max_rows": args.fit_max_rows, "n_jobs": args.n_jobs,
+        "seed": args.seed, **hierarchy,
+    }, args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
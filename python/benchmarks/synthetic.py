@@ -0,0 +1,216 @@
+# =============================================================================
+# synthetic.py - Synthetic SCoRE / CBS Data for Benchmarks
+# =============================================================================
+"""
+Synthetic survey and CBS admin data with a realistic geographic hierarchy.
+
+The admin table has the layout of the CBS "Kerncijfers wijken en buurten"
+file the pipeline reads: one row per gemeente, wijk and buurt with a
+BU/WK/GM region code, names and the raw CBS indicator columns. Codes
+follow the CBS scheme (wijk = gemeente * 100 + w, buurt = wijk * 100 + b).
+
+Survey respondents are drawn over the buurten in proportion to their
+population, so respondents per buurt are skewed as in the real wave, and
+the attitude items carry a buurt-level random effect so the multilevel
+models have variance to estimate. Defaults match the 2018 hierarchy
+(380 gemeenten, ~8 wijken per gemeente, ~4 buurten per wijk).
+
+Functions:
+    make_admin: Synthetic CBS indicator table
+    make_survey: Synthetic survey rows, as load_survey_data returns them
+    make_dataset: Survey and admin data of a given size
+"""
+
+import pandas as pd
+import numpy as np
+from typing import Tuple
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import SURVEY_COLUMNS, SURVEY_YEAR
+from src.transform import ADMIN_COLUMN_RENAME
+
+
+# Integer survey items: English name -> (lowest, highest) code
+SURVEY_ITEM_RANGES = {
+    "educlvl": (1, 7),
+    "educyrs": (6, 22),
+    "work_status": (1, 8),
+    "employee_type": (1, 3),
+    "org_type": (1, 2),
+    "has_supervisory": (0, 1),
+    "occupation_class": (1, 8),
+    "owns_home": (0, 1),
+    "owns_property": (0, 1),
+    "has_savings": (0, 1),
+    "owns_stocks": (0, 1),
+    "no_assets": (0, 1),
+    "born_in_nl": (0, 1),
+    "father_dutch": (0, 1),
+    "mother_dutch": (0, 1),
+}
+
+# Attitude items (1-7, 8 = don't know)
+ATTITUDE_ITEMS = ["gov_int", "red_inc_diff", "union_pref"]
+
+
+# =============================================================================
+# Admin Data
+# =============================================================================
+
+def make_admin(
+    n_gemeenten: int = 380,
+    wijken_per_gemeente: int = 8,
+    buurten_per_wijk: int = 4,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Synthetic CBS indicator table for a complete hierarchy.
+
+    Parameters
+    ----------
+    n_gemeenten : int
+        Number of gemeenten (at most 9999)
+    wijken_per_gemeente : int
+        Wijken in every gemeente (at most 100)
+    buurten_per_wijk : int
+        Buurten in every wijk (at most 100)
+    seed : int
+        Random seed
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per unit: region_code, WijkenEnBuurten, gemeente_name and
+        the raw CBS indicator columns
+    """
+    if not 0 < n_gemeenten <= 9999:
+        raise ValueError(f"n_gemeenten must be in 1..9999, got {n_gemeenten}")
+    if not (0 < wijken_per_gemeente <= 100 and 0 < buurten_per_wijk <= 100):
+        raise ValueError("wijken_per_gemeente and buurten_per_wijk must be in 1..100")
+
+    rng = np.random.default_rng(seed)
+
+    gemeente = np.arange(1, n_gemeenten + 1, dtype=np.int64)
+    wijk = (gemeente[:, None] * 100 + np.arange(wijken_per_gemeente)).ravel()
+    buurt = (wijk[:, None] * 100 + np.arange(buurten_per_wijk)).ravel()
+
+    codes = np.concatenate([gemeente, wijk, buurt])
+    prefixes = np.repeat(["GM", "WK", "BU"], [len(gemeente), len(wijk), len(buurt)])
+    widths = np.repeat([4, 6, 8], [len(gemeente), len(wijk), len(buurt)])
+    region_code = [f"{p}{c:0{w}d}" for p, c, w in zip(prefixes, codes, widths)]
+    unit_names = {"GM": "Gemeente", "WK": "Wijk", "BU": "Buurt"}
+
+    gemeente_of = np.concatenate([gemeente, wijk // 100, buurt // 10000])
+    admin = pd.DataFrame({
+        "region_code": region_code,
+        "WijkenEnBuurten": [f"{unit_names[p]} {c}" for p, c in zip(prefixes, codes)],
+        "gemeente_name": [f"Gemeente {g}" for g in gemeente_of],
+    })
+
+    # Indicators: positive, skewed, and correlated within a gemeente
+    n = len(admin)
+    gemeente_level = rng.normal(0, 0.3, n_gemeenten)[gemeente_of - 1]
+    for col in ADMIN_COLUMN_RENAME:
+        admin[col] = np.round(rng.gamma(4.0, 5.0, n) * np.exp(gemeente_level), 1)
+    # A few suppressed (missing) values, as CBS publishes for small units
+    for col in ADMIN_COLUMN_RENAME:
+        admin.loc[rng.random(n) < 0.02, col] = np.nan
+    return admin
+
+
+# =============================================================================
+# Survey Data
+# =============================================================================
+
+def make_survey(
+    n_respondents: int,
+    admin: pd.DataFrame,
+    missing_geo: float = 0.03,
+    seed: int = 0
+) -> pd.DataFrame:
+    """
+    Synthetic survey rows for the buurten of an admin table.
+
+    Parameters
+    ----------
+    n_respondents : int
+        Number of respondents
+    admin : pd.DataFrame
+        Table from make_admin; respondents are drawn over its buurten in
+        proportion to their population
+    missing_geo : float
+        Share of respondents without a Buurtcode
+    seed : int
+        Random seed
+
+    Returns
+    -------
+    pd.DataFrame
+        The SURVEY_COLUMNS (English names) and respondent_id
+    """
+    rng = np.random.default_rng(seed + 1)
+    n = n_respondents
+
+    is_buurt = admin["region_code"].str.startswith("BU").to_numpy()
+    buurt_codes = admin.loc[is_buurt, "region_code"].str[2:].astype(np.int64).to_numpy()
+    population = admin.loc[is_buurt, "AantalInwoners_5"].fillna(1.0).to_numpy()
+
+    # Respondents per buurt follow the population (skewed cluster sizes)
+    buurt_pos = rng.choice(len(buurt_codes), size=n, p=population / population.sum())
+    buurt_effect = rng.normal(0, 0.5, len(buurt_codes))[buurt_pos]
+
+    columns = {}
+    for item in ATTITUDE_ITEMS:
+        values = np.clip(np.round(4 + buurt_effect + rng.normal(0, 1.5, n)), 1, 7)
+        values[rng.random(n) < 0.02] = 8
+        columns[item] = values
+    columns["sex"] = rng.choice([1.0, 2.0, 3.0], size=n, p=[0.49, 0.49, 0.02])
+    columns["birth_year"] = rng.integers(SURVEY_YEAR - 85, SURVEY_YEAR - 17, n).astype(float)
+    for item, (low, high) in SURVEY_ITEM_RANGES.items():
+        columns[item] = rng.integers(low, high + 1, n).astype(float)
+
+    buurtcode = buurt_codes[buurt_pos].astype(float)
+    buurtcode[rng.random(n) < missing_geo] = np.nan
+    columns["Buurtcode"] = buurtcode
+    columns["weight"] = rng.gamma(8.0, 1 / 8.0, n)
+
+    # Same columns and order as load_survey_data
+    survey = pd.DataFrame({
+        name: columns[name] for name in SURVEY_COLUMNS.values() if name in columns
+    })
+    survey["respondent_id"] = np.arange(1, n + 1)
+    return survey
+
+
+def make_dataset(
+    n_respondents: int,
+    n_gemeenten: int = 380,
+    wijken_per_gemeente: int = 8,
+    buurten_per_wijk: int = 4,
+    missing_geo: float = 0.03,
+    seed: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Synthetic survey and admin data.
+
+    Parameters
+    ----------
+    n_respondents : int
+        Number of survey respondents
+    n_gemeenten, wijken_per_gemeente, buurten_per_wijk : int
+        Shape of the geographic hierarchy (see make_admin)
+    missing_geo : float
+        Share of respondents without a Buurtcode
+    seed : int
+        Random seed; equal arguments give identical data
+
+    Returns
+    -------
+    tuple of pd.DataFrame
+        (survey, admin), as load_survey_data and load_admin_data return them
+    """
+    admin = make_admin(n_gemeenten, wijken_per_gemeente, buurten_per_wijk, seed)
+    survey = make_survey(n_respondents, admin, missing_geo, seed)
+    return survey, admin
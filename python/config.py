@@ -20,10 +20,23 @@ DATA_DIR = PROJECT_ROOT / "data"
 RAW_DIR = DATA_DIR / "raw"
 PROCESSED_DIR = DATA_DIR / "processed"
 
+# Cached pipeline stage results (see src/cache.py)
+CACHE_DIR = DATA_DIR / "cache"
+
+# Directory for memory-mapped admin level tables (None = keep in memory)
+ADMIN_MMAP_DIR = None
+
+# Local multi-year CBS indicator store (see src/cbs_store.py)
+CBS_STORE_DIR = DATA_DIR / "cbs"
+
 # Output directories
 OUTPUT_DIR = PROJECT_ROOT / "outputs"
 TABLES_DIR = OUTPUT_DIR / "tables"
 FIGURES_DIR = OUTPUT_DIR / "figures"
+MULTIVERSE_DIR = OUTPUT_DIR / "multiverse"
+
+# Stage timing / memory logs of pipeline runs (see src/instrument.py)
+RUN_LOG_DIR = OUTPUT_DIR / "runs"
 
 # =============================================================================
 # Data File Paths
@@ -36,7 +49,11 @@ SURVEY_PATH = RAW_DIR / "score.dta"
 ADMIN_PATH = RAW_DIR / "indicators_buurt_wijk_gemeente.csv"
 
 # Output paths
-PROCESSED_DATA_PATH = PROCESSED_DIR / "analysis_ready.csv"
+# The Parquet file is the pipeline's primary artifact (typed columns,
+# categorical geo IDs); the CSV is a plain-text export for other tools.
+PROCESSED_DATA_PATH = PROCESSED_DIR / "analysis_ready.parquet"
+PROCESSED_CSV_PATH = PROCESSED_DIR / "analysis_ready.csv"
+MERGED_DATA_PATH = PROCESSED_DIR / "merged.parquet"
 REGRESSION_TABLE_PATH = TABLES_DIR / "regression_table.html"
 
 # =============================================================================
@@ -53,6 +70,15 @@ CBS_TABLE_ID = "84286NED"
 # Year filter for CBS data (Perioden column)
 CBS_YEAR = "2018"
 
+# "Kerncijfers wijken en buurten" table per year, for the local store
+CBS_TABLES = {
+    2017: "83765NED",
+    2018: "84286NED",
+    2019: "84583NED",
+    2020: "84799NED",
+    2021: "85039NED",
+}
+
 # =============================================================================
 # Survey Configuration
 # =============================================================================
@@ -60,45 +86,120 @@ CBS_YEAR = "2018"
 # Survey year (for calculating age from birth year)
 SURVEY_YEAR = 2017
 
-# Column mappings: Stata variable names -> English names
-SURVEY_COLUMNS = {
+# Rows per chunk when reading the Stata file (None = read in one pass).
+# Only the SURVEY_COLUMNS are read either way.
+SURVEY_CHUNK_SIZE = None
+
+# Survey codebook: English name -> how the variable is stored in the .dta file
+#   source:  Stata variable name
+#   labels:  code -> label of categorical variables
+#   valid:   (lowest, highest) valid code or value, for validate_raw_data
+#   missing: codes meaning "don't know" / refused, set to missing when recoding
+#   dtype:   dtype after recoding
+# A new wave with a different codebook only needs changes here.
+SURVEY_CODEBOOK = {
     # Dependent variables (redistribution attitudes, 1-7 scale)
-    "a27_1": "gov_int",        # Government should intervene to reduce inequality
-    "a27_2": "red_inc_diff",   # Government should reduce income differences
-    "a27_3": "union_pref",     # Government should support unions
+    "gov_int": {         # Government should intervene to reduce inequality
+        "source": "a27_1", "valid": (1, 7), "missing": [8]},
+    "red_inc_diff": {    # Government should reduce income differences
+        "source": "a27_2", "valid": (1, 7), "missing": [8]},
+    "union_pref": {      # Government should support unions
+        "source": "a27_3", "valid": (1, 7), "missing": [8]},
 
     # Demographics
-    "b01": "sex",              # 1=Male, 2=Female, 3=Other
-    "b02": "birth_year",       # Year of birth
-    "b03": "educlvl",          # Education level (categorical)
-    "b04": "educyrs",          # Years of education
+    "sex": {
+        "source": "b01", "labels": {1: "Male", 2: "Female", 3: "Other"}},
+    "birth_year": {"source": "b02", "valid": (1900, SURVEY_YEAR)},
+    "educlvl": {"source": "b03"},                     # Education level (categorical)
+    "educyrs": {"source": "b04", "valid": (0, 30)},   # Years of education
 
     # Employment
-    "b07": "work_status",      # Employment status
-    "b09": "employee_type",    # Employee, self-employed, family business
-    "b10": "org_type",         # Organization type (public/private sector)
-    "b11": "has_supervisory",  # Has supervisory responsibility
-    "b13": "occupation_class", # NS-SEC occupation classification
+    "work_status": {
+        "source": "b07",
+        "labels": {
+            1: "Employed", 2: "Self-employed", 3: "Unemployed", 4: "Student",
+            5: "Retired", 6: "Homemaker", 7: "Disabled", 8: "Other",
+        },
+    },
+    "employee_type": {"source": "b09"},   # Employee, self-employed, family business
+    "org_type": {"source": "b10"},        # Organization type (public/private sector)
+    "has_supervisory": {"source": "b11", "valid": (0, 1)},
+    "occupation_class": {                 # NS-SEC occupation classification
+        "source": "b13",
+        "labels": {
+            1: "Modern professional", 2: "Clerical", 3: "Senior manager",
+            4: "Technical", 5: "Semi-routine manual", 6: "Routine manual",
+            7: "Middle manager", 8: "Traditional professional",
+        },
+    },
 
     # Asset ownership (income/wealth proxy for H3)
-    "b14_1": "owns_home",      # Owns home (eigen huis)
-    "b14_2": "owns_property",  # Owns other real estate
-    "b14_3": "has_savings",    # Has savings account
-    "b14_4": "owns_stocks",    # Owns stocks/bonds
-    "b14_5": "no_assets",      # None of these
+    "owns_home": {"source": "b14_1", "valid": (0, 1)},       # Owns home (eigen huis)
+    "owns_property": {"source": "b14_2", "valid": (0, 1)},   # Owns other real estate
+    "has_savings": {"source": "b14_3", "valid": (0, 1)},     # Has savings account
+    "owns_stocks": {"source": "b14_4", "valid": (0, 1)},     # Owns stocks/bonds
+    "no_assets": {"source": "b14_5", "valid": (0, 1)},       # None of these
 
     # Migration background
-    "b18": "born_in_nl",       # Born in Netherlands (1=Yes, 0=No)
-    "b20": "father_dutch",     # Father born in NL
-    "b21": "mother_dutch",     # Mother born in NL
+    "born_in_nl": {"source": "b18", "valid": (0, 1), "dtype": "float64"},
+    "father_dutch": {"source": "b20", "valid": (0, 1)},      # Father born in NL
+    "mother_dutch": {"source": "b21", "valid": (0, 1)},      # Mother born in NL
 
-    # Geographic identifier
-    "Buurtcode": "Buurtcode",  # 8-digit neighborhood code
+    # Geographic identifier (8-digit neighborhood code)
+    "Buurtcode": {"source": "Buurtcode"},
 
     # Weights
-    "weegfac": "weight",       # Survey weight
+    "weight": {"source": "weegfac"},
 }
 
+# Column mappings: Stata variable names -> English names
+SURVEY_COLUMNS = {spec["source"]: name for name, spec in SURVEY_CODEBOOK.items()}
+
+# Measures derived by recode_survey_variables, in order (see src/recode.py)
+#   rescale: map range (low, high) linearly onto to (low, high)
+#   affine:  (x - subtract) / divide * multiply + add
+#   mean / sum: row mean / sum over "of" (sum: missing as 0, available columns)
+#   labels:  categorical from the codebook labels of "from" (or "labels_of");
+#            categories "all" keeps every label in codebook order, otherwise
+#            the observed labels, sorted
+#   zscore:  standardize over the sample
+#   at_least / isin: 0/1 indicator
+#   map:     code -> number
+SURVEY_MEASURES = [
+    # Dependent variables: 1-7 agreement -> 0-100 redistribution support
+    {"name": "DV_single", "op": "rescale", "from": "red_inc_diff",
+     "range": (1, 7), "to": (0, 100)},
+    {"name": "DV_2item", "op": "mean", "of": ["gov_int", "red_inc_diff"]},
+    {"name": "DV_2item_scaled", "op": "rescale", "from": "DV_2item",
+     "range": (1, 7), "to": (0, 100)},
+    {"name": "DV_3item", "op": "mean", "of": ["gov_int", "red_inc_diff", "union_pref"]},
+    {"name": "DV_3item_scaled", "op": "rescale", "from": "DV_3item",
+     "range": (1, 7), "to": (0, 100)},
+
+    # Demographics
+    {"name": "sex", "op": "labels", "from": "sex", "categories": "all"},
+    {"name": "age_raw", "op": "affine", "from": "birth_year",
+     "multiply": -1, "add": SURVEY_YEAR},
+    {"name": "age", "op": "zscore", "from": "age_raw"},
+    {"name": "education", "op": "zscore", "from": "educyrs"},
+
+    # Employment
+    {"name": "employment_status", "op": "labels", "from": "work_status"},
+    {"name": "occupation", "op": "labels", "from": "work_type",
+     "labels_of": "occupation_class"},
+
+    # Wealth / class proxies for the H3 moderation test
+    {"name": "wealth_index", "op": "sum",
+     "of": ["owns_home", "owns_property", "has_savings", "owns_stocks"]},
+    {"name": "high_wealth", "op": "at_least", "from": "wealth_index", "threshold": 2},
+    # Higher class = professional/managerial occupations
+    {"name": "professional_class", "op": "isin", "from": "occupation_class",
+     "codes": [1, 3, 7, 8]},
+    # Class ranking (1 = senior management ... 8 = routine)
+    {"name": "occupation_rank", "op": "map", "from": "occupation_class",
+     "values": {3: 1, 8: 2, 1: 3, 7: 4, 4: 5, 2: 6, 5: 7, 6: 8}},
+]
+
 # =============================================================================
 # Model Specification
 # =============================================================================
@@ -141,8 +242,63 @@ INCLUDE_OCCUPATION = True
 # Minimum cluster size for multilevel models
 MIN_CLUSTER_SIZE = 2
 
+# Worker processes for model fitting (1 = sequential, -1 = all cores)
+N_JOBS = 1
+
+# Start each model in a nested sequence from the previous model's variance
+# components instead of the default starting values
+WARM_START = True
+
+# Estimator for the random-intercept models:
+#   "reml"        - closed-form REML from cluster sufficient statistics (fast)
+#   "statsmodels" - statsmodels MixedLM
+MIXED_ENGINE = "reml"
+
+# Standardization of the context (b_/w_/g_) variables:
+#   "respondent" - mean and SD over respondents (units weighted by size)
+#   "unit"       - mean and SD over units, each buurt/wijk/gemeente once
+STANDARDIZE_WEIGHTING = "respondent"
+
+# Center context variables on the mean of this higher level before scaling
+# (e.g. "gemeente": buurt and wijk variables as deviations from their
+# gemeente mean); None = center on the overall mean
+STANDARDIZE_CENTER_WITHIN = None
+
+# Individual variables split into their cluster mean (<var>_between) and
+# the deviation from it (<var>_within), for contextual-effect models
+DECOMPOSE_VARIABLES = ["age", "education", "wealth_index"]
+
+# Cluster ID columns for that split (buurt_id, wijk_id and/or gemeente_id)
+DECOMPOSE_LEVELS = [GROUPING_VAR]
+
+# Survey rows per chunk in merge_survey_admin_chunked
+MERGE_CHUNK_SIZE = 250_000
+
+# Specifications per checkpoint in the multiverse analysis
+MULTIVERSE_BATCH_SIZE = 100
+
 # VIF threshold for multicollinearity warning
 VIF_THRESHOLD = 5.0
 
 # Confidence level for intervals
 CONFIDENCE_LEVEL = 0.95
+
+# Cluster (buurt) bootstrap replicates for the two-level models (0 = skip)
+BOOTSTRAP_REPS = 0
+
+# Seed for the bootstrap random number streams
+BOOTSTRAP_SEED = 20170
+
+# =============================================================================
+# Output Options
+# =============================================================================
+
+# Also write the processed data as CSV (PROCESSED_CSV_PATH)
+WRITE_CSV_EXPORT = True
+
+# Store the processed data with compact column types: int8 items and flags,
+# float32 indicators, categorical IDs and names (see src/dtypes.py)
+OPTIMIZE_DTYPES = True
+
+# Largest relative rounding error accepted for a float32 column
+DTYPE_FLOAT32_RTOL = 1e-6
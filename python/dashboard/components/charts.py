@@ -428,7 +428,7 @@ def create_geographic_treemap(
         Plotly figure object
     """
     # Aggregate counts
-    geo_counts = df.groupby(['gemeente_id', 'wijk_id']).size().reset_index(name='count')
+    geo_counts = df.groupby(['gemeente_id', 'wijk_id'], observed=True).size().reset_index(name='count')
     geo_counts['gemeente_id'] = geo_counts['gemeente_id'].astype(str)
     geo_counts['wijk_id'] = geo_counts['wijk_id'].astype(str)
 
@@ -481,7 +481,7 @@ def create_cluster_size_histogram(
     go.Figure
         Plotly figure object
     """
-    cluster_sizes = df.groupby(group_col).size()
+    cluster_sizes = df.groupby(group_col, observed=True).size()
 
     fig = px.histogram(
         cluster_sizes,
@@ -476,7 +476,7 @@ with tab_corr:
     else:
         st.markdown("#### Correlation Matrix (Buurt-level variables)")
 
-        buurt_numeric = filtered_df[col_info['buurt']].select_dtypes(include=['float64', 'int64'])
+        buurt_numeric = filtered_df[col_info['buurt']].select_dtypes(include='number')
         if len(buurt_numeric.columns) > 0:
             corr_matrix = buurt_numeric.corr().round(2)
             st.dataframe(corr_matrix, use_container_width=True)
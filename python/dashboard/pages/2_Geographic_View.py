@@ -157,19 +157,19 @@ col1, col2, col3 = st.columns(3)
 
 with col1:
     # Respondents per gemeente
-    resp_per_gemeente = df.groupby('gemeente_id').size()
+    resp_per_gemeente = df.groupby('gemeente_id', observed=True).size()
     st.metric("Avg. Respondents per Gemeente", f"{resp_per_gemeente.mean():.1f}")
     st.metric("Min - Max", f"{resp_per_gemeente.min()} - {resp_per_gemeente.max()}")
 
 with col2:
     # Respondents per wijk
-    resp_per_wijk = df.groupby('wijk_id').size()
+    resp_per_wijk = df.groupby('wijk_id', observed=True).size()
     st.metric("Avg. Respondents per Wijk", f"{resp_per_wijk.mean():.1f}")
     st.metric("Min - Max", f"{resp_per_wijk.min()} - {resp_per_wijk.max()}")
 
 with col3:
     # Respondents per buurt
-    resp_per_buurt = df.groupby('buurt_id').size()
+    resp_per_buurt = df.groupby('buurt_id', observed=True).size()
     st.metric("Avg. Respondents per Buurt", f"{resp_per_buurt.mean():.1f}")
     st.metric("Min - Max", f"{resp_per_buurt.min()} - {resp_per_buurt.max()}")
 
@@ -179,15 +179,15 @@ st.markdown("### Nesting Ratios")
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    wijken_per_gemeente = df.groupby('gemeente_id')['wijk_id'].nunique()
+    wijken_per_gemeente = df.groupby('gemeente_id', observed=True)['wijk_id'].nunique()
     st.metric("Avg. Wijken per Gemeente", f"{wijken_per_gemeente.mean():.1f}")
 
 with col2:
-    buurten_per_wijk = df.groupby('wijk_id')['buurt_id'].nunique()
+    buurten_per_wijk = df.groupby('wijk_id', observed=True)['buurt_id'].nunique()
     st.metric("Avg. Buurten per Wijk", f"{buurten_per_wijk.mean():.1f}")
 
 with col3:
-    buurten_per_gemeente = df.groupby('gemeente_id')['buurt_id'].nunique()
+    buurten_per_gemeente = df.groupby('gemeente_id', observed=True)['buurt_id'].nunique()
     st.metric("Avg. Buurten per Gemeente", f"{buurten_per_gemeente.mean():.1f}")
 
 # =============================================================================
@@ -304,7 +304,7 @@ tab_top_gem, tab_top_wijk, tab_top_buurt = st.tabs([
 ])
 
 with tab_top_gem:
-    top_gemeenten = df.groupby('gemeente_id').agg(
+    top_gemeenten = df.groupby('gemeente_id', observed=True).agg(
         n_respondents=('respondent_id', 'count'),
         n_wijken=('wijk_id', 'nunique'),
         n_buurten=('buurt_id', 'nunique'),
@@ -316,7 +316,7 @@ with tab_top_gem:
     st.dataframe(top_gemeenten, use_container_width=True, hide_index=True)
 
 with tab_top_wijk:
-    top_wijken = df.groupby(['gemeente_id', 'wijk_id']).agg(
+    top_wijken = df.groupby(['gemeente_id', 'wijk_id'], observed=True).agg(
         n_respondents=('respondent_id', 'count'),
         n_buurten=('buurt_id', 'nunique'),
         mean_dv=('DV_single', 'mean')
@@ -327,7 +327,7 @@ with tab_top_wijk:
     st.dataframe(top_wijken, use_container_width=True, hide_index=True)
 
 with tab_top_buurt:
-    top_buurten = df.groupby(['gemeente_id', 'wijk_id', 'buurt_id']).agg(
+    top_buurten = df.groupby(['gemeente_id', 'wijk_id', 'buurt_id'], observed=True).agg(
         n_respondents=('respondent_id', 'count'),
         mean_dv=('DV_single', 'mean'),
         mean_key_pred=('b_perc_low40_hh', 'mean')
@@ -23,6 +23,8 @@ PYTHON_DIR = DASHBOARD_DIR.parent
 REPO_ROOT = PYTHON_DIR.parent  # Root of the repository
 sys.path.insert(0, str(PYTHON_DIR))
 
+from src.storage import load_analysis_data as read_analysis_data
+
 # Precomputed results path (always available) - check multiple locations
 def _find_precomputed_path() -> Path:
     """Find the precomputed results JSON file."""
@@ -41,22 +43,26 @@ PRECOMPUTED_RESULTS_PATH = _find_precomputed_path()
 
 # Data path - check multiple locations for flexibility
 # Priority: 1) repo root data/, 2) python/data/, 3) config path
+# Within each location the Parquet file is preferred over the CSV export
+DATA_FILENAMES = ["analysis_ready.parquet", "analysis_ready.csv"]
+
 def _find_data_path() -> Path:
     """Find the analysis data file in various possible locations."""
     # Get current working directory (works better on Streamlit Cloud)
     cwd = Path.cwd()
 
-    possible_paths = [
+    possible_dirs = [
         # From current working directory (Streamlit Cloud typically runs from repo root)
-        cwd / "data" / "processed" / "analysis_ready.csv",
+        cwd / "data" / "processed",
         # From __file__ relative paths
-        REPO_ROOT / "data" / "processed" / "analysis_ready.csv",  # Repo root
-        PYTHON_DIR / "data" / "processed" / "analysis_ready.csv",  # Python folder
-        DASHBOARD_DIR / "data" / "analysis_ready.csv",  # Dashboard folder
+        REPO_ROOT / "data" / "processed",  # Repo root
+        PYTHON_DIR / "data" / "processed",  # Python folder
+        DASHBOARD_DIR / "data",  # Dashboard folder
         # Try going up from cwd
-        cwd.parent / "data" / "processed" / "analysis_ready.csv",
-        cwd.parent.parent / "data" / "processed" / "analysis_ready.csv",
+        cwd.parent / "data" / "processed",
+        cwd.parent.parent / "data" / "processed",
     ]
+    possible_paths = [d / name for d in possible_dirs for name in DATA_FILENAMES]
 
     for path in possible_paths:
         if path.exists():
@@ -114,18 +120,22 @@ def get_demo_mode_message() -> str:
 # =============================================================================
 
 @st.cache_data(ttl=3600)
-def load_analysis_data() -> Optional[pd.DataFrame]:
+def load_analysis_data(columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
     """
     Load the analysis-ready dataset with caching.
 
+    Parameters
+    ----------
+    columns : List[str], optional
+        Columns to load. With the Parquet file only these are read from disk.
+
     Returns
     -------
     pd.DataFrame or None
         The merged and transformed analysis dataset, or None if not available
     """
     if Path(PROCESSED_DATA_PATH).exists():
-        df = pd.read_csv(PROCESSED_DATA_PATH)
-        return df
+        return read_analysis_data(PROCESSED_DATA_PATH, columns=columns)
     return None
 
 
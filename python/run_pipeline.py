@@ -13,9 +13,18 @@ This script runs the complete ETL and analysis pipeline:
 5. ANALYZE: Fit multilevel models, calculate ICC, run diagnostics
 6. REPORT: Generate tables and summary report
 
+Stage results are cached in data/cache/, keyed by their inputs, the
+relevant config.py settings and the stage source code, so a rerun only
+recomputes stages that were invalidated.
+
 Usage:
     python run_pipeline.py              # Use local data files
     python run_pipeline.py --use-api    # Download fresh CBS data
+    python run_pipeline.py --no-cache   # Recompute every stage
+    python run_pipeline.py --n-jobs 4   # Fit models in 4 worker processes
+    python run_pipeline.py --profile    # Also cProfile every stage
+    python run_pipeline.py --refresh-cbs  # Download missing CBS years to data/cbs/
+    python run_pipeline.py --import-report  # Show module import times
     python run_pipeline.py --help       # Show options
 """
 
@@ -29,22 +38,71 @@ sys.path.insert(0, str(PROJECT_ROOT))
 
 from config import (
     SURVEY_PATH, ADMIN_PATH, USE_CBS_API,
-    PROCESSED_DATA_PATH, REGRESSION_TABLE_PATH,
-    OUTPUT_DIR, TABLES_DIR
+    PROCESSED_DATA_PATH, PROCESSED_CSV_PATH, WRITE_CSV_EXPORT,
+    REGRESSION_TABLE_PATH, OUTPUT_DIR, TABLES_DIR, N_JOBS, BOOTSTRAP_REPS,
+    RUN_LOG_DIR, OPTIMIZE_DTYPES
 )
 
 
-def main(use_cbs_api: bool = False, include_occupation: bool = True):
+def main(
+    use_cbs_api: bool = False,
+    include_occupation: bool = True,
+    use_cache: bool = True,
+    n_jobs: int = N_JOBS,
+    multiverse: bool = False,
+    bootstrap: int = BOOTSTRAP_REPS,
+    profile: bool = False
+):
     """
     Run the complete analysis pipeline.
 
+    Every stage is timed (wall time, CPU time, peak memory, rows) and the
+    run log is written to outputs/runs/.
+
     Parameters
     ----------
     use_cbs_api : bool
         If True, download fresh data from CBS API
     include_occupation : bool
         If True, require occupation in analysis sample
+    use_cache : bool
+        If True, reuse cached stage results whose inputs are unchanged
+    n_jobs : int
+        Worker processes for model fitting (1 = sequential, -1 = all cores)
+    multiverse : bool
+        If True, also run the (resumable) multiverse analysis
+    bootstrap : int
+        Cluster bootstrap replicates for the two-level models (0 = skip)
+    profile : bool
+        If True, also dump a cProfile of every stage to outputs/runs/
     """
+    from src.instrument import RunLog
+
+    run_log = RunLog()
+    if profile:
+        run_log.profile_dir = RUN_LOG_DIR / f"profile-{run_log.started:%Y%m%d-%H%M%S}"
+
+    with run_log.activate():
+        report = _run_stages(
+            run_log, use_cbs_api, include_occupation, use_cache,
+            n_jobs, multiverse, bootstrap
+        )
+
+    print("\n" + run_log.summary())
+    run_log.write(RUN_LOG_DIR)
+    return report
+
+
+def _run_stages(
+    run_log,
+    use_cbs_api: bool,
+    include_occupation: bool,
+    use_cache: bool,
+    n_jobs: int,
+    multiverse: bool,
+    bootstrap: int
+):
+    """Pipeline body of main(); every stage is recorded in run_log."""
     print("=" * 60)
     print("REDISTRIBUTION PREFERENCES ANALYSIS PIPELINE")
     print("=" * 60)
@@ -53,7 +111,7 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     from src.extract import load_survey_data, load_admin_data, validate_raw_data
     from src.transform import (
         create_geo_ids, prepare_admin_by_level,
-        recode_survey_variables, standardize_context_vars,
+        recode_survey_variables, standardize_context_vars, decompose_between_within,
         create_inequality_indices, add_geographic_names_from_admin
     )
     from src.merge import (
@@ -68,6 +126,12 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
         test_h3_cross_level_interaction
     )
     from src.report import create_model_table, generate_report
+    from src.storage import save_analysis_data
+    from src.dtypes import optimize_dtypes
+    from src.cache import StageCache
+
+    cache = StageCache(enabled=use_cache, run_log=run_log)
+    stage = run_log.run
 
     # =========================================================================
     # PHASE 1: EXTRACT
@@ -76,9 +140,13 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print("PHASE 1: EXTRACT")
     print("=" * 60)
 
-    survey_raw = load_survey_data(SURVEY_PATH)
-    admin_raw = load_admin_data(ADMIN_PATH, use_api=use_cbs_api)
-    validation = validate_raw_data(survey_raw, admin_raw)
+    survey_raw = cache.run("load_survey", load_survey_data, SURVEY_PATH)
+    if use_cbs_api:
+        # Fresh downloads are never served from the cache
+        admin_raw = stage("load_admin", load_admin_data, ADMIN_PATH, use_api=True)
+    else:
+        admin_raw = cache.run("load_admin", load_admin_data, ADMIN_PATH)
+    validation = stage("validate_raw", validate_raw_data, survey_raw, admin_raw)
 
     if not validation["passed"]:
         print("\nWarning: Raw data validation failed. Continuing anyway...")
@@ -90,8 +158,8 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print("PHASE 2: TRANSFORM (Geographic IDs)")
     print("=" * 60)
 
-    survey_with_geo = create_geo_ids(survey_raw)
-    admin_by_level = prepare_admin_by_level(admin_raw)
+    survey_with_geo = cache.run("create_geo_ids", create_geo_ids, survey_raw)
+    admin_by_level = cache.run("prepare_admin", prepare_admin_by_level, admin_raw)
 
     # =========================================================================
     # PHASE 3: MERGE
@@ -100,10 +168,10 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print("PHASE 3: MERGE")
     print("=" * 60)
 
-    merged_data = merge_survey_admin(survey_with_geo, admin_by_level)
-    merge_validation = validate_merge(merged_data)
-    missingness = analyze_missingness(merged_data)
-    matched_comparison = compare_matched_unmatched(merged_data)
+    merged_data = cache.run("merge", merge_survey_admin, survey_with_geo, admin_by_level)
+    merge_validation = stage("validate_merge", validate_merge, merged_data)
+    missingness = stage("missingness", analyze_missingness, merged_data)
+    matched_comparison = stage("matched_comparison", compare_matched_unmatched, merged_data)
 
     # =========================================================================
     # PHASE 4: TRANSFORM (Recode)
@@ -112,11 +180,19 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print("PHASE 4: TRANSFORM (Recode & Standardize)")
     print("=" * 60)
 
-    data_recoded = recode_survey_variables(merged_data)
-    data_with_indices = create_inequality_indices(data_recoded)
-    data_with_names = add_geographic_names_from_admin(data_with_indices, admin_raw)
-    data_final = standardize_context_vars(data_with_names)
-    analysis_sample = create_analysis_sample(data_final, include_occupation)
+    data_recoded = cache.run("recode", recode_survey_variables, merged_data)
+    data_with_indices = cache.run("indices", create_inequality_indices, data_recoded)
+    data_with_names = cache.run(
+        "geo_names", add_geographic_names_from_admin, data_with_indices, admin_raw
+    )
+    data_final = cache.run(
+        "standardize", standardize_context_vars, data_with_names, level_tables=admin_by_level
+    )
+    analysis_sample = cache.run(
+        "analysis_sample", create_analysis_sample, data_final, include_occupation
+    )
+    # Cluster means over the sample the models are fitted on
+    analysis_sample = cache.run("decompose", decompose_between_within, analysis_sample)
 
     # =========================================================================
     # PHASE 5: ANALYZE (Two-Level Models)
@@ -125,13 +201,22 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print("PHASE 5a: ANALYZE (Two-Level Buurt Models)")
     print("=" * 60)
 
-    models = fit_two_level_models(analysis_sample)
-    icc_results = calculate_icc(models)
-    diagnostics = run_diagnostics(models, analysis_sample)
-    sensitivity = run_sensitivity(data_final)
+    models = cache.run(
+        "two_level_models", fit_two_level_models, analysis_sample, n_jobs=n_jobs
+    )
+    icc_results = stage("icc", calculate_icc, models)
+    diagnostics = stage("diagnostics", run_diagnostics, models, analysis_sample)
+    sensitivity = cache.run("sensitivity", run_sensitivity, data_final, n_jobs=n_jobs)
+
+    bootstrap_results = None
+    if bootstrap > 0:
+        from src.bootstrap import bootstrap_two_level
+        bootstrap_results = cache.run(
+            "bootstrap", bootstrap_two_level, models, n_boot=bootstrap, n_jobs=n_jobs
+        )
 
     # H3 Test: Cross-level interaction (individual income moderation)
-    h3_results = test_h3_cross_level_interaction(data_final)
+    h3_results = cache.run("h3_test", test_h3_cross_level_interaction, data_final)
 
     # =========================================================================
     # PHASE 5b: ANALYZE (Four-Level Models)
@@ -145,13 +230,26 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     four_level_icc = None
     if all(col in data_final.columns for col in ["wijk_id", "gemeente_id"]):
         try:
-            four_level_models = fit_four_level_models(data_final)
-            four_level_icc = calculate_four_level_icc(four_level_models)
+            four_level_models = cache.run(
+                "four_level_models", fit_four_level_models, data_final, n_jobs=n_jobs
+            )
+            four_level_icc = stage("four_level_icc", calculate_four_level_icc, four_level_models)
         except Exception as e:
             print(f"  Warning: Four-level models failed: {e}")
     else:
         print("  Skipping: wijk_id or gemeente_id not available")
 
+    # =========================================================================
+    # PHASE 5c: ANALYZE (Multiverse, optional)
+    # =========================================================================
+    if multiverse:
+        print("\n" + "=" * 60)
+        print("PHASE 5c: ANALYZE (Multiverse / Specification Curve)")
+        print("=" * 60)
+
+        from src.multiverse import run_multiverse
+        stage("multiverse", run_multiverse, data_final, n_jobs=n_jobs)
+
     # =========================================================================
     # PHASE 6: REPORT
     # =========================================================================
@@ -165,15 +263,18 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     (OUTPUT_DIR / "figures").mkdir(exist_ok=True)
 
     # Generate two-level model table
-    create_model_table(models, REGRESSION_TABLE_PATH)
+    stage("model_table", create_model_table, models, REGRESSION_TABLE_PATH,
+          bootstrap=bootstrap_results)
 
     # Generate four-level model table if available
     if four_level_models is not None:
         from src.report import create_four_level_table
         four_level_table_path = TABLES_DIR / "regression_table_four_level.html"
-        create_four_level_table(four_level_models, four_level_table_path)
+        stage("four_level_table", create_four_level_table,
+              four_level_models, four_level_table_path)
 
-    report = generate_report(
+    report = stage(
+        "report", generate_report,
         models=models,
         icc_results=icc_results,
         diagnostics=diagnostics,
@@ -182,10 +283,16 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
         output_path=OUTPUT_DIR / "analysis_report.txt"
     )
 
-    # Save final data
-    PROCESSED_DATA_PATH.parent.mkdir(parents=True, exist_ok=True)
-    data_final.to_csv(PROCESSED_DATA_PATH, index=False)
-    print(f"\nFinal data saved to: {PROCESSED_DATA_PATH}")
+    # Save final data (Parquet is the primary artifact, CSV an export).
+    # Models above use the float64 frame; the Parquet file (read by the
+    # dashboard) stores compact dtypes.
+    print("\nSaving final data...")
+    data_stored = data_final
+    if OPTIMIZE_DTYPES:
+        data_stored = cache.run("optimize_dtypes", optimize_dtypes, data_final)
+    stage("save_parquet", save_analysis_data, data_stored, PROCESSED_DATA_PATH)
+    if WRITE_CSV_EXPORT:
+        stage("save_csv", save_analysis_data, data_final, PROCESSED_CSV_PATH)
 
     # =========================================================================
     # SUMMARY
@@ -198,10 +305,46 @@ def main(use_cbs_api: bool = False, include_occupation: bool = True):
     print(f"ICC: {report.icc:.4f}")
     print(f"Key coefficient: {report.key_coef:.3f} (SE={report.key_se:.3f})")
     print(f"\nOutputs saved to: {OUTPUT_DIR}")
+    if use_cache:
+        print(cache.summary())
 
     return report
 
 
+# Dependencies and pipeline modules, in the order a full run loads them
+PIPELINE_MODULES = [
+    "numpy", "pandas", "pyarrow", "scipy.stats", "statsmodels.formula.api",
+    "src.extract", "src.transform", "src.merge", "src.analyze", "src.reml",
+    "src.report", "src.storage", "src.dtypes", "src.cache",
+]
+
+
+def report_import_times():
+    """
+    Print how long each pipeline dependency and module takes to import.
+
+    Modules are imported in load order, so each time covers only what that
+    module adds on top of the ones before it. For a full tree, run
+    python -X importtime run_pipeline.py ...
+    """
+    import importlib
+    import time
+
+    print("Import times (incremental, in load order):")
+    total = 0.0
+    for name in PIPELINE_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            note = ""
+        except ImportError:
+            note = "  (not installed)"
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"  {name:<26} {elapsed * 1000:8.1f} ms{note}")
+    print(f"  {'total':<26} {total * 1000:8.1f} ms")
+
+
 def test_cbs_api():
     """Test CBS API connection."""
     print("Testing CBS API connection...")
@@ -251,6 +394,57 @@ if __name__ == "__main__":
         help="Exclude occupation from analysis (keeps more cases)"
     )
 
+    parser.add_argument(
+        "--n-jobs",
+        type=int,
+        default=N_JOBS,
+        help="Worker processes for model fitting (-1 = all cores)"
+    )
+
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=BOOTSTRAP_REPS,
+        metavar="N",
+        help="Cluster bootstrap replicates for the two-level models (0 = skip)"
+    )
+
+    parser.add_argument(
+        "--multiverse",
+        action="store_true",
+        help="Also run the multiverse analysis (results in outputs/multiverse/)"
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Dump a cProfile of every stage next to the run log (outputs/runs/)"
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Recompute every stage instead of reusing cached results"
+    )
+
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Delete cached stage results and exit"
+    )
+
+    parser.add_argument(
+        "--refresh-cbs",
+        action="store_true",
+        help="Download CBS tables missing from the local store (CBS_TABLES) and exit"
+    )
+
+    parser.add_argument(
+        "--import-report",
+        action="store_true",
+        help="Print import times of the pipeline modules and exit"
+    )
+
     parser.add_argument(
         "--test-api",
         action="store_true",
@@ -259,11 +453,30 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    if args.import_report:
+        report_import_times()
+        sys.exit(0)
+
     if args.test_api:
         success = test_cbs_api()
         sys.exit(0 if success else 1)
 
+    if args.refresh_cbs:
+        from src.cbs_store import CBSStore
+        CBSStore().refresh()
+        sys.exit(0)
+
+    if args.clear_cache:
+        from src.cache import StageCache
+        StageCache().clear()
+        sys.exit(0)
+
     main(
         use_cbs_api=args.use_api,
-        include_occupation=not args.no_occupation
+        include_occupation=not args.no_occupation,
+        use_cache=not args.no_cache,
+        n_jobs=args.n_jobs,
+        multiverse=args.multiverse,
+        bootstrap=args.bootstrap,
+        profile=args.profile
     )
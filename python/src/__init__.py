@@ -9,6 +9,29 @@ Modules:
     merge: Multi-level data merging and validation
     analyze: Multilevel statistical models and diagnostics
     report: Output generation (tables and figures)
+
+Submodules are imported on first attribute access (``src.analyze``), so
+importing the package itself loads no third-party libraries.
 """
 
+import importlib
+
 __version__ = "1.0.0"
+
+_SUBMODULES = {
+    "extract", "transform", "merge", "analyze", "report", "reml",
+    "bootstrap", "multiverse", "storage", "cache", "geography",
+    "geoindex", "cbs_store", "instrument", "recode", "dtypes",
+}
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f"{__name__}.{name}")
+        globals()[name] = module
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES)
@@ -5,23 +5,34 @@
 Functions for multilevel modeling, ICC calculation, and diagnostics.
 
 Functions:
+    fit_model_specs: Fit a list of model specifications (optionally in parallel)
     fit_two_level_models: Fit sequence of random-intercept models
     calculate_icc: Calculate intraclass correlation
+    compute_vif: Variance inflation factors from the inverse correlation matrix
     run_diagnostics: VIF, residual stats, random effects
+    run_specification_grid: Fit a declarative list of robustness specifications
     run_sensitivity: Robustness checks with alternative specifications
+    simple_slopes: Slopes of an interaction over a moderator grid, with SEs
+    johnson_neyman: Region of significance of an interaction
 """
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
-from scipy import stats
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import re
+import os
+import time
 import warnings
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import VIF_THRESHOLD, CONFIDENCE_LEVEL
+from config import VIF_THRESHOLD, CONFIDENCE_LEVEL, N_JOBS, WARM_START, MIXED_ENGINE
+from src.instrument import active_log, count_rows
+from src.reml import fit_nested_random_intercepts
 
 
 # =============================================================================
@@ -47,6 +58,28 @@ class FourLevelModels:
     m4_wijk_controls: Any   # + wijk-level controls
 
 
+@dataclass
+class ModelSpec:
+    """Specification of one random-intercept model."""
+    name: str           # Short name, e.g. "m2"
+    formula: str        # Patsy formula for the fixed part
+    description: str = ""
+    groups: Any = "buurt_id"   # Column, or nested columns outermost first
+
+
+@dataclass
+class SensitivitySpec:
+    """One robustness specification for run_specification_grid."""
+    label: str                          # Row label in the results table
+    dv: str = "DV_single"
+    key_var: str = "b_perc_low40_hh"
+    controls: List[str] = field(default_factory=list)
+    extra_terms: List[str] = field(default_factory=list)  # e.g. "a:b"
+    query: Optional[str] = None         # Sample filter (DataFrame.query)
+    report_terms: Dict[str, str] = field(default_factory=dict)  # term -> label
+    min_n: int = 0                      # Skip if fewer complete cases
+
+
 @dataclass
 class ICCResult:
     """Intraclass correlation results."""
@@ -69,11 +102,274 @@ class DiagnosticsResult:
     n_obs: int
 
 
+# =============================================================================
+# Model Fitting Helpers
+# =============================================================================
+
+# Data frame shared by all fits in a worker process (set by _init_fit_worker)
+_WORKER_DATA: Optional[pd.DataFrame] = None
+
+
+def _resolve_n_jobs(n_jobs: int, n_tasks: int) -> int:
+    """Number of worker processes to use (n_jobs=-1 means all cores)."""
+    if n_jobs is None or n_jobs == 0:
+        n_jobs = 1
+    if n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    return max(1, min(n_jobs, n_tasks))
+
+
+def _init_fit_worker(data: pd.DataFrame) -> None:
+    """Process-pool initializer: receive the shared data once per worker."""
+    global _WORKER_DATA
+    _WORKER_DATA = data
+    warnings.filterwarnings("ignore", category=RuntimeWarning)
+    warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def _fit_spec(
+    spec: ModelSpec,
+    data: pd.DataFrame,
+    start_cov_re: Optional[np.ndarray] = None,
+    engine: str = MIXED_ENGINE
+):
+    """
+    Fit a single random-intercept model by REML (see _fit_spec_engine).
+
+    The result carries fit_seconds and fit_cpu_seconds, measured where the
+    fit ran (possibly a worker process), for the run log.
+    """
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = _fit_spec_engine(spec, data, start_cov_re, engine)
+    result.fit_seconds = time.perf_counter() - wall
+    result.fit_cpu_seconds = time.process_time() - cpu
+    return result
+
+
+def _fit_spec_engine(
+    spec: ModelSpec,
+    data: pd.DataFrame,
+    start_cov_re: Optional[np.ndarray],
+    engine: str
+):
+    """
+    Fit a single random-intercept model by REML.
+
+    engine="reml" uses the closed-form estimator in src/reml.py;
+    engine="statsmodels" uses MixedLM. If spec.groups is a list (outermost
+    level first), the reml engine fits nested random intercepts and
+    MixedLM uses the innermost level. Both profile the fixed effects and
+    residual variance out of the REML criterion, so the optimizer only
+    searches over the random-intercept variance relative to the residual
+    variance. `start_cov_re` (the `cov_re_unscaled` of an earlier fit)
+    starts that search close to the optimum; a statsmodels warm start that
+    fails to converge is refitted from the default starting values. If the
+    reml engine hits a singular matrix, the model is refitted with MixedLM.
+    """
+    nested = isinstance(spec.groups, (list, tuple))
+
+    if engine == "reml":
+        levels = list(spec.groups) if nested else [spec.groups]
+        start = None
+        if start_cov_re is not None:
+            start = np.diag(np.atleast_2d(np.asarray(start_cov_re, dtype=float)))
+            if len(start) != len(levels):
+                start = None
+        try:
+            result = fit_nested_random_intercepts(spec.formula, data, levels, start)
+        except np.linalg.LinAlgError as e:
+            # Singular design the closed form cannot handle: use MixedLM
+            print(f"    {spec.name}: reml engine failed ({e}); refitting with statsmodels")
+            return _fit_spec_engine(spec, data, None, "statsmodels")
+        result.warm_started = start is not None
+        return result
+
+    if engine != "statsmodels":
+        raise ValueError(f"Unknown engine '{engine}' (use 'reml' or 'statsmodels')")
+
+    import statsmodels.formula.api as smf
+    from statsmodels.regression.mixed_linear_model import MixedLMParams
+
+    # MixedLM gets the innermost level only
+    groups = spec.groups[-1] if nested else spec.groups
+    model = smf.mixedlm(spec.formula, data=data, groups=groups)
+
+    start_params = None
+    if start_cov_re is not None:
+        start_params = MixedLMParams.from_components(
+            fe_params=np.zeros(model.k_fe),
+            cov_re=np.atleast_2d(start_cov_re)
+        )
+
+    result = model.fit(reml=True, start_params=start_params, full_output=True)
+    if start_params is not None and not result.converged:
+        result = model.fit(reml=True, full_output=True)
+        start_params = None
+
+    result.warm_started = start_params is not None
+    result.n_iter = _count_iterations(result)
+    return result
+
+
+def _fit_spec_task(job: tuple, data: pd.DataFrame):
+    """Pool task wrapper around _fit_spec for (spec, start_cov_re, engine)."""
+    spec, start_cov_re, engine = job
+    return _fit_spec(spec, data, start_cov_re, engine)
+
+
+def _count_iterations(result) -> int:
+    """Optimizer iterations used by a MixedLM fit (from full_output=True)."""
+    n_iter = 0
+    for retvals in result.hist or []:
+        if "allvecs" in retvals:
+            n_iter += len(retvals["allvecs"]) - 1
+        else:
+            # Failed runs do not keep their path; count gradient evaluations
+            n_iter += retvals.get("iterations", retvals.get("gcalls", 0))
+    return n_iter
+
+
+def _report_iterations(specs: List[ModelSpec], results: List[Any]) -> None:
+    """Print optimizer iteration counts; record the fits in the active run log."""
+    counts = ", ".join(
+        f"{spec.name}={getattr(res, 'n_iter', '?')}"
+        + ("*" if getattr(res, "warm_started", False) else "")
+        for spec, res in zip(specs, results)
+    )
+    print(f"    Optimizer iterations: {counts} (* = warm start)")
+
+    run_log = active_log()
+    if run_log is not None:
+        for spec, res in zip(specs, results):
+            run_log.add_substage(spec.name, getattr(res, "fit_seconds", float("nan")),
+                                 getattr(res, "fit_cpu_seconds", None), count_rows(res))
+
+
+def _run_in_worker(job: tuple):
+    """Run task(item, shared_data) inside a worker process."""
+    task, item = job
+    return task(item, _WORKER_DATA)
+
+
+@contextmanager
+def _shared_data_pool(data: pd.DataFrame, n_workers: int):
+    """
+    Yield a map(task, items) function that applies task(item, data) in order.
+
+    With more than one worker the items are distributed over a process
+    pool whose workers each receive `data` once, and the pool stays open
+    for repeated map calls until the context exits. `task` must be a
+    module-level function so it can be sent to the workers.
+    """
+    if n_workers <= 1:
+        yield lambda task, items: [task(item, data) for item in items]
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        initializer=_init_fit_worker,
+        initargs=(data,)
+    ) as pool:
+        yield lambda task, items: list(
+            pool.map(_run_in_worker, [(task, item) for item in items])
+        )
+
+
+def _map_with_shared_data(
+    task,
+    items: list,
+    data: pd.DataFrame,
+    n_workers: int
+) -> list:
+    """Apply task(item, data) to every item, in order (see _shared_data_pool)."""
+    with _shared_data_pool(data, n_workers) as map_tasks:
+        return map_tasks(task, items)
+
+
+def fit_model_specs(
+    data: pd.DataFrame,
+    specs: List[ModelSpec],
+    n_jobs: int = N_JOBS,
+    warm_start: bool = WARM_START,
+    engine: str = MIXED_ENGINE
+) -> List[Any]:
+    """
+    Fit a list of model specifications on a shared data frame.
+
+    With n_jobs > 1 the specifications are fitted concurrently in a process
+    pool. Each worker receives the data once (via the pool initializer),
+    not once per model. Results are always returned in the order of specs.
+
+    With warm_start, each model starts the optimizer from the variance
+    components of the model before it (sequential fitting), or from those
+    of the first model when fitting in parallel. For nested sequences
+    that differ by a few fixed effects this saves most of the iterations.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Model data used by every specification
+    specs : list of ModelSpec
+        Models to fit
+    n_jobs : int
+        Number of worker processes (1 = fit in this process, -1 = all cores)
+    warm_start : bool
+        Start from the variance components of an earlier model
+    engine : str
+        "reml" (closed-form estimator) or "statsmodels" (MixedLM)
+
+    Returns
+    -------
+    list
+        Fitted results (RandomInterceptResults or MixedLMResults), one per
+        specification
+    """
+    n_workers = _resolve_n_jobs(n_jobs, len(specs))
+
+    if n_workers == 1:
+        results = []
+        start_cov_re = None
+        for spec in specs:
+            print(f"  Fitting {spec.name} ({spec.description})...")
+            result = _fit_spec(spec, data, start_cov_re, engine)
+            results.append(result)
+            if warm_start:
+                start_cov_re = result.cov_re_unscaled
+        _report_iterations(specs, results)
+        return results
+
+    results = []
+    start_cov_re = None
+    if warm_start:
+        # The first model seeds the warm start for all the others
+        print(f"  Fitting {specs[0].name} ({specs[0].description})...")
+        results.append(_fit_spec(specs[0], data, engine=engine))
+        start_cov_re = results[0].cov_re_unscaled
+
+    remaining = specs[len(results):]
+    n_workers = _resolve_n_jobs(n_jobs, len(remaining))
+    print(f"  Fitting {', '.join(spec.name for spec in remaining)} "
+          f"in parallel ({n_workers} workers)...")
+    results += _map_with_shared_data(
+        _fit_spec_task,
+        [(spec, start_cov_re, engine) for spec in remaining],
+        data,
+        n_workers
+    )
+    _report_iterations(specs, results)
+    return results
+
+
 # =============================================================================
 # Multilevel Model Fitting
 # =============================================================================
 
-def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
+def fit_two_level_models(
+    data: pd.DataFrame,
+    n_jobs: int = N_JOBS,
+    warm_start: bool = WARM_START,
+    engine: str = MIXED_ENGINE
+) -> TwoLevelModels:
     """
     Fit sequence of two-level random intercept models.
 
@@ -83,18 +379,25 @@ def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
     - m2: + individual controls
     - m3: + buurt-level controls
 
+    The models do not depend on each other, so with n_jobs > 1 they are
+    fitted concurrently (see fit_model_specs).
+
     Parameters
     ----------
     data : pd.DataFrame
         Analysis sample with required variables
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+    warm_start : bool
+        Start each model from the previous model's variance components
+    engine : str
+        "reml" (closed-form estimator) or "statsmodels" (MixedLM)
 
     Returns
     -------
     TwoLevelModels
         Container with all fitted models
     """
-    import statsmodels.formula.api as smf
-
     print("\nFitting two-level multilevel models...")
 
     # Ensure buurt_id is string for grouping
@@ -104,26 +407,7 @@ def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
     # Suppress convergence warnings for cleaner output
     warnings.filterwarnings("ignore", category=RuntimeWarning)
 
-    # M0: Empty model (random intercept only)
-    print("  Fitting m0 (empty model)...")
-    m0 = smf.mixedlm(
-        "DV_single ~ 1",
-        data=df,
-        groups="buurt_id"
-    ).fit(reml=True)
-    n_groups = df["buurt_id"].nunique()
-    print(f"    N={int(m0.nobs)}, groups={n_groups}")
-
-    # M1: Add key predictor
-    print("  Fitting m1 (+ key predictor)...")
-    m1 = smf.mixedlm(
-        "DV_single ~ b_perc_low40_hh",
-        data=df,
-        groups="buurt_id"
-    ).fit(reml=True)
-
-    # M2: Add individual controls
-    print("  Fitting m2 (+ individual controls)...")
+    # M2: Individual controls
     m2_formula = (
         "DV_single ~ b_perc_low40_hh + age + C(sex) + education + "
         "C(employment_status) + born_in_nl"
@@ -133,14 +417,7 @@ def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
     if "occupation" in df.columns and df["occupation"].notna().sum() > 100:
         m2_formula += " + C(occupation)"
 
-    m2 = smf.mixedlm(
-        m2_formula,
-        data=df,
-        groups="buurt_id"
-    ).fit(reml=True)
-
-    # M3: Add buurt-level controls
-    print("  Fitting m3 (+ buurt controls)...")
+    # M3: Buurt-level controls
     buurt_controls = []
     for var in ["b_pop_dens", "b_pop_over_65", "b_pop_nonwest",
                 "b_perc_low_inc_hh", "b_perc_soc_min_hh"]:
@@ -151,12 +428,18 @@ def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
     if buurt_controls:
         m3_formula += " + " + " + ".join(buurt_controls)
 
-    m3 = smf.mixedlm(
-        m3_formula,
-        data=df,
-        groups="buurt_id"
-    ).fit(reml=True)
+    specs = [
+        ModelSpec("m0", "DV_single ~ 1", "empty model"),
+        ModelSpec("m1", "DV_single ~ b_perc_low40_hh", "+ key predictor"),
+        ModelSpec("m2", m2_formula, "+ individual controls"),
+        ModelSpec("m3", m3_formula, "+ buurt controls"),
+    ]
+    m0, m1, m2, m3 = fit_model_specs(
+        df, specs, n_jobs=n_jobs, warm_start=warm_start, engine=engine
+    )
 
+    n_groups = df["buurt_id"].nunique()
+    print(f"    m0: N={int(m0.nobs)}, groups={n_groups}")
     print("  All models fitted successfully")
 
     # Print key coefficient
@@ -177,20 +460,25 @@ def fit_two_level_models(data: pd.DataFrame) -> TwoLevelModels:
 # Four-Level Multilevel Model Fitting
 # =============================================================================
 
-def fit_four_level_models(data: pd.DataFrame) -> FourLevelModels:
+def fit_four_level_models(
+    data: pd.DataFrame,
+    n_jobs: int = N_JOBS,
+    warm_start: bool = WARM_START,
+    engine: str = MIXED_ENGINE
+) -> FourLevelModels:
     """
     Fit sequence of four-level random intercept models.
     
-    These models include random intercepts for buurt, wijk, and gemeente,
-    approximating the R lme4 specification:
-    (1|gemeente_id) + (1|wijk_id) + (1|buurt_id)
-    
-    Note: statsmodels has limitations with multiple random effects. We use
-    the primary grouping at buurt level and include wijk/gemeente predictors
-    as fixed effects to capture higher-level variation.
-    
+    With engine="reml" the models have nested random intercepts for
+    gemeente, wijk within gemeente, and buurt within wijk, matching the
+    R lme4 specification (1|gemeente_id/wijk_id/buurt_id).
+
+    With engine="statsmodels" only buurt is a random grouping (MixedLM
+    does not scale to nested effects on this data); wijk/gemeente enter
+    through the fixed-effect predictors only.
+
     Models:
-    - m0: Empty model (buurt random intercept)
+    - m0: Empty model (random intercepts only)
     - m1: + key predictors at all levels (b_, w_, g_perc_low40_hh)
     - m2: + individual controls
     - m3: + buurt-level controls
@@ -200,16 +488,25 @@ def fit_four_level_models(data: pd.DataFrame) -> FourLevelModels:
     ----------
     data : pd.DataFrame
         Analysis sample with required variables including wijk_id and gemeente_id
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+    warm_start : bool
+        Start each model from the previous model's variance components
+    engine : str
+        "reml" (closed-form estimator) or "statsmodels" (MixedLM)
 
     Returns
     -------
     FourLevelModels
         Container with all fitted models
     """
-    import statsmodels.formula.api as smf
-
     print("\nFitting four-level multilevel models...")
-    print("  Note: Using buurt as primary grouping with wijk/gemeente predictors")
+    if engine == "reml":
+        print("  Random intercepts: gemeente / wijk / buurt (nested)")
+        groups = ["gemeente_id", "wijk_id", "buurt_id"]
+    else:
+        print("  Note: Using buurt as primary grouping with wijk/gemeente predictors")
+        groups = "buurt_id"
 
     # Check required columns
     required_cols = ["buurt_id", "wijk_id", "gemeente_id"]
@@ -259,26 +556,10 @@ def fit_four_level_models(data: pd.DataFrame) -> FourLevelModels:
     warnings.filterwarnings("ignore", category=RuntimeWarning)
     warnings.filterwarnings("ignore", category=UserWarning)
 
-    # M0: Empty model
-    print("\n  Fitting m0 (empty model)...")
-    m0 = smf.mixedlm(
-        "DV_single ~ 1",
-        data=df_model,
-        groups="buurt_id"
-    ).fit(reml=True)
-    print(f"    N={int(m0.nobs)}, groups={len(m0.random_effects)}")
-
-    # M1: Add key predictors at all geographic levels
-    print("  Fitting m1 (+ key predictors at buurt/wijk/gemeente levels)...")
+    # M1: Key predictors at all geographic levels
     m1_formula = "DV_single ~ " + " + ".join(key_preds)
-    m1 = smf.mixedlm(
-        m1_formula,
-        data=df_model,
-        groups="buurt_id"
-    ).fit(reml=True)
-
-    # M2: Add individual controls
-    print("  Fitting m2 (+ individual controls)...")
+
+    # M2: Individual controls
     cat_vars = ["sex", "employment_status"]
     cat_vars = [f"C({v})" for v in cat_vars if v in ind_controls or v.replace("C(", "").replace(")", "") in ind_controls]
     num_vars = [v for v in ind_controls if v not in ["sex", "employment_status"]]
@@ -292,37 +573,30 @@ def fit_four_level_models(data: pd.DataFrame) -> FourLevelModels:
     # Add occupation if available
     if "occupation" in df_model.columns and df_model["occupation"].notna().sum() > 100:
         m2_formula += " + C(occupation)"
-    
-    m2 = smf.mixedlm(
-        m2_formula,
-        data=df_model,
-        groups="buurt_id"
-    ).fit(reml=True)
-
-    # M3: Add buurt-level controls
-    print("  Fitting m3 (+ buurt-level controls)...")
+
+    # M3: Buurt-level controls
     m3_formula = m2_formula
     if buurt_ctrls:
         m3_formula += " + " + " + ".join(buurt_ctrls)
-    
-    m3 = smf.mixedlm(
-        m3_formula,
-        data=df_model,
-        groups="buurt_id"
-    ).fit(reml=True)
-
-    # M4: Add wijk-level controls
-    print("  Fitting m4 (+ wijk-level controls)...")
+
+    # M4: Wijk-level controls
     m4_formula = m3_formula
     if wijk_ctrls:
         m4_formula += " + " + " + ".join(wijk_ctrls)
-    
-    m4 = smf.mixedlm(
-        m4_formula,
-        data=df_model,
-        groups="buurt_id"
-    ).fit(reml=True)
 
+    print()
+    specs = [
+        ModelSpec("m0", "DV_single ~ 1", "empty model", groups),
+        ModelSpec("m1", m1_formula, "+ key predictors at buurt/wijk/gemeente levels", groups),
+        ModelSpec("m2", m2_formula, "+ individual controls", groups),
+        ModelSpec("m3", m3_formula, "+ buurt-level controls", groups),
+        ModelSpec("m4", m4_formula, "+ wijk-level controls", groups),
+    ]
+    m0, m1, m2, m3, m4 = fit_model_specs(
+        df_model, specs, n_jobs=n_jobs, warm_start=warm_start, engine=engine
+    )
+
+    print(f"    m0: N={int(m0.nobs)}, groups={len(m0.random_effects)}")
     print("  All four-level models fitted successfully")
 
     # Print key coefficients
@@ -345,42 +619,51 @@ def fit_four_level_models(data: pd.DataFrame) -> FourLevelModels:
 def calculate_four_level_icc(models: FourLevelModels) -> Dict[str, float]:
     """
     Calculate variance decomposition for four-level model.
-    
-    Note: With buurt as primary grouping, this gives ICC at buurt level.
-    
+
+    With nested random intercepts (reml engine) the total variance is split
+    over gemeente, wijk, buurt and individuals. Models with buurt as the
+    only grouping give the buurt ICC only.
+
     Parameters
     ----------
     models : FourLevelModels
         Fitted four-level models (uses m0_empty)
-    
+
     Returns
     -------
     Dict with variance components and ICCs
     """
     print("\nCalculating variance decomposition...")
-    
+
     m0 = models.m0_empty
-    
-    # Extract variance components
-    var_buurt = float(m0.cov_re.iloc[0, 0])
+
+    # Extract variance components (tau2 per level, outermost first)
+    components = getattr(m0, "variance_components", None)
+    if components is None:
+        components = pd.Series({"buurt_id": float(m0.cov_re.iloc[0, 0])})
+
     var_residual = float(m0.scale)
-    var_total = var_buurt + var_residual
-    
-    icc_buurt = var_buurt / var_total if var_total > 0 else 0
-    
-    results = {
-        "var_buurt": var_buurt,
-        "var_residual": var_residual,
-        "var_total": var_total,
-        "icc_buurt": icc_buurt,
-        "pct_buurt": 100 * icc_buurt,
-        "pct_residual": 100 * var_residual / var_total if var_total > 0 else 0
-    }
-    
-    print(f"  Variance (buurt): {var_buurt:.2f} ({results['pct_buurt']:.1f}%)")
+    var_total = float(components.sum()) + var_residual
+
+    results = {}
+    for level, variance in components.items():
+        name = str(level).replace("_id", "")
+        icc = variance / var_total if var_total > 0 else 0
+        results[f"var_{name}"] = float(variance)
+        results[f"icc_{name}"] = icc
+        results[f"pct_{name}"] = 100 * icc
+
+    results["var_residual"] = var_residual
+    results["var_total"] = var_total
+    results["pct_residual"] = 100 * var_residual / var_total if var_total > 0 else 0
+
+    for level in components.index:
+        name = str(level).replace("_id", "")
+        print(f"  Variance ({name}): {results[f'var_{name}']:.2f} "
+              f"({results[f'pct_{name}']:.1f}%)")
     print(f"  Variance (residual): {var_residual:.2f} ({results['pct_residual']:.1f}%)")
-    print(f"  ICC (buurt): {icc_buurt:.4f}")
-    
+    print(f"  ICC (buurt): {results['icc_buurt']:.4f}")
+
     return results
 
 
@@ -438,6 +721,59 @@ def calculate_icc(models: TwoLevelModels) -> ICCResult:
 # Model Diagnostics
 # =============================================================================
 
+def model_design(model) -> pd.DataFrame:
+    """
+    Fixed-effects design matrix of a fitted model as a DataFrame.
+
+    Works for statsmodels results (model.model.exog) and for
+    RandomInterceptResults (model.exog).
+    """
+    if hasattr(model, "exog"):
+        return model.exog
+    return pd.DataFrame(model.model.exog, columns=model.model.exog_names)
+
+
+def compute_vif(design: pd.DataFrame) -> pd.DataFrame:
+    """
+    Variance inflation factors for all columns of a design in one pass.
+
+    VIF_j = 1 / (1 - R_j^2) is the j-th diagonal element of the inverse
+    correlation matrix of the predictors, so a single inversion replaces
+    one auxiliary regression per column. Constant columns (the intercept)
+    are skipped. For a singular design the pseudo-inverse is used, and
+    columns involved in an exact linear dependency get VIF = inf.
+
+    Parameters
+    ----------
+    design : pd.DataFrame
+        Predictor columns (e.g. from model_design)
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns: variable, VIF
+    """
+    X = design.to_numpy(dtype=float)
+    keep = X.std(axis=0) > 0
+    names = design.columns[keep]
+    if keep.sum() < 2:
+        return pd.DataFrame({"variable": list(names), "VIF": [1.0] * len(names)})
+
+    corr = np.corrcoef(X[:, keep], rowvar=False)
+    eigvals, eigvecs = np.linalg.eigh(corr)
+    tol = eigvals.max() * len(corr) * np.finfo(float).eps
+
+    if eigvals.min() > tol:
+        vif = np.diag(np.linalg.inv(corr))
+    else:
+        vif = np.diag(np.linalg.pinv(corr, hermitian=True))
+        # Columns loading on a (near-)zero eigenvector are exactly collinear
+        null_space = eigvecs[:, eigvals <= tol]
+        vif = np.where(np.abs(null_space).max(axis=1) > 1e-8, np.inf, vif)
+
+    return pd.DataFrame({"variable": list(names), "VIF": vif})
+
+
 def run_diagnostics(
     models: TwoLevelModels,
     data: pd.DataFrame
@@ -446,7 +782,7 @@ def run_diagnostics(
     Perform diagnostic checks on the final model.
 
     Includes:
-    - VIF calculation (via OLS on predictors)
+    - VIF for every fixed-effect column of the final model (compute_vif)
     - Residual statistics (mean, sd, skewness, kurtosis)
     - Random effects distribution
 
@@ -462,7 +798,7 @@ def run_diagnostics(
     DiagnosticsResult
         Diagnostic results
     """
-    from statsmodels.stats.outliers_influence import variance_inflation_factor
+    from scipy import stats
 
     print("\nRunning model diagnostics...")
 
@@ -473,27 +809,8 @@ def run_diagnostics(
     # -------------------------------------------------------------------------
     print("  Calculating VIF...")
 
-    # Select numeric predictors
-    vif_vars = [
-        "b_perc_low40_hh", "age", "education",
-        "b_pop_dens", "b_pop_over_65", "b_pop_nonwest",
-        "b_perc_low_inc_hh", "b_perc_soc_min_hh"
-    ]
-    vif_vars = [v for v in vif_vars if v in data.columns]
-
-    # Create design matrix
-    vif_data = data[vif_vars].dropna()
-
-    vif_results = []
-    if len(vif_data) > 0 and len(vif_vars) > 1:
-        for i, col in enumerate(vif_vars):
-            try:
-                vif_value = variance_inflation_factor(vif_data.values, i)
-                vif_results.append({"variable": col, "VIF": vif_value})
-            except Exception as e:
-                vif_results.append({"variable": col, "VIF": np.nan})
-
-    vif_df = pd.DataFrame(vif_results)
+    # All fixed-effect columns of the final model, dummies included
+    vif_df = compute_vif(model_design(m3))
     high_vif = []
     if len(vif_df) > 0:
         high_vif = vif_df[vif_df["VIF"] > VIF_THRESHOLD]["variable"].tolist()
@@ -561,11 +878,15 @@ def run_diagnostics(
 # Sensitivity Analyses
 # =============================================================================
 
-def run_sensitivity(data: pd.DataFrame) -> pd.DataFrame:
+# Control variables entered as categorical terms in model formulas
+CATEGORICAL_CONTROLS = ["sex", "employment_status", "occupation"]
+
+
+def default_sensitivity_specs(data: pd.DataFrame) -> List[SensitivitySpec]:
     """
-    Run robustness checks with alternative specifications.
+    Build the standard list of robustness specifications.
 
-    Specifications tested:
+    Specifications:
     1. Base model (DV_single)
     2. 2-item composite DV
     3. 3-item composite DV
@@ -573,6 +894,8 @@ def run_sensitivity(data: pd.DataFrame) -> pd.DataFrame:
     5. Income ratio model
     6. Wealth interaction (if available)
 
+    Specifications whose variables are missing from the data are left out.
+
     Parameters
     ----------
     data : pd.DataFrame
@@ -580,148 +903,244 @@ def run_sensitivity(data: pd.DataFrame) -> pd.DataFrame:
 
     Returns
     -------
-    pd.DataFrame
-        Sensitivity results
+    list of SensitivitySpec
     """
-    import statsmodels.formula.api as smf
-
-    print("\nRunning sensitivity analyses...")
-
-    # Base control variables (as list for easier manipulation)
     ind_controls = ["age", "sex", "education", "employment_status", "born_in_nl"]
     buurt_controls = [var for var in ["b_pop_dens", "b_pop_over_65", "b_pop_nonwest",
                                        "b_perc_low_inc_hh", "b_perc_soc_min_hh"]
                       if var in data.columns]
+    controls = ind_controls + buurt_controls
 
-    # All variables needed for base model
-    base_vars = ["DV_single", "b_perc_low40_hh", "buurt_id"] + ind_controls + buurt_controls
+    specs = [SensitivitySpec("Base (DV_single)", controls=controls)]
 
-    # Helper to prepare clean data for statsmodels
-    def prepare_data(df, required_vars):
-        """Create clean DataFrame with contiguous index for statsmodels."""
-        clean = df[required_vars].dropna().copy()
-        clean = clean.reset_index(drop=True)
-        clean["buurt_id"] = clean["buurt_id"].astype(str)
-        return clean
-
-    # Build formula strings
-    ind_formula = "age + C(sex) + education + C(employment_status) + born_in_nl"
-    buurt_formula = " + ".join(buurt_controls) if buurt_controls else ""
-    base_controls = ind_formula + (" + " + buurt_formula if buurt_formula else "")
-
-    results = []
-
-    # Specification 1: Base model
-    print("  1. Base model (DV_single)...")
-    try:
-        df_base = prepare_data(data, base_vars)
-        m_base = smf.mixedlm(
-            f"DV_single ~ b_perc_low40_hh + {base_controls}",
-            data=df_base,
-            groups="buurt_id"
-        ).fit(reml=True)
-        results.append(_extract_key_coef(m_base, "Base (DV_single)"))
-    except Exception as e:
-        print(f"    Error: {e}")
-
-    # Specification 2: 2-item composite
     if "DV_2item_scaled" in data.columns:
-        print("  2. Two-item composite...")
-        try:
-            vars_2item = ["DV_2item_scaled", "b_perc_low40_hh", "buurt_id"] + ind_controls + buurt_controls
-            df_2item = prepare_data(data, vars_2item)
-            m_2item = smf.mixedlm(
-                f"DV_2item_scaled ~ b_perc_low40_hh + {base_controls}",
-                data=df_2item,
-                groups="buurt_id"
-            ).fit(reml=True)
-            results.append(_extract_key_coef(m_2item, "2-item composite"))
-        except Exception as e:
-            print(f"    Error: {e}")
-
-    # Specification 3: 3-item composite
+        specs.append(SensitivitySpec(
+            "2-item composite", dv="DV_2item_scaled", controls=controls
+        ))
+
     if "DV_3item_scaled" in data.columns:
-        print("  3. Three-item composite...")
-        try:
-            vars_3item = ["DV_3item_scaled", "b_perc_low40_hh", "buurt_id"] + ind_controls + buurt_controls
-            df_3item = prepare_data(data, vars_3item)
-            m_3item = smf.mixedlm(
-                f"DV_3item_scaled ~ b_perc_low40_hh + {base_controls}",
-                data=df_3item,
-                groups="buurt_id"
-            ).fit(reml=True)
-            results.append(_extract_key_coef(m_3item, "3-item composite"))
-        except Exception as e:
-            print(f"    Error: {e}")
-
-    # Specification 4: Dutch-born only
+        specs.append(SensitivitySpec(
+            "3-item composite", dv="DV_3item_scaled", controls=controls
+        ))
+
     # Note: born_in_nl may be coded as max value = born in NL, or binary (1 = yes)
     if "born_in_nl" in data.columns:
-        print("  4. Dutch-born only...")
-        try:
-            # Handle different codings: if max > 1, assume max = born in NL
-            max_val = data["born_in_nl"].max()
-            dutch_filter = data["born_in_nl"] == max_val if max_val > 1 else data["born_in_nl"] == 1
-            df_dutch_raw = data[dutch_filter].copy()
-            # For Dutch-born, exclude born_in_nl from controls (it's constant)
-            dutch_controls = "age + C(sex) + education + C(employment_status)"
-            dutch_controls += (" + " + buurt_formula if buurt_formula else "")
-            vars_dutch = ["DV_single", "b_perc_low40_hh", "buurt_id", "age", "sex", "education", "employment_status"] + buurt_controls
-            df_dutch = prepare_data(df_dutch_raw, vars_dutch)
-            if len(df_dutch) > 100:
-                m_dutch = smf.mixedlm(
-                    f"DV_single ~ b_perc_low40_hh + {dutch_controls}",
-                    data=df_dutch,
-                    groups="buurt_id"
-                ).fit(reml=True)
-                results.append(_extract_key_coef(m_dutch, "Dutch-born only"))
-        except Exception as e:
-            print(f"    Error: {e}")
-
-    # Specification 5: Income Ratio Model (Alternative inequality measure)
+        max_val = data["born_in_nl"].max()
+        dutch_value = max_val if max_val > 1 else 1
+        specs.append(SensitivitySpec(
+            "Dutch-born only",
+            # born_in_nl is constant in this subsample, so it is not a control
+            controls=[c for c in controls if c != "born_in_nl"],
+            query=f"born_in_nl == {float(dutch_value)!r}",
+            min_n=101
+        ))
+
+    # Alternative inequality measure
     if "b_income_ratio" in data.columns:
-        print("  5. Income ratio model (robustness)...")
-        try:
-            vars_ratio = ["DV_single", "b_income_ratio", "buurt_id"] + ind_controls + buurt_controls
-            df_ratio = prepare_data(data, vars_ratio)
-            m_ratio = smf.mixedlm(
-                f"DV_single ~ b_income_ratio + {base_controls}",
-                data=df_ratio,
-                groups="buurt_id"
-            ).fit(reml=True)
-            results.append(_extract_key_coef(m_ratio, "Income ratio (high/low)", var="b_income_ratio"))
-        except Exception as e:
-            print(f"    Error: {e}")
-
-    # Specification 6: Wealth interaction (test H3 - income moderation)
+        specs.append(SensitivitySpec(
+            "Income ratio (high/low)", key_var="b_income_ratio", controls=controls
+        ))
+
+    # Wealth interaction (test H3 - income moderation)
     if "wealth_index" in data.columns and "b_perc_low40_hh" in data.columns:
-        print("  6. Wealth interaction (H3 test)...")
-        try:
-            vars_wealth = ["DV_single", "b_perc_low40_hh", "wealth_index", "buurt_id"] + ind_controls + buurt_controls
-            df_wealth = prepare_data(data, vars_wealth)
-            m_interaction = smf.mixedlm(
-                f"DV_single ~ b_perc_low40_hh * wealth_index + {base_controls}",
-                data=df_wealth,
-                groups="buurt_id"
-            ).fit(reml=True)
-            # Extract main effect
-            results.append(_extract_key_coef(m_interaction, "With wealth interaction"))
-            # Extract interaction term
-            interaction_coef = m_interaction.params.get("b_perc_low40_hh:wealth_index", np.nan)
-            interaction_se = m_interaction.bse.get("b_perc_low40_hh:wealth_index", np.nan)
-            if not np.isnan(interaction_coef):
-                z = abs(interaction_coef / interaction_se) if interaction_se > 0 else 0
-                results.append({
-                    "specification": "  -> Interaction term",
-                    "N": int(m_interaction.nobs),
-                    "coefficient": interaction_coef,
-                    "SE": interaction_se,
-                    "significant": z > 1.96
-                })
-        except Exception as e:
-            print(f"    Error: {e}")
-
-    results_df = pd.DataFrame(results)
+        specs.append(SensitivitySpec(
+            "With wealth interaction",
+            controls=controls,
+            extra_terms=["wealth_index", "b_perc_low40_hh:wealth_index"],
+            report_terms={"b_perc_low40_hh:wealth_index": "  -> Interaction term"}
+        ))
+
+    return specs
+
+
+def _spec_formula(spec: SensitivitySpec) -> str:
+    """Model formula for a sensitivity specification."""
+    terms = [spec.key_var] + list(spec.extra_terms)
+    terms += [f"C({v})" if v in CATEGORICAL_CONTROLS else v for v in spec.controls]
+    return f"{spec.dv} ~ " + " + ".join(terms)
+
+
+def _spec_variables(spec: SensitivitySpec) -> List[str]:
+    """Columns that must be complete for a sensitivity specification."""
+    variables = [spec.dv, spec.key_var, "buurt_id"] + list(spec.controls)
+    for term in spec.extra_terms:
+        variables += term.replace("*", ":").split(":")
+    return list(dict.fromkeys(v.strip() for v in variables))
+
+
+def _run_sensitivity_spec(spec: SensitivitySpec, design: pd.DataFrame) -> Dict[str, Any]:
+    """Fit one specification on the shared design; returns rows or an error."""
+    try:
+        sample = design.query(spec.query) if spec.query else design
+        sample = sample.dropna(subset=_spec_variables(spec)).reset_index(drop=True)
+
+        if len(sample) < spec.min_n:
+            return {"rows": [], "skipped": f"only {len(sample)} complete cases"}
+
+        model = _fit_spec(ModelSpec(spec.label, _spec_formula(spec)), sample)
+
+        rows = [_extract_key_coef(model, spec.label, var=spec.key_var)]
+        for term, label in spec.report_terms.items():
+            if not np.isnan(model.params.get(term, np.nan)):
+                rows.append(_extract_key_coef(model, label, var=term))
+        return {"rows": rows}
+
+    except Exception as e:
+        return {"rows": [], "error": str(e)}
+
+
+def prepare_spec_design(
+    data: pd.DataFrame,
+    specs: List[SensitivitySpec]
+) -> pd.DataFrame:
+    """
+    Prepare the design shared by a list of specifications.
+
+    Selects the union of all specification variables (plus columns used in
+    sample filters), drops rows without a buurt and converts buurt_id to
+    string. Each specification later takes its own complete cases from it.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full analysis data
+    specs : list of SensitivitySpec
+        Specifications that will be fitted on the design
+
+    Returns
+    -------
+    pd.DataFrame
+        Shared design with a contiguous index
+    """
+    variables = []
+    for spec in specs:
+        variables += _spec_variables(spec)
+        if spec.query:
+            variables += [c for c in data.columns
+                          if re.search(rf"\b{re.escape(str(c))}\b", spec.query)]
+    variables = [v for v in dict.fromkeys(variables) if v in data.columns]
+
+    design = data.loc[data["buurt_id"].notna(), variables].reset_index(drop=True)
+    design["buurt_id"] = design["buurt_id"].astype(str)
+    return design
+
+
+def iter_specification_grid(
+    data: pd.DataFrame,
+    specs: List[SensitivitySpec],
+    n_jobs: int = N_JOBS,
+    batch_size: Optional[int] = None
+) -> Iterator[List[Tuple[SensitivitySpec, Dict[str, Any]]]]:
+    """
+    Fit specifications in batches, yielding each batch as it completes.
+
+    The design is prepared once (prepare_spec_design) and, with n_jobs > 1,
+    one process pool is kept open for all batches. Each yielded item is a
+    list of (spec, outcome) pairs in specification order, where outcome
+    holds the result "rows" and, for failed fits, an "error" message.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full analysis data
+    specs : list of SensitivitySpec
+        Specifications to fit
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+    batch_size : int, optional
+        Specifications per batch (default: all in one batch)
+
+    Yields
+    ------
+    list of (SensitivitySpec, dict)
+    """
+    if not specs:
+        return
+
+    design = prepare_spec_design(data, specs)
+    batch_size = batch_size or len(specs)
+    n_workers = _resolve_n_jobs(n_jobs, len(specs))
+
+    with _shared_data_pool(design, n_workers) as map_tasks:
+        for start in range(0, len(specs), batch_size):
+            batch = specs[start:start + batch_size]
+            outcomes = map_tasks(_run_sensitivity_spec, batch)
+            yield list(zip(batch, outcomes))
+
+
+def run_specification_grid(
+    data: pd.DataFrame,
+    specs: List[SensitivitySpec],
+    n_jobs: int = N_JOBS
+) -> pd.DataFrame:
+    """
+    Fit a list of sensitivity specifications and collect the key coefficients.
+
+    The data are prepared once: the union of all specification variables is
+    selected and rows without a buurt are dropped. Every specification then
+    takes its own complete cases (and sample filter) from that shared
+    design. With n_jobs > 1 the fits are spread over a process pool whose
+    workers receive the design once.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full analysis data
+    specs : list of SensitivitySpec
+        Specifications to fit
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per reported coefficient (specification, N, coefficient,
+        SE, significant), in specification order
+    """
+    n_workers = _resolve_n_jobs(n_jobs, len(specs))
+    for i, spec in enumerate(specs, start=1):
+        print(f"  {i}. {spec.label}...")
+    if n_workers > 1:
+        print(f"  Fitting {len(specs)} specifications in parallel ({n_workers} workers)...")
+
+    results = []
+    for batch in iter_specification_grid(data, specs, n_jobs=n_jobs):
+        for spec, outcome in batch:
+            if "error" in outcome:
+                print(f"    Error ({spec.label}): {outcome['error']}")
+            results.extend(outcome["rows"])
+
+    return pd.DataFrame(results)
+
+
+def run_sensitivity(data: pd.DataFrame, n_jobs: int = N_JOBS) -> pd.DataFrame:
+    """
+    Run robustness checks with alternative specifications.
+
+    Specifications tested (see default_sensitivity_specs):
+    1. Base model (DV_single)
+    2. 2-item composite DV
+    3. 3-item composite DV
+    4. Dutch-born only subsample
+    5. Income ratio model
+    6. Wealth interaction (if available)
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Full analysis data
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+
+    Returns
+    -------
+    pd.DataFrame
+        Sensitivity results
+    """
+    print("\nRunning sensitivity analyses...")
+
+    specs = default_sensitivity_specs(data)
+    results_df = run_specification_grid(data, specs, n_jobs=n_jobs)
 
     print("\n  Sensitivity Summary:")
     print(results_df.to_string(index=False))
@@ -763,11 +1182,159 @@ def _extract_key_coef(model, spec_name: str, var: str = "b_perc_low40_hh") -> Di
     }
 
 
+# =============================================================================
+# Marginal Effects of Interactions
+# =============================================================================
+
+def _interaction_term(params: pd.Series, focal: str, moderator: str) -> str:
+    """Name of the focal x moderator product term in params."""
+    for term in (f"{focal}:{moderator}", f"{moderator}:{focal}"):
+        if term in params.index:
+            return term
+    raise KeyError(f"No interaction between {focal} and {moderator} in the model")
+
+
+def simple_slopes(
+    model,
+    focal: str,
+    moderator: str,
+    moderator_values,
+    confidence_level: float = CONFIDENCE_LEVEL
+) -> pd.DataFrame:
+    """
+    Effect of `focal` at given values of `moderator`, with delta-method SEs.
+
+    For y = ... + b1*focal + b3*focal*moderator the slope of focal at
+    moderator = m is b1 + b3*m, with variance
+    Var(b1) + 2m Cov(b1, b3) + m^2 Var(b3). All grid points are evaluated
+    in one matrix operation, so dense grids (thousands of points) are cheap.
+
+    Parameters
+    ----------
+    model : fitted model
+        Any result with params and cov_params() (MixedLM, RandomInterceptResults)
+    focal : str
+        Predictor whose effect is evaluated
+    moderator : str
+        Moderating variable
+    moderator_values : array-like
+        Moderator values to evaluate the slope at
+    confidence_level : float
+        Coverage of the confidence intervals
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns: moderator, slope, se, z, p, ci_lower, ci_upper, significant
+    """
+    from scipy import stats
+
+    term = _interaction_term(model.params, focal, moderator)
+    names = [focal, term]
+    b = model.params[names].to_numpy(dtype=float)
+    V = model.cov_params().loc[names, names].to_numpy(dtype=float)
+
+    m = np.asarray(moderator_values, dtype=float)
+    L = np.column_stack([np.ones_like(m), m])      # one row per grid point
+    slope = L @ b
+    se = np.sqrt(np.einsum("ij,jk,ik->i", L, V, L))
+
+    z_crit = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = slope / se
+    p = 2 * stats.norm.sf(np.abs(z))
+
+    return pd.DataFrame({
+        "moderator": m,
+        "slope": slope,
+        "se": se,
+        "z": z,
+        "p": p,
+        "ci_lower": slope - z_crit * se,
+        "ci_upper": slope + z_crit * se,
+        "significant": np.abs(z) > z_crit
+    })
+
+
+def johnson_neyman(
+    model,
+    focal: str,
+    moderator: str,
+    confidence_level: float = CONFIDENCE_LEVEL
+) -> Dict[str, Any]:
+    """
+    Johnson-Neyman interval: moderator values where the slope is significant.
+
+    Solves (b1 + b3*m)^2 = z^2 * (Var(b1) + 2m Cov(b1, b3) + m^2 Var(b3))
+    for m. Between the two roots the slope is significant if the quadratic
+    opens downward (the interaction is imprecise), outside them otherwise.
+
+    Parameters
+    ----------
+    model : fitted model
+        Any result with params and cov_params()
+    focal : str
+        Predictor whose effect is evaluated
+    moderator : str
+        Moderating variable
+    confidence_level : float
+        Significance level is 1 - confidence_level
+
+    Returns
+    -------
+    Dict with:
+        - bounds: sorted roots (empty if the slope's significance never
+          changes; a single root if the quadratic term is exactly zero)
+        - significant_inside: True if significant between the bounds
+        - significant_above: with a single bound, True if significant
+          above it and False if below (None otherwise)
+        - always_significant: without bounds, whether the slope is
+          significant at every moderator value (False: at none)
+    """
+    from scipy import stats
+
+    term = _interaction_term(model.params, focal, moderator)
+    names = [focal, term]
+    b1, b3 = model.params[names].to_numpy(dtype=float)
+    V = model.cov_params().loc[names, names].to_numpy(dtype=float)
+    z2 = stats.norm.ppf(1 - (1 - confidence_level) / 2) ** 2
+
+    # a m^2 + b m + c > 0  <=>  slope significant at m
+    a = b3 ** 2 - z2 * V[1, 1]
+    b = 2 * (b1 * b3 - z2 * V[0, 1])
+    c = b1 ** 2 - z2 * V[0, 0]
+
+    disc = b ** 2 - 4 * a * c
+    if a == 0 and b != 0:
+        # Linear: significant on one side of the single root
+        bounds = [float(-c / b)]
+        always = False
+    elif a == 0 or disc < 0:
+        # Significance never changes: the sign of the quadratic is constant
+        bounds = []
+        always = bool(c > 0) if a == 0 else bool(a > 0)
+    else:
+        root = np.sqrt(disc)
+        bounds = sorted([float((-b - root) / (2 * a)), float((-b + root) / (2 * a))])
+        always = False
+
+    return {
+        "bounds": bounds,
+        "significant_inside": bool(a < 0),
+        "significant_above": bool(b > 0) if len(bounds) == 1 else None,
+        "always_significant": always
+    }
+
+
 # =============================================================================
 # H3 Cross-Level Interaction Test
 # =============================================================================
 
-def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
+def test_h3_cross_level_interaction(
+    data: pd.DataFrame,
+    warm_start: bool = WARM_START,
+    engine: str = MIXED_ENGINE
+) -> Dict[str, Any]:
     """
     Test H3: Individual income moderates the neighborhood inequality effect.
 
@@ -782,6 +1349,11 @@ def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
     ----------
     data : pd.DataFrame
         Analysis data with DV_single, b_perc_low40_hh, wealth_index, and controls
+    warm_start : bool
+        Start the interaction model from the main-effects model's variance
+        components
+    engine : str
+        "reml" (closed-form estimator) or "statsmodels" (MixedLM)
 
     Returns
     -------
@@ -789,10 +1361,10 @@ def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
         - main_effect: coefficient for b_perc_low40_hh
         - interaction_effect: coefficient for b_perc_low40_hh:wealth_index
         - simple_slopes: effect of neighborhood at different wealth levels
+        - simple_slopes_table: slopes with SEs and confidence intervals
+        - johnson_neyman: wealth values bounding the region of significance
         - interpretation: text summary
     """
-    import statsmodels.formula.api as smf
-
     print("\n" + "=" * 60)
     print("H3 TEST: Cross-Level Interaction (Individual Income Moderation)")
     print("=" * 60)
@@ -828,11 +1400,11 @@ def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
     # Model 1: Main effects only (baseline)
     print("\n  Model 1: Main effects only...")
     try:
-        m1 = smf.mixedlm(
-            f"DV_single ~ b_perc_low40_hh + wealth_index + {controls}",
-            data=df,
-            groups="buurt_id"
-        ).fit(reml=True)
+        m1 = _fit_spec(
+            ModelSpec("m1", f"DV_single ~ b_perc_low40_hh + wealth_index + {controls}"),
+            df,
+            engine=engine
+        )
 
         results["m1_neighborhood"] = {
             "coef": m1.params.get("b_perc_low40_hh", np.nan),
@@ -855,11 +1427,14 @@ def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
     # Model 2: With cross-level interaction
     print("\n  Model 2: With cross-level interaction (H3 test)...")
     try:
-        m2 = smf.mixedlm(
-            f"DV_single ~ b_perc_low40_hh * wealth_index + {controls}",
-            data=df,
-            groups="buurt_id"
-        ).fit(reml=True)
+        m2 = _fit_spec(
+            ModelSpec("m2", f"DV_single ~ b_perc_low40_hh * wealth_index + {controls}"),
+            df,
+            start_cov_re=m1.cov_re_unscaled if warm_start else None,
+            engine=engine
+        )
+        print(f"    Optimizer iterations: {m2.n_iter}"
+              f"{' (warm start)' if m2.warm_started else ''}")
 
         # Extract coefficients
         main_effect = m2.params.get("b_perc_low40_hh", np.nan)
@@ -885,16 +1460,30 @@ def test_h3_cross_level_interaction(data: pd.DataFrame) -> Dict[str, Any]:
         # Simple slopes: effect of neighborhood at different wealth levels
         print("\n  Simple slopes (neighborhood effect at different wealth levels):")
         wealth_levels = [0, 1, 2, 3, 4]  # wealth_index values
-        simple_slopes = {}
-
-        for w in wealth_levels:
-            # Effect = main_effect + interaction * wealth_level
-            slope = main_effect + interaction * w
-            # SE calculation requires covariance matrix
-            simple_slopes[w] = slope
-            print(f"    Wealth = {w}: neighborhood effect = {slope:.3f}")
-
-        results["simple_slopes"] = simple_slopes
+        slopes = simple_slopes(m2, "b_perc_low40_hh", "wealth_index", wealth_levels)
+
+        for _, row in slopes.iterrows():
+            print(f"    Wealth = {row['moderator']:.0f}: neighborhood effect = "
+                  f"{row['slope']:.3f} (SE={row['se']:.3f}, "
+                  f"CI [{row['ci_lower']:.3f}, {row['ci_upper']:.3f}])"
+                  f"{' *' if row['significant'] else ''}")
+
+        results["simple_slopes"] = dict(zip(wealth_levels, slopes["slope"]))
+        results["simple_slopes_table"] = slopes
+
+        jn = johnson_neyman(m2, "b_perc_low40_hh", "wealth_index")
+        results["johnson_neyman"] = jn
+        if len(jn["bounds"]) == 1:
+            where = "above" if jn["significant_above"] else "below"
+            print(f"  Johnson-Neyman: effect significant {where} wealth = "
+                  f"{jn['bounds'][0]:.2f}")
+        elif jn["bounds"]:
+            where = "between" if jn["significant_inside"] else "outside"
+            print(f"  Johnson-Neyman: effect significant {where} wealth = "
+                  f"{jn['bounds'][0]:.2f} and {jn['bounds'][1]:.2f}")
+        else:
+            where = "all" if jn["always_significant"] else "no"
+            print(f"  Johnson-Neyman: effect significant at {where} wealth levels")
 
         # Interpretation
         print("\n  " + "-" * 56)
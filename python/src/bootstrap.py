@@ -0,0 +1,291 @@
+# =============================================================================
+# bootstrap.py - Cluster Bootstrap Module
+# =============================================================================
+"""
+Cluster (buurt-level) bootstrap for the two-level models.
+
+Resampling buurten with replacement is the same as giving every buurt a
+multiplicity weight (how often it was drawn). The random-intercept REML
+criterion depends on the data only through per-buurt sufficient statistics
+(sizes, means, within-buurt cross-products), so a replicate is a weighted
+sum of arrays computed once from the fitted model's design: no DataFrame
+is copied or re-parsed, and a replicate costs O(G p^2) for G buurten.
+
+Replicates are refitted with the closed-form REML estimator (src/reml.py)
+whichever engine fitted the original models. They run in chunks over a
+process pool; every chunk has its own random stream spawned from one
+seed, so results do not depend on the number of workers.
+
+Functions:
+    bootstrap_two_level: Cluster bootstrap of the final model and the ICC
+Classes:
+    ClusterDesign: Per-cluster sufficient statistics of a model design
+    BootstrapResult: Replicate estimates and percentile intervals
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import List, Tuple
+from dataclasses import dataclass
+from scipy import sparse
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import BOOTSTRAP_REPS, BOOTSTRAP_SEED, CONFIDENCE_LEVEL, N_JOBS
+from src.reml import maximize_ratio, profile_from_cross_products
+from src.analyze import TwoLevelModels, _map_with_shared_data, _resolve_n_jobs
+
+
+# Replicates per task sent to a worker (each task has its own random stream)
+CHUNK_SIZE = 25
+
+# Draws allowed per replicate before a chunk gives up on singular designs
+MAX_DRAWS_PER_REP = 10
+
+
+# =============================================================================
+# Cluster Sufficient Statistics
+# =============================================================================
+
+class ClusterDesign:
+    """
+    Per-cluster sufficient statistics of (X, y).
+
+    Parameters
+    ----------
+    y : np.ndarray
+        Response
+    X : np.ndarray
+        Fixed-effects design
+    groups : array-like
+        Cluster label of every observation
+    names : list of str
+        Column names of X
+    """
+
+    def __init__(self, y: np.ndarray, X: np.ndarray, groups, names: List[str]):
+        codes, labels = pd.factorize(np.asarray(groups), sort=True)
+        n_groups = len(labels)
+        U = np.column_stack([X, y]).astype(float)
+
+        self.names = list(names)
+        self.sizes = np.bincount(codes, minlength=n_groups).astype(float)
+
+        indicator = sparse.csr_matrix(
+            (np.ones(len(codes)), (codes, np.arange(len(codes)))),
+            shape=(n_groups, len(codes))
+        )
+        self.means = (indicator @ U) / self.sizes[:, None]
+
+        # Within-cluster cross-products per cluster (G x q x q), one column
+        # at a time so memory stays O(N q)
+        U_within = U - self.means[codes]
+        self.within = np.stack(
+            [indicator @ (U_within * U_within[:, [k]]) for k in range(U.shape[1])],
+            axis=2
+        )
+
+    @classmethod
+    def from_model(cls, model) -> "ClusterDesign":
+        """Build from a fitted RandomInterceptResults or MixedLMResults."""
+        if hasattr(model, "exog"):
+            return cls(model.endog.to_numpy(), model.exog.to_numpy(),
+                       model.groups, list(model.exog.columns))
+        return cls(model.model.endog, model.model.exog,
+                   model.model.groups, list(model.model.exog_names))
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.sizes)
+
+
+class _WeightedClusterStats:
+    """Sufficient statistics of one bootstrap replicate (for maximize_ratio)."""
+
+    def __init__(self, design: ClusterDesign, weights: np.ndarray, columns: List[int]):
+        cols = list(columns) + [len(design.names)]  # response is the last column
+        self.weights = weights
+        self.sizes = design.sizes
+        self.means = design.means[:, cols]
+        self.within = np.tensordot(weights, design.within[:, cols][:, :, cols], axes=1)
+        self.n_obs = float(weights @ design.sizes)
+
+    def profile(self, lams) -> dict:
+        lam = float(lams[0])
+        d = self.weights * self.sizes / (1.0 + self.sizes * lam)
+        Q = self.within + self.means.T @ (self.means * d[:, None])
+        logdet = float(self.weights @ np.log1p(self.sizes * lam))
+        return profile_from_cross_products(Q, logdet, self.n_obs)
+
+
+# =============================================================================
+# Replicates
+# =============================================================================
+
+def _fit_replicate(stats_: _WeightedClusterStats, start_ratio: float):
+    """REML fit of one replicate: (beta, lam)."""
+    lams, fit, _, _ = maximize_ratio(stats_, start_ratio)
+    return fit["beta"], float(lams[0])
+
+
+def _bootstrap_chunk(job: tuple, design: ClusterDesign) -> Tuple[np.ndarray, int]:
+    """
+    Run one chunk of replicates with its own random stream.
+
+    A draw whose design is singular is replaced by a fresh draw, so the
+    chunk still yields n_reps replicates (up to MAX_DRAWS_PER_REP draws
+    per replicate). Returns an (n_reps x (p + 1)) array of the fixed
+    effects of the full model and the ICC of the empty model (rows never
+    filled are NaN) and the number of draws that failed.
+    """
+    seed_seq, n_reps, start_full, start_empty, intercept = job
+    rng = np.random.default_rng(seed_seq)
+    all_columns = list(range(len(design.names)))
+
+    out = np.full((n_reps, len(design.names) + 1), np.nan)
+    r = n_failed = 0
+    while r < n_reps and n_failed < MAX_DRAWS_PER_REP * n_reps:
+        draws = rng.integers(0, design.n_groups, size=design.n_groups)
+        weights = np.bincount(draws, minlength=design.n_groups).astype(float)
+        try:
+            beta, _ = _fit_replicate(
+                _WeightedClusterStats(design, weights, all_columns), start_full
+            )
+            icc = np.nan
+            if intercept is not None:
+                _, lam = _fit_replicate(
+                    _WeightedClusterStats(design, weights, [intercept]), start_empty
+                )
+                icc = lam / (1.0 + lam)
+        except np.linalg.LinAlgError:
+            # e.g. a dummy category absent from every drawn buurt
+            n_failed += 1
+            continue
+        out[r, :-1] = beta
+        out[r, -1] = icc
+        r += 1
+    return out, n_failed
+
+
+# =============================================================================
+# Results
+# =============================================================================
+
+@dataclass
+class BootstrapResult:
+    """Cluster bootstrap replicates and percentile intervals."""
+    estimates: pd.DataFrame   # One row per replicate; params + "ICC"
+    summary: pd.DataFrame     # estimate, boot_se, ci_lower, ci_upper per term
+    n_boot: int               # Replicates obtained
+    n_failed: int             # Draws with a singular design, redrawn
+    confidence_level: float
+
+    def conf_int(self) -> pd.DataFrame:
+        """Percentile intervals (columns 0 and 1, as statsmodels conf_int)."""
+        return self.summary[["ci_lower", "ci_upper"]].set_axis([0, 1], axis=1)
+
+
+def bootstrap_two_level(
+    models: TwoLevelModels,
+    n_boot: int = BOOTSTRAP_REPS,
+    seed: int = BOOTSTRAP_SEED,
+    n_jobs: int = N_JOBS,
+    confidence_level: float = CONFIDENCE_LEVEL
+) -> BootstrapResult:
+    """
+    Cluster bootstrap of the final two-level model and the ICC.
+
+    Buurten are resampled with replacement. Each replicate refits m3 (all
+    fixed effects, including the key predictor) and the empty model (for
+    the ICC) on the same rows as m3. The point estimate of the ICC is the
+    empty model on those rows too, so it matches its interval. A draw with
+    a singular design (e.g. a category absent from every drawn buurt) is
+    replaced by a fresh draw rather than dropped, so the intervals are
+    not computed from a subset that excludes such draws.
+
+    Parameters
+    ----------
+    models : TwoLevelModels
+        Fitted models from fit_two_level_models
+    n_boot : int
+        Number of bootstrap replicates
+    seed : int
+        Seed for the random streams
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+    confidence_level : float
+        Coverage of the percentile intervals
+
+    Returns
+    -------
+    BootstrapResult
+        Replicate estimates and summary with percentile intervals
+    """
+    print(f"\nCluster bootstrap ({n_boot} replicates)...")
+
+    m0, m3 = models.m0_empty, models.m3_buurt_controls
+    design = ClusterDesign.from_model(m3)
+    intercept = design.names.index("Intercept") if "Intercept" in design.names else None
+
+    start_full = float(np.asarray(m3.cov_re_unscaled).ravel()[0])
+    start_empty = float(np.asarray(m0.cov_re_unscaled).ravel()[0])
+
+    n_chunks = int(np.ceil(n_boot / CHUNK_SIZE))
+    streams = np.random.SeedSequence(seed).spawn(n_chunks)
+    jobs = [
+        (stream, min(CHUNK_SIZE, n_boot - i * CHUNK_SIZE), start_full, start_empty, intercept)
+        for i, stream in enumerate(streams)
+    ]
+
+    n_workers = _resolve_n_jobs(n_jobs, len(jobs))
+    print(f"  {design.n_groups} buurten, {len(design.names)} fixed effects, "
+          f"{n_workers} worker(s)")
+    chunks = _map_with_shared_data(_bootstrap_chunk, jobs, design, n_workers)
+
+    estimates = pd.DataFrame(
+        np.vstack([out for out, _ in chunks]), columns=design.names + ["ICC"]
+    )
+    n_failed = sum(n for _, n in chunks)
+    missing = estimates[design.names].isna().any(axis=1)
+    estimates = estimates[~missing].reset_index(drop=True)
+
+    # Point ICC from the empty model on m3's rows, as in the replicates
+    # (m0 itself is fitted on every row with a DV)
+    point_icc = np.nan
+    if intercept is not None:
+        _, lam = _fit_replicate(
+            _WeightedClusterStats(design, np.ones(design.n_groups), [intercept]), start_empty
+        )
+        point_icc = lam / (1.0 + lam)
+    point = pd.Series(
+        list(m3.fe_params.reindex(design.names)) + [point_icc],
+        index=estimates.columns
+    )
+    tail = (1 - confidence_level) / 2
+    summary = pd.DataFrame({
+        "estimate": point,
+        "boot_se": estimates.std(ddof=1),
+        "ci_lower": estimates.quantile(tail),
+        "ci_upper": estimates.quantile(1 - tail),
+    })
+
+    if n_failed:
+        print(f"  {n_failed} draws had a singular design and were redrawn")
+    if missing.any():
+        print(f"  Warning: only {len(estimates)} of {n_boot} replicates succeeded "
+              f"after {MAX_DRAWS_PER_REP} draws per replicate")
+    for term in ["b_perc_low40_hh", "ICC"]:
+        if term in summary.index:
+            row = summary.loc[term]
+            print(f"  {term}: {row['estimate']:.3f} "
+                  f"[{row['ci_lower']:.3f}, {row['ci_upper']:.3f}] "
+                  f"(bootstrap SE={row['boot_se']:.3f})")
+
+    return BootstrapResult(
+        estimates=estimates,
+        summary=summary,
+        n_boot=len(estimates),
+        n_failed=n_failed,
+        confidence_level=confidence_level
+    )
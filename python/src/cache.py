@@ -0,0 +1,329 @@
+# =============================================================================
+# cache.py - Pipeline Stage Cache
+# =============================================================================
+"""
+Content-addressed on-disk cache for pipeline stages.
+
+Each stage result is stored under a key computed from:
+- the stage name
+- the source code of the module that defines the stage function, and of
+  every src module it imports, directly or through other src modules,
+  at the top or inside functions (e.g. analyze -> reml, instrument)
+- the values of the config.py settings that code refers to
+- fingerprints of the stage inputs (DataFrame contents, file contents, ...)
+
+A rerun therefore only recomputes stages whose inputs, settings or code
+changed. Outputs of cached stages are fingerprinted by their own key, so
+large intermediate frames are not re-hashed when passed to the next stage.
+
+Classes:
+    StageCache: Memoize pipeline stage calls on disk
+"""
+
+import ast
+import hashlib
+import inspect
+import pickle
+import dataclasses
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import config
+from config import CACHE_DIR
+from src.instrument import RunLog, count_rows
+
+
+# The pipeline package; stage keys cover the source of its modules
+SRC_PACKAGE = __name__.split(".")[0]
+SRC_DIR = Path(__file__).parent
+
+
+class StageCache:
+    """
+    Memoize pipeline stages on disk, keyed by a hash of their inputs.
+
+    Parameters
+    ----------
+    cache_dir : Path
+        Directory for cached stage results
+    enabled : bool
+        If False, stages are always recomputed and nothing is written
+    run_log : RunLog, optional
+        If given, every stage is timed in it (cache hits included)
+
+    Examples
+    --------
+    >>> cache = StageCache()
+    >>> survey = cache.run("load_survey", load_survey_data, SURVEY_PATH)
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = CACHE_DIR,
+        enabled: bool = True,
+        run_log: Optional[RunLog] = None
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+        self.run_log = run_log
+        self.hits = []
+        self.misses = []
+        # id(output) -> (output, key); the output is kept alive so ids stay unique
+        self._produced: Dict[int, Tuple[Any, str]] = {}
+
+    # -------------------------------------------------------------------------
+    # Public API
+    # -------------------------------------------------------------------------
+
+    def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Return the cached result of func(*args, **kwargs), computing it if needed.
+
+        Parameters
+        ----------
+        name : str
+            Stage name (used in the cache file name and progress output)
+        func : callable
+            Stage function
+        *args, **kwargs
+            Arguments passed to func
+
+        Returns
+        -------
+        Any
+            Stage result
+        """
+        if self.run_log is None:
+            return self._run(name, func, *args, **kwargs)
+
+        rows_in = next((count_rows(a) for a in args if count_rows(a) is not None), None)
+        n_hits = len(self.hits)
+        with self.run_log.stage(name, rows_in=rows_in) as record:
+            result = self._run(name, func, *args, **kwargs)
+            record.rows_out = count_rows(result)
+            record.cached = len(self.hits) > n_hits
+        return result
+
+    def _run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Cache lookup / computation behind run()."""
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        try:
+            key = self._stage_key(name, func, args, kwargs)
+        except _Unhashable as e:
+            print(f"  [cache] {name}: not cacheable ({e}), recomputing")
+            return func(*args, **kwargs)
+
+        path = self.cache_dir / f"{name}-{key[:16]}.pkl"
+
+        if path.exists():
+            try:
+                with open(path, "rb") as f:
+                    result = pickle.load(f)
+                print(f"  [cache] {name}: reusing cached result")
+                self.hits.append(name)
+                self._remember(result, key)
+                return result
+            except Exception as e:
+                print(f"  [cache] {name}: could not read cache ({e}), recomputing")
+
+        result = func(*args, **kwargs)
+        self.misses.append(name)
+        self._store(name, path, result)
+        self._remember(result, key)
+        return result
+
+    def clear(self) -> int:
+        """
+        Delete all cached stage results.
+
+        Returns
+        -------
+        int
+            Number of files removed
+        """
+        if not self.cache_dir.exists():
+            return 0
+        removed = 0
+        for path in self.cache_dir.glob("*.pkl"):
+            path.unlink()
+            removed += 1
+        print(f"Cleared {removed} cached stage results from {self.cache_dir}")
+        return removed
+
+    def summary(self) -> str:
+        """One-line summary of cache hits and misses."""
+        return (f"Stage cache: {len(self.hits)} reused, "
+                f"{len(self.misses)} recomputed")
+
+    # -------------------------------------------------------------------------
+    # Keys and fingerprints
+    # -------------------------------------------------------------------------
+
+    def _stage_key(self, name: str, func: Callable, args: tuple, kwargs: dict) -> str:
+        """Hash the stage name, code, relevant settings and inputs."""
+        h = hashlib.sha256()
+        h.update(name.encode())
+
+        source = _stage_source(inspect.getmodule(func))
+        h.update(func.__qualname__.encode())
+        h.update(source.encode())
+
+        # Settings from config.py that the stage's code refers to
+        for setting in sorted(_config_settings()):
+            if setting in source:
+                h.update(setting.encode())
+                h.update(repr(getattr(config, setting)).encode())
+
+        for arg in args:
+            h.update(self._fingerprint(arg).encode())
+        for k in sorted(kwargs):
+            h.update(k.encode())
+            h.update(self._fingerprint(kwargs[k]).encode())
+
+        return h.hexdigest()
+
+    def _fingerprint(self, obj: Any) -> str:
+        """Content fingerprint of a stage input."""
+        produced = self._produced.get(id(obj))
+        if produced is not None and produced[0] is obj:
+            return "stage:" + produced[1]
+
+        # Imported here so that cache maintenance (--clear-cache) starts fast
+        import pandas as pd
+        import numpy as np
+
+        h = hashlib.sha256()
+
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+            h.update(repr([str(t) for t in obj.dtypes]).encode())
+            h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        elif isinstance(obj, pd.Series):
+            h.update(f"{obj.name}:{obj.dtype}".encode())
+            h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        elif isinstance(obj, np.ndarray):
+            h.update(f"{obj.dtype}:{obj.shape}".encode())
+            h.update(np.ascontiguousarray(obj).tobytes())
+        elif isinstance(obj, Path):
+            h.update(str(obj).encode())
+            if obj.is_file():
+                with open(obj, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        h.update(block)
+        elif isinstance(obj, dict):
+            for k in sorted(obj, key=repr):
+                h.update(repr(k).encode())
+                h.update(self._fingerprint(obj[k]).encode())
+        elif isinstance(obj, (list, tuple)):
+            for item in obj:
+                h.update(self._fingerprint(item).encode())
+        elif dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+            h.update(type(obj).__qualname__.encode())
+            for field in dataclasses.fields(obj):
+                h.update(self._fingerprint(getattr(obj, field.name)).encode())
+        elif obj is None or isinstance(obj, (bool, int, float, str)):
+            h.update(repr(obj).encode())
+        else:
+            try:
+                h.update(pickle.dumps(obj))
+            except Exception as e:
+                raise _Unhashable(f"cannot fingerprint {type(obj).__name__}: {e}")
+
+        return h.hexdigest()
+
+    # -------------------------------------------------------------------------
+    # Storage
+    # -------------------------------------------------------------------------
+
+    def _store(self, name: str, path: Path, result: Any) -> None:
+        """Write a stage result, replacing older entries for the same stage."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        for old in self.cache_dir.glob(f"{name}-*.pkl"):
+            old.unlink()
+
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(path)
+        except Exception as e:
+            print(f"  [cache] {name}: could not write cache ({e})")
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _remember(self, result: Any, key: str) -> None:
+        """Record that result was produced under key."""
+        self._produced[id(result)] = (result, key)
+
+
+class _Unhashable(Exception):
+    """Raised when a stage input cannot be fingerprinted."""
+
+
+def _stage_source(module) -> str:
+    """
+    Source of a stage's module and of every src module it depends on.
+
+    Imports are followed transitively, including imports inside function
+    bodies (heavy modules are often imported there), so an edit anywhere
+    in the code a stage can run changes its key.
+    """
+    if module is None:
+        return ""
+    try:
+        path = Path(inspect.getsourcefile(module))
+    except TypeError:
+        return ""
+
+    sources = [path.read_text()]
+    seen = set()
+    todo = list(_imported_src_modules(path))
+    while todo:
+        name = todo.pop()
+        dep = SRC_DIR / f"{name}.py"
+        if name in seen or dep == path or not dep.is_file():
+            continue
+        seen.add(name)
+        todo.extend(_imported_src_modules(dep))
+    sources += [(SRC_DIR / f"{name}.py").read_text() for name in sorted(seen)]
+    return "".join(sources)
+
+
+def _imported_src_modules(path: Path) -> Tuple[str, ...]:
+    """Names of the src modules a file imports anywhere (e.g. "reml")."""
+    stat = path.stat()
+    return _parse_src_imports(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=None)
+def _parse_src_imports(path: str, mtime_ns: int, size: int) -> Tuple[str, ...]:
+    """Parse a file's imports once per version (mtime and size) of the file."""
+    tree = ast.parse(Path(path).read_text())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            # "from src import reml" imports modules by their short name
+            modules = [node.module] + (
+                [f"{node.module}.{alias.name}" for alias in node.names]
+                if node.module == SRC_PACKAGE else []
+            )
+        else:
+            continue
+        for module in modules:
+            parts = module.split(".")
+            if len(parts) == 2 and parts[0] == SRC_PACKAGE:
+                names.add(parts[1])
+    return tuple(sorted(names))
+
+
+def _config_settings() -> list:
+    """Names of the upper-case settings defined in config.py."""
+    return [name for name in dir(config) if name.isupper()]
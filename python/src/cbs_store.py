@@ -0,0 +1,264 @@
+# =============================================================================
+# cbs_store.py - Local Multi-Year CBS Indicator Store
+# =============================================================================
+"""
+Local Parquet store of CBS "Kerncijfers wijken en buurten" tables.
+
+Every (year, table) pair is one partition file, e.g.
+data/cbs/84286NED_2018.parquet. A refresh downloads only the partitions
+that are missing, so adding a year to CBS_TABLES costs one download and
+rerunning the pipeline costs none. Partitions are written to a temporary
+file and renamed, so an interrupted download never leaves a partial one.
+
+The API client is pluggable: by default the cbsodata package is used;
+MockCBSClient serves tables from local DataFrames or files for offline
+testing.
+
+Classes:
+    CBSStore: Incrementally refreshed Parquet store of CBS tables
+    MockCBSClient: Offline stand-in for the cbsodata API
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import CBS_STORE_DIR, CBS_TABLES
+from src.extract import _standardize_cbs_columns
+
+
+# =============================================================================
+# API Clients
+# =============================================================================
+
+def _cbsodata_client():
+    try:
+        import cbsodata
+    except ImportError:
+        raise ImportError("cbsodata not installed. Run: pip install cbsodata")
+    return cbsodata
+
+
+class MockCBSClient:
+    """
+    Offline stand-in for the cbsodata module.
+
+    Implements get_data and get_meta for the tables it was given and
+    records every get_data call, so tests can check what was downloaded.
+
+    Parameters
+    ----------
+    tables : dict
+        Table ID -> DataFrame with the table's raw (CBS) columns
+    meta : dict, optional
+        Table ID -> list of DataProperties records
+
+    Examples
+    --------
+    >>> admin = pd.read_csv("data/raw/indicators_buurt_wijk_gemeente.csv")
+    >>> client = MockCBSClient({"84286NED": admin})
+    >>> store = CBSStore(tmp_dir, client=client)
+    >>> store.refresh({2018: "84286NED"})
+    """
+
+    def __init__(
+        self,
+        tables: Dict[str, pd.DataFrame],
+        meta: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    ):
+        self.tables = dict(tables)
+        self.meta = dict(meta or {})
+        self.calls: List[str] = []
+
+    @classmethod
+    def from_directory(cls, path: Path) -> "MockCBSClient":
+        """Serve every <table_id>.csv / <table_id>.parquet file in path."""
+        tables = {}
+        for file in sorted(Path(path).iterdir()):
+            if file.suffix == ".csv":
+                tables[file.stem] = pd.read_csv(file)
+            elif file.suffix == ".parquet":
+                tables[file.stem] = pd.read_parquet(file)
+        return cls(tables)
+
+    def get_data(self, table_id: str, **kwargs) -> List[Dict[str, Any]]:
+        """Table rows as a list of records (as cbsodata returns them)."""
+        self.calls.append(table_id)
+        if table_id not in self.tables:
+            raise KeyError(f"Table {table_id} not available in mock client")
+        return self.tables[table_id].to_dict("records")
+
+    def get_meta(self, table_id: str, name: str) -> List[Dict[str, Any]]:
+        """Metadata records (only DataProperties is served)."""
+        if name != "DataProperties":
+            return []
+        if table_id in self.meta:
+            return self.meta[table_id]
+        return [
+            {"Key": col, "Title": col, "Description": "", "Unit": ""}
+            for col in self.tables.get(table_id, pd.DataFrame()).columns
+        ]
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class CBSStore:
+    """
+    Local Parquet store of CBS tables, one partition per (year, table).
+
+    Parameters
+    ----------
+    root : Path
+        Directory holding the partition files
+    client : object, optional
+        Object with get_data(table_id) like the cbsodata module
+        (default: cbsodata, imported on first download)
+    """
+
+    def __init__(self, root: Path = CBS_STORE_DIR, client: Any = None):
+        self.root = Path(root)
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _cbsodata_client()
+        return self._client
+
+    def partition_path(self, year: int, table_id: str) -> Path:
+        """Path of the partition for one (year, table)."""
+        return self.root / f"{table_id}_{year}.parquet"
+
+    def partitions(self) -> pd.DataFrame:
+        """
+        Partitions present in the store.
+
+        Returns
+        -------
+        pd.DataFrame
+            year, table_id and path of each partition file
+        """
+        rows = []
+        for path in sorted(self.root.glob("*_*.parquet")):
+            table_id, year = path.stem.rsplit("_", 1)
+            rows.append({"year": int(year), "table_id": table_id, "path": path})
+        return pd.DataFrame(rows, columns=["year", "table_id", "path"])
+
+    def missing(self, tables: Dict[int, str] = CBS_TABLES) -> Dict[int, str]:
+        """The (year, table) pairs in tables that have no partition yet."""
+        return {
+            year: table_id for year, table_id in tables.items()
+            if not self.partition_path(year, table_id).exists()
+        }
+
+    def refresh(
+        self,
+        tables: Dict[int, str] = CBS_TABLES,
+        force: bool = False
+    ) -> List[Path]:
+        """
+        Download the partitions that are missing from the store.
+
+        Parameters
+        ----------
+        tables : dict
+            Year -> CBS table ID
+        force : bool
+            If True, download every partition again
+
+        Returns
+        -------
+        list of Path
+            Partitions written in this refresh
+
+        Raises
+        ------
+        ValueError
+            If a table has no rows for its year (nothing is written for it)
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("pyarrow not installed. Run: pip install pyarrow")
+
+        todo = dict(tables) if force else self.missing(tables)
+        print(f"Refreshing CBS store in {self.root}: "
+              f"{len(tables) - len(todo)} of {len(tables)} partitions present")
+
+        written = []
+        for year, table_id in sorted(todo.items()):
+            written.append(self._download_partition(year, table_id))
+        return written
+
+    def _download_partition(self, year: int, table_id: str) -> Path:
+        """Download one table, keep one year and write it as a partition."""
+        print(f"  Downloading CBS table {table_id} ({year})...")
+        data = pd.DataFrame(self.client.get_data(table_id))
+
+        # Multi-year tables carry a Perioden column ("2018JJ00", "2018", ...)
+        if "Perioden" in data.columns:
+            data = data[data["Perioden"].astype(str).str.contains(str(year))]
+        if len(data) == 0:
+            # Writing an empty partition would mark the year as present
+            raise ValueError(
+                f"CBS table {table_id} has no rows for {year}; "
+                f"check the year -> table mapping (CBS_TABLES)"
+            )
+
+        data = _standardize_cbs_columns(data.reset_index(drop=True))
+        data.insert(0, "year", np.int16(year))
+        data.insert(1, "table_id", table_id)
+
+        path = self.partition_path(year, table_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        data.to_parquet(tmp_path, index=False)
+        tmp_path.replace(path)
+
+        print(f"    {len(data)} rows -> {path.name}")
+        return path
+
+    def load(
+        self,
+        years: Optional[List[int]] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Read partitions as one panel.
+
+        Parameters
+        ----------
+        years : list of int, optional
+            Years to read (default: all partitions in the store)
+        columns : list, optional
+            Columns to read; year and table_id are always included
+
+        Returns
+        -------
+        pd.DataFrame
+            Rows of all selected partitions, with year and table_id columns
+        """
+        parts = self.partitions()
+        if years is not None:
+            parts = parts[parts["year"].isin(years)]
+        if len(parts) == 0:
+            raise FileNotFoundError(f"No CBS partitions for years {years} in {self.root}")
+
+        if columns is not None:
+            columns = ["year", "table_id"] + [c for c in columns if c not in ("year", "table_id")]
+
+        frames = []
+        for path in parts["path"]:
+            # Not every year has every column; read what the partition has
+            if columns is not None:
+                import pyarrow.parquet as pq
+                available = set(pq.read_schema(path).names)
+                frames.append(pd.read_parquet(path, columns=[c for c in columns if c in available]))
+            else:
+                frames.append(pd.read_parquet(path))
+        return pd.concat(frames, ignore_index=True)
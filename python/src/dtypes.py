@@ -0,0 +1,264 @@
+# =============================================================================
+# dtypes.py - Compact Column Types for the Analysis Frame
+# =============================================================================
+"""
+Choose the smallest dtype that holds each column of the analysis frame.
+
+plan_dtypes inspects all numeric columns in one pass over a float block:
+- integer-valued columns (Likert items, flags, codes, counts) become
+  int8/int16/int32, or nullable Int8/Int16/Int32 if they have missing values
+- other floats become float32 if every value round-trips within
+  DTYPE_FLOAT32_RTOL (relative error), else stay float64
+- geographic IDs become categoricals of zero-padded codes (as in storage)
+- text columns with few distinct values (unit names) become categoricals
+
+The pipeline fits its models on the float64 frame and applies the plan to
+the frame it saves, so the Parquet file (and every dashboard session that
+loads it) holds the compact types.
+
+Classes:
+    DtypeReport: Memory per column before and after
+Functions:
+    plan_dtypes: Target dtype of every column that can be narrowed
+    apply_dtypes: Convert columns to planned dtypes
+    dtype_report: Compare memory use of two versions of a frame
+    optimize_dtypes: Plan, apply and report in one step
+"""
+
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import DTYPE_FLOAT32_RTOL
+from src.geoindex import GEO_LEVELS, parse_geo_codes, geo_codes_to_categorical
+
+
+# Integer dtypes from small to large: (NumPy dtype, nullable pandas dtype)
+_INTEGER_DTYPES = [
+    (np.int8, "Int8"),
+    (np.int16, "Int16"),
+    (np.int32, "Int32"),
+    (np.int64, "Int64"),
+]
+
+# Geographic ID column -> zero-padded code length
+_GEO_ID_WIDTHS = {id_col: width for id_col, width, _ in GEO_LEVELS.values()}
+
+# Text columns become categoricals below this share of distinct values
+CATEGORY_MAX_UNIQUE_SHARE = 0.5
+
+
+# =============================================================================
+# Planning
+# =============================================================================
+
+def _integer_dtype(low: float, high: float, nullable: bool) -> str:
+    """Smallest integer dtype for values in [low, high]."""
+    for numpy_dtype, nullable_dtype in _INTEGER_DTYPES:
+        info = np.iinfo(numpy_dtype)
+        if info.min <= low and high <= info.max:
+            return nullable_dtype if nullable else np.dtype(numpy_dtype).name
+    return "float64"
+
+
+def plan_dtypes(
+    data: pd.DataFrame,
+    float32_rtol: float = DTYPE_FLOAT32_RTOL
+) -> Dict[str, str]:
+    """
+    Target dtype of every column that can be stored more compactly.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data
+    float32_rtol : float
+        Largest relative error a float column may get from float32
+        (0 = only columns that float32 holds exactly)
+
+    Returns
+    -------
+    dict
+        Column -> dtype name ("int8", "Int16", "float32", "category", ...);
+        columns that are already compact are not listed
+    """
+    plan = {}
+
+    numeric = [
+        col for col in data.columns
+        if col not in _GEO_ID_WIDTHS
+        and (pd.api.types.is_float_dtype(data[col]) or pd.api.types.is_integer_dtype(data[col]))
+        and not isinstance(data[col].dtype, pd.api.extensions.ExtensionDtype)
+    ]
+    if numeric:
+        # One float block for all numeric columns: column-wise reductions
+        block = data[numeric].to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = np.isfinite(block)
+        has_missing = np.isnan(block).any(axis=0)
+        all_finite = (finite | np.isnan(block)).all(axis=0)
+        with np.errstate(invalid="ignore"):
+            integral = all_finite & ((block == np.round(block)) | ~finite).all(axis=0)
+            low = np.where(finite, block, np.inf).min(axis=0)
+            high = np.where(finite, block, -np.inf).max(axis=0)
+            rounded = block.astype(np.float32).astype(np.float64)
+            error = np.abs(rounded - block) <= float32_rtol * np.abs(block)
+        fits_float32 = ((error | ~finite).all(axis=0)
+                        & (np.maximum(np.abs(low), np.abs(high)) <= np.finfo(np.float32).max))
+
+        for i, col in enumerate(numeric):
+            current = data[col].dtype.name
+            if integral[i] and finite[:, i].any():
+                target = _integer_dtype(low[i], high[i], bool(has_missing[i]))
+            elif pd.api.types.is_float_dtype(data[col]) and fits_float32[i]:
+                target = "float32"
+            else:
+                continue
+            if target != current and target != "float64":
+                plan[col] = target
+
+    for col in data.columns:
+        series = data[col]
+        if col in _GEO_ID_WIDTHS:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                plan[col] = "category"
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+            if series.nunique() <= CATEGORY_MAX_UNIQUE_SHARE * max(len(series), 1):
+                plan[col] = "category"
+    return plan
+
+
+# =============================================================================
+# Applying
+# =============================================================================
+
+def apply_dtypes(data: pd.DataFrame, plan: Dict[str, str]) -> pd.DataFrame:
+    """
+    Convert columns to their planned dtypes.
+
+    Integer targets are reached from the float values (missing -> <NA>);
+    geographic IDs become categoricals of zero-padded codes.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data (not modified)
+    plan : dict
+        Column -> dtype name, from plan_dtypes
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with converted columns, same column order
+    """
+    df = data.copy(deep=False)
+    for col, dtype in plan.items():
+        if col not in df.columns:
+            continue
+        if col in _GEO_ID_WIDTHS and dtype == "category":
+            df[col] = geo_codes_to_categorical(parse_geo_codes(df[col]), _GEO_ID_WIDTHS[col])
+        elif dtype[0] == "I":
+            # Nullable integers: build from the float values and a mask
+            values = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+            missing = np.isnan(values)
+            numpy_dtype = np.dtype(dtype.lower())
+            df[col] = pd.arrays.IntegerArray(
+                np.where(missing, 0, values).astype(numpy_dtype), missing
+            )
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+# =============================================================================
+# Reporting
+# =============================================================================
+
+@dataclass
+class DtypeReport:
+    """Memory use per column before and after a dtype change."""
+    table: pd.DataFrame     # column, dtype_before, dtype_after, bytes_before, bytes_after
+    bytes_before: int
+    bytes_after: int
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def summary(self) -> str:
+        """One-line summary: total memory before and after."""
+        share = self.bytes_saved / self.bytes_before * 100 if self.bytes_before else 0.0
+        return (f"{len(self.table)} columns: {self.bytes_before / 1e6:.1f} MB -> "
+                f"{self.bytes_after / 1e6:.1f} MB ({share:.0f}% saved)")
+
+
+def dtype_report(before: pd.DataFrame, after: pd.DataFrame) -> DtypeReport:
+    """
+    Compare the memory use of two versions of a frame.
+
+    Parameters
+    ----------
+    before, after : pd.DataFrame
+        The frame before and after a dtype change (same columns)
+
+    Returns
+    -------
+    DtypeReport
+        Per-column dtypes and bytes (deep memory usage), largest saving first
+    """
+    bytes_before = before.memory_usage(deep=True, index=False)
+    bytes_after = after.memory_usage(deep=True, index=False)
+    table = pd.DataFrame({
+        "column": list(before.columns),
+        "dtype_before": [str(t) for t in before.dtypes],
+        "dtype_after": [str(after[c].dtype) for c in before.columns],
+        "bytes_before": bytes_before.to_numpy(),
+        "bytes_after": bytes_after.reindex(before.columns).to_numpy(),
+    })
+    table = table.sort_values(
+        "bytes_before", key=lambda b: b - table["bytes_after"], ascending=False,
+        kind="stable"
+    ).reset_index(drop=True)
+    return DtypeReport(
+        table=table,
+        bytes_before=int(bytes_before.sum()),
+        bytes_after=int(bytes_after.sum()),
+    )
+
+
+def optimize_dtypes(
+    data: pd.DataFrame,
+    float32_rtol: Optional[float] = DTYPE_FLOAT32_RTOL
+) -> pd.DataFrame:
+    """
+    Store every column in the smallest dtype that holds its values.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data (not modified)
+    float32_rtol : float, optional
+        Largest relative error allowed for float32 columns;
+        None keeps all non-integer floats as float64
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with compact dtypes
+    """
+    print("Optimizing column types...")
+
+    plan = plan_dtypes(data, float32_rtol if float32_rtol is not None else -1.0)
+    optimized = apply_dtypes(data, plan)
+
+    report = dtype_report(data, optimized)
+    counts = pd.Series(list(plan.values())).value_counts()
+    print(f"  Converted {len(plan)} columns: "
+          + ", ".join(f"{n} {dtype}" for dtype, n in counts.items()))
+    print(f"  Memory: {report.summary()}")
+    return optimized
@@ -7,6 +7,7 @@ Functions for loading data from CBS API and local files.
 Functions:
     download_cbs_data: Download neighborhood statistics from CBS StatLine API
     get_cbs_metadata: Get variable descriptions from CBS
+    iter_survey_chunks: Stream the SCoRE survey in row chunks
     load_survey_data: Load SCoRE survey from Stata file
     load_admin_data: Load CBS administrative data (local or API)
     validate_raw_data: Basic validation of loaded data
@@ -15,14 +16,15 @@ Functions:
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import (
     SURVEY_COLUMNS, CBS_TABLE_ID, CBS_YEAR,
-    SURVEY_PATH, ADMIN_PATH
+    SURVEY_PATH, ADMIN_PATH, SURVEY_CHUNK_SIZE
 )
+from src.recode import count_invalid_codes
 
 
 # =============================================================================
@@ -162,46 +164,125 @@ def get_cbs_metadata(table_id: str = CBS_TABLE_ID) -> pd.DataFrame:
 # Survey Data Loading
 # =============================================================================
 
-def load_survey_data(path: Path = SURVEY_PATH) -> pd.DataFrame:
+def _import_pyreadstat():
+    try:
+        import pyreadstat
+    except ImportError:
+        raise ImportError("pyreadstat not installed. Run: pip install pyreadstat")
+    return pyreadstat
+
+
+def _survey_usecols(path: Path) -> List[str]:
+    """
+    Configured survey columns present in the Stata file.
+
+    Reads only the file header (no data rows).
+    """
+    pyreadstat = _import_pyreadstat()
+    _, meta = pyreadstat.read_dta(str(path), metadataonly=True)
+
+    cols_to_select = list(SURVEY_COLUMNS.keys())
+    available_cols = [c for c in cols_to_select if c in meta.column_names]
+    missing_cols = [c for c in cols_to_select if c not in meta.column_names]
+
+    print(f"  File has {meta.number_rows} respondents, {meta.number_columns} variables")
+    if missing_cols:
+        print(f"  Warning: Missing columns: {missing_cols}")
+    return available_cols
+
+
+def _prepare_survey_chunk(df: pd.DataFrame, first_id: int) -> pd.DataFrame:
+    """
+    Rename a chunk of raw survey rows and add respondent IDs.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Raw rows (Stata variable names)
+    first_id : int
+        respondent_id of the first row, so IDs run on across chunks
+    """
+    df = df.rename(columns=SURVEY_COLUMNS)
+    df["respondent_id"] = np.arange(first_id, first_id + len(df))
+    return df
+
+
+def iter_survey_chunks(
+    path: Path = SURVEY_PATH,
+    chunksize: int = 100_000
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream the SCoRE survey from the Stata file in row chunks.
+
+    Only the columns in SURVEY_COLUMNS are read, so memory is bounded by
+    chunksize x len(SURVEY_COLUMNS) regardless of the size of the wave.
+    Every chunk is renamed and numbered as load_survey_data does.
+
+    Parameters
+    ----------
+    path : Path
+        Path to .dta file
+    chunksize : int
+        Rows per chunk
+
+    Yields
+    ------
+    pd.DataFrame
+        Survey rows with English column names and respondent_id
+    """
+    pyreadstat = _import_pyreadstat()
+    usecols = _survey_usecols(path)
+
+    n_rows = 0
+    n_geo = 0
+    reader = pyreadstat.read_file_in_chunks(
+        pyreadstat.read_dta, str(path), chunksize=chunksize, usecols=usecols
+    )
+    for df, _ in reader:
+        chunk = _prepare_survey_chunk(df, n_rows + 1)
+        n_rows += len(chunk)
+        if "Buurtcode" in chunk.columns:
+            n_geo += int(chunk["Buurtcode"].notna().sum())
+        yield chunk
+
+    if n_rows and "Buurtcode" in SURVEY_COLUMNS.values():
+        print(f"  Streamed {n_rows} respondents, "
+              f"{n_geo / n_rows * 100:.1f}% with geocode")
+
+
+def load_survey_data(
+    path: Path = SURVEY_PATH,
+    chunksize: Optional[int] = SURVEY_CHUNK_SIZE
+) -> pd.DataFrame:
     """
     Load SCoRE survey data from Stata file.
 
-    Selects and renames key variables for analysis.
+    Selects and renames the variables of the survey codebook
+    (SURVEY_CODEBOOK in config.py). Only those columns are read from disk.
 
     Parameters
     ----------
     path : Path
         Path to .dta file
+    chunksize : int, optional
+        If given, read the file in chunks of this many rows
+        (see iter_survey_chunks); None reads it in one pass
 
     Returns
     -------
     pd.DataFrame
         Survey data with English column names
     """
-    try:
-        import pyreadstat
-    except ImportError:
-        raise ImportError("pyreadstat not installed. Run: pip install pyreadstat")
+    pyreadstat = _import_pyreadstat()
 
     print(f"Loading survey data from {path}...")
 
-    # Read Stata file
-    df, meta = pyreadstat.read_dta(str(path))
-    print(f"  Loaded {len(df)} respondents, {len(df.columns)} variables")
-
-    # Select and rename columns
-    cols_to_select = list(SURVEY_COLUMNS.keys())
-    available_cols = [c for c in cols_to_select if c in df.columns]
-    missing_cols = [c for c in cols_to_select if c not in df.columns]
-
-    if missing_cols:
-        print(f"  Warning: Missing columns: {missing_cols}")
-
-    df = df[available_cols].copy()
-    df = df.rename(columns=SURVEY_COLUMNS)
-
-    # Add respondent ID
-    df["respondent_id"] = range(1, len(df) + 1)
+    if chunksize:
+        df = pd.concat(list(iter_survey_chunks(path, chunksize)), ignore_index=True)
+    else:
+        usecols = _survey_usecols(path)
+        df, meta = pyreadstat.read_dta(str(path), usecols=usecols)
+        df = _prepare_survey_chunk(df, 1)
 
     print(f"  Selected {len(df.columns)} columns")
     return df
@@ -273,6 +354,7 @@ def validate_raw_data(
     results = {
         "survey_n": len(survey),
         "survey_complete_geo": 0,
+        "invalid_codes": {},
         "admin_n": len(admin),
         "admin_buurt": 0,
         "admin_wijk": 0,
@@ -294,6 +376,11 @@ def validate_raw_data(
         results["issues"].append("No Buurtcode column in survey")
         results["passed"] = False
 
+    # Values outside the codebook (labels, valid ranges, missing codes)
+    results["invalid_codes"] = count_invalid_codes(survey)
+    if results["invalid_codes"]:
+        print(f"  Warning: values outside the codebook: {results['invalid_codes']}")
+
     # Admin checks
     if "region_type" in admin.columns:
         type_counts = admin["region_type"].value_counts()
@@ -27,6 +27,7 @@ import warnings
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 from config import DATA_DIR, RAW_DIR, FIGURES_DIR
+from src.geoindex import GeoIndex
 
 
 # =============================================================================
@@ -115,39 +116,21 @@ def add_geographic_names(
     """
     print("\nAdding geographic names...")
 
-    # Create lookup tables
-    lookups = create_name_lookup(admin_data)
+    # Names aligned to integer-encoded units: one take per level
+    index = GeoIndex.from_admin_names(admin_data)
 
     result = data.copy()
 
-    # Add buurt names
-    if 'buurt' in lookups and 'buurt_id' in result.columns:
-        buurt_names = lookups['buurt'][['buurt_id', 'buurt_name']].copy()
-        result['buurt_id'] = result['buurt_id'].astype(str).str.strip()
-        buurt_names['buurt_id'] = buurt_names['buurt_id'].astype(str).str.strip()
-        result = result.merge(buurt_names, on='buurt_id', how='left')
-        n_matched = result['buurt_name'].notna().sum()
-        print(f"  Buurt names: {n_matched}/{len(result)} matched ({100*n_matched/len(result):.1f}%)")
-
-    # Add wijk names
-    if 'wijk' in lookups and 'wijk_id' in result.columns:
-        wijk_names = lookups['wijk'][['wijk_id', 'wijk_name']].copy()
-        result['wijk_id'] = result['wijk_id'].astype(str).str.strip()
-        wijk_names['wijk_id'] = wijk_names['wijk_id'].astype(str).str.strip()
-        result = result.merge(wijk_names, on='wijk_id', how='left')
-        n_matched = result['wijk_name'].notna().sum()
-        print(f"  Wijk names: {n_matched}/{len(result)} matched ({100*n_matched/len(result):.1f}%)")
-
-    # Add gemeente names (from buurt lookup or gemeente lookup)
-    if 'buurt' in lookups and 'gemeente_id' in result.columns:
-        # Get unique gemeente_id -> gemeente_name mapping
-        gemeente_names = lookups['buurt'][['gemeente_id', 'gemeente_name']].drop_duplicates('gemeente_id')
-        result['gemeente_id'] = result['gemeente_id'].astype(str).str.strip()
-        gemeente_names['gemeente_id'] = gemeente_names['gemeente_id'].astype(str).str.strip()
-        if 'gemeente_name' not in result.columns:
-            result = result.merge(gemeente_names, on='gemeente_id', how='left')
-        n_matched = result['gemeente_name'].notna().sum()
-        print(f"  Gemeente names: {n_matched}/{len(result)} matched ({100*n_matched/len(result):.1f}%)")
+    for level, name_col in [("buurt", "buurt_name"), ("wijk", "wijk_name"),
+                            ("gemeente", "gemeente_name")]:
+        id_col = f"{level}_id"
+        if name_col not in index.columns[level] or id_col not in result.columns:
+            continue
+        if name_col not in result.columns:
+            result[name_col] = index.attach(result, level, [name_col])[name_col]
+        n_matched = result[name_col].notna().sum()
+        print(f"  {level.capitalize()} names: {n_matched}/{len(result)} matched "
+              f"({100*n_matched/len(result):.1f}%)")
 
     return result
 
@@ -0,0 +1,514 @@
+# =============================================================================
+# geoindex.py - Integer-Encoded Geographic Index
+# =============================================================================
+"""
+Dense integer index of the buurt -> wijk -> gemeente hierarchy.
+
+CBS codes are numeric (buurt 8 digits, wijk = buurt // 100, gemeente =
+buurt // 10000), so every unit can be mapped to a dense int32 id by a
+binary search over its level's sorted codes. Admin indicators and names
+are stored as NumPy arrays aligned to those ids; attaching them to survey
+rows is then one encode and one `take` per level (the float indicators
+are stacked into one block) instead of a hash join on string IDs.
+
+Survey rows can also be grouped by unit: ClusterIndex sorts the rows by
+cluster once, after which cluster means of any number of columns take one
+sorted reduce.
+
+Classes:
+    GeoIndex: Geographic hierarchy with aligned per-unit columns
+    ClusterIndex: Rows sorted by cluster, for per-cluster means
+Functions:
+    parse_geo_codes: Convert geographic IDs (strings, numbers) to int codes
+    geo_codes_to_categorical: Render int codes as zero-padded categorical IDs
+    cluster_index: Cached ClusterIndex of geographic IDs
+"""
+
+import hashlib
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+# Geographic levels, finest first: level -> (ID column, code length, CBS prefix)
+GEO_LEVELS = {
+    "buurt": ("buurt_id", 8, "BU"),
+    "wijk": ("wijk_id", 6, "WK"),
+    "gemeente": ("gemeente_id", 4, "GM"),
+}
+
+# Code of a missing or unparseable ID
+MISSING_CODE = -1
+
+
+# =============================================================================
+# Code Parsing
+# =============================================================================
+
+def parse_geo_codes(ids) -> np.ndarray:
+    """
+    Convert geographic IDs to int64 codes (MISSING_CODE where missing).
+
+    Accepts zero-padded strings ("03630000"), numbers (3630000.0) and
+    categoricals; for categoricals only the categories are parsed.
+
+    Parameters
+    ----------
+    ids : array-like
+        Geographic IDs
+
+    Returns
+    -------
+    np.ndarray
+        int64 codes
+    """
+    ids = pd.Series(ids) if not isinstance(ids, pd.Series) else ids
+
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        category_codes = np.append(parse_geo_codes(ids.cat.categories.to_series()),
+                                   MISSING_CODE)
+        # Missing values have category code -1, which picks the appended entry
+        return category_codes[ids.cat.codes.to_numpy()]
+
+    if pd.api.types.is_numeric_dtype(ids):
+        values = ids.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        # Parse each distinct string once
+        positions, uniques = pd.factorize(ids)
+        parsed = pd.to_numeric(pd.Series(uniques, dtype=object), errors="coerce")
+        values = np.append(parsed.to_numpy(dtype=float), np.nan)[positions]
+
+    codes = np.full(len(values), MISSING_CODE, dtype=np.int64)
+    valid = np.isfinite(values)
+    codes[valid] = values[valid].astype(np.int64)
+    return codes
+
+
+def geo_codes_to_categorical(codes: np.ndarray, width: int) -> pd.Categorical:
+    """
+    Zero-padded string IDs for int codes, as a categorical.
+
+    Only the distinct codes are rendered as strings; rows hold integer
+    category codes.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        int codes, MISSING_CODE for missing
+    width : int
+        Length of the zero-padded ID (8 buurt, 6 wijk, 4 gemeente)
+
+    Returns
+    -------
+    pd.Categorical
+        IDs such as "03630000", NaN where the code is missing
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    valid = codes >= 0
+    uniques, inverse = np.unique(codes[valid], return_inverse=True)
+
+    category_codes = np.full(len(codes), -1, dtype=np.int32)
+    category_codes[valid] = inverse
+    categories = [f"{code:0{width}d}" for code in uniques]
+    return pd.Categorical.from_codes(category_codes, categories=categories)
+
+
+def _take(values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """
+    values[..., rows], with NaN where rows is MISSING_CODE (as a left join).
+
+    Units are the last axis, so a (columns x units) block gives a
+    (columns x rows) result whose transpose pandas can use without copying.
+    """
+    out = values.take(np.maximum(rows, 0), axis=-1)
+    missing = rows < 0
+    if missing.any():
+        if out.dtype.kind in "iub":
+            out = out.astype(float)
+        elif out.dtype.kind != "f":
+            out = out.astype(object)
+        out[..., missing] = np.nan
+    return out
+
+
+# =============================================================================
+# Geographic Index
+# =============================================================================
+
+class GeoIndex:
+    """
+    Integer-encoded buurt/wijk/gemeente hierarchy with aligned columns.
+
+    Parameters
+    ----------
+    codes : dict
+        Level name -> CBS codes of the units at that level (int, any order)
+
+    Attributes
+    ----------
+    codes : dict
+        Level -> sorted unique int64 codes; a unit's dense id is its position
+    parent : dict
+        "buurt" / "wijk" -> dense id of the enclosing wijk / gemeente
+        (MISSING_CODE if that unit is not in the index)
+    columns : dict
+        Level -> {column name: array aligned to the dense ids}
+    """
+
+    def __init__(self, codes: Dict[str, np.ndarray]):
+        self.codes = {}
+        for level in GEO_LEVELS:
+            level_codes = np.asarray(codes.get(level, []), dtype=np.int64)
+            self.codes[level] = np.unique(level_codes[level_codes >= 0])
+        self.parent = {
+            "buurt": self._lookup("wijk", self.codes["buurt"] // 100),
+            "wijk": self._lookup("gemeente", self.codes["wijk"] // 100),
+        }
+        self.columns: Dict[str, Dict[str, np.ndarray]] = {level: {} for level in GEO_LEVELS}
+        # Level -> (names, units x columns array) of the float columns
+        self._blocks: Dict[str, tuple] = {}
+
+    # -------------------------------------------------------------------------
+    # Construction
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def from_admin_by_level(cls, admin_by_level: Dict[str, pd.DataFrame]) -> "GeoIndex":
+        """
+        Index the per-level admin tables from prepare_admin_by_level.
+
+        Every indicator column is stored as an array aligned to the ids.
+        """
+        tables = {
+            level: admin_by_level[level] for level in GEO_LEVELS
+            if level in admin_by_level and len(admin_by_level[level]) > 0
+        }
+
+        index = cls({
+            level: parse_geo_codes(table[GEO_LEVELS[level][0]])
+            for level, table in tables.items()
+        })
+        for level, table in tables.items():
+            id_col = GEO_LEVELS[level][0]
+            index.add_columns(level, table[id_col],
+                              table.drop(columns=id_col).to_dict("series"))
+        return index
+
+    @classmethod
+    def from_admin_names(cls, admin: pd.DataFrame) -> "GeoIndex":
+        """
+        Index unit names from raw CBS data.
+
+        Stores buurt_name, wijk_name (from WijkenEnBuurten) and
+        gemeente_name (from the buurt rows' gemeente_name column).
+        """
+        region_code = None
+        for col in ["region_code", "Codering_3", "WijkenEnBuurten"]:
+            if col in admin.columns:
+                region_code = admin[col].astype(str).str.strip()
+                break
+        if region_code is None:
+            return cls({})
+
+        prefix = region_code.str[:2]
+        number = parse_geo_codes(region_code.str[2:].str.strip())
+        rows = {level: (prefix == GEO_LEVELS[level][2]).to_numpy() for level in GEO_LEVELS}
+
+        index = cls({
+            "buurt": number[rows["buurt"]],
+            "wijk": number[rows["wijk"]],
+            "gemeente": number[rows["buurt"]] // 10000,
+        })
+
+        if "WijkenEnBuurten" in admin.columns:
+            names = admin["WijkenEnBuurten"].str.strip()
+            for level in ["buurt", "wijk"]:
+                index.add_columns(level, number[rows[level]],
+                                  {f"{level}_name": names[rows[level]]})
+
+        if "gemeente_name" in admin.columns:
+            index.add_columns("gemeente", number[rows["buurt"]] // 10000,
+                              {"gemeente_name": admin["gemeente_name"].str.strip()[rows["buurt"]]})
+        return index
+
+    def add_columns(self, level: str, ids, columns: Dict[str, pd.Series]) -> None:
+        """
+        Store per-unit columns for one level.
+
+        Parameters
+        ----------
+        level : str
+            "buurt", "wijk" or "gemeente"
+        ids : array-like
+            ID of every row of the columns
+        columns : dict
+            Column name -> values (same length as ids); for repeated IDs the
+            first value is kept
+        """
+        rows = self._lookup(level, parse_geo_codes(ids))
+        found = rows >= 0
+        rows = rows[found]
+        # Keep the first occurrence of each unit
+        rows, first = np.unique(rows, return_index=True)
+
+        n_units = len(self.codes[level])
+        for name, values in columns.items():
+            values = np.asarray(values)[found][first]
+            if len(rows) == n_units:
+                aligned = np.empty(n_units, dtype=values.dtype)
+            elif values.dtype.kind in "iubf":
+                # Units without a value get NaN, as in a left join
+                aligned = np.full(n_units, np.nan)
+            else:
+                aligned = np.full(n_units, np.nan, dtype=object)
+            aligned[rows] = values
+            self.columns[level][name] = aligned
+        self._blocks.pop(level, None)
+
+    # -------------------------------------------------------------------------
+    # Lookup
+    # -------------------------------------------------------------------------
+
+    def _lookup(self, level: str, codes: np.ndarray) -> np.ndarray:
+        """Dense ids of int codes (MISSING_CODE if not in the index)."""
+        level_codes = self.codes[level]
+        pos = np.searchsorted(level_codes, codes)
+        pos = np.minimum(pos, max(len(level_codes) - 1, 0))
+        found = (codes >= 0) & (len(level_codes) > 0)
+        if len(level_codes):
+            found &= level_codes[pos] == codes
+        return np.where(found, pos, MISSING_CODE).astype(np.int32)
+
+    def encode(self, level: str, ids) -> np.ndarray:
+        """
+        Dense int32 ids of geographic IDs at one level.
+
+        Parameters
+        ----------
+        level : str
+            "buurt", "wijk" or "gemeente"
+        ids : array-like
+            Geographic IDs (strings, numbers or categorical)
+
+        Returns
+        -------
+        np.ndarray
+            int32 dense ids, MISSING_CODE for missing or unknown units
+        """
+        if isinstance(getattr(ids, "dtype", None), pd.CategoricalDtype):
+            # Look up each category once; missing rows (code -1) pick the
+            # appended MISSING_CODE
+            categories = self._lookup(level, parse_geo_codes(ids.cat.categories.to_series()))
+            return np.append(categories, MISSING_CODE).astype(np.int32)[ids.cat.codes.to_numpy()]
+        return self._lookup(level, parse_geo_codes(ids))
+
+    def attach(
+        self,
+        data: pd.DataFrame,
+        level: str,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Per-unit columns for every row of data, as a left join would give.
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Rows with the level's ID column
+        level : str
+            "buurt", "wijk" or "gemeente"
+        columns : list, optional
+            Stored columns to attach (default: all for this level)
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per row of data (same index), one column per attached column
+        """
+        id_col = GEO_LEVELS[level][0]
+        rows = self.encode(level, data[id_col])
+        names = list(self.columns[level]) if columns is None else list(columns)
+
+        # Float columns (the indicators) come from one take on the block
+        block_names, block = self._float_block(level)
+        wanted = [name for name in block_names if name in set(names)]
+        if wanted and wanted != block_names:
+            block = block[[block_names.index(name) for name in wanted]]
+        result = pd.DataFrame(
+            _take(block, rows).T if wanted else np.empty((len(rows), 0)),
+            columns=wanted, index=data.index, copy=False
+        )
+
+        for name in names:
+            if name not in result.columns:
+                result[name] = _take(self.columns[level][name], rows)
+        return result if list(result.columns) == names else result[names]
+
+    def _float_block(self, level: str) -> tuple:
+        """Names and stacked (columns x units) array of a level's float columns."""
+        if level not in self._blocks:
+            names = [name for name, values in self.columns[level].items()
+                     if values.dtype.kind == "f"]
+            block = (np.vstack([self.columns[level][name] for name in names])
+                     if names else np.empty((0, self.n_units(level))))
+            self._blocks[level] = (names, block)
+        return self._blocks[level]
+
+    def n_units(self, level: str) -> int:
+        """Number of units at a level."""
+        return len(self.codes[level])
+
+
+# =============================================================================
+# Cluster Index
+# =============================================================================
+
+class ClusterIndex:
+    """
+    Rows of a frame sorted by cluster, for per-cluster reductions.
+
+    The rows are argsorted by cluster code once; a cluster mean of any
+    number of columns is then one gather and one np.add.reduceat over the
+    sorted block, and broadcasting back to rows is one take. Rows without
+    a cluster (MISSING_CODE) belong to no cluster.
+
+    Parameters
+    ----------
+    codes : np.ndarray
+        Cluster code of every row (e.g. from parse_geo_codes)
+
+    Attributes
+    ----------
+    codes : np.ndarray
+        Sorted unique cluster codes; a cluster's position is its id
+    order : np.ndarray
+        Row numbers sorted by cluster (rows without a cluster left out)
+    starts : np.ndarray
+        Position in order where each cluster starts
+    row_cluster : np.ndarray
+        Cluster position of every row (MISSING_CODE if none)
+    """
+
+    def __init__(self, codes: np.ndarray):
+        codes = np.asarray(codes, dtype=np.int64)
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] != MISSING_CODE]
+        sorted_codes = codes[order]
+        is_start = np.ones(len(order), dtype=bool)
+        is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+
+        self.order = order
+        self.starts = np.flatnonzero(is_start)
+        self.codes = sorted_codes[self.starts]
+        self.row_cluster = np.full(len(codes), MISSING_CODE, dtype=np.int64)
+        self.row_cluster[order] = np.cumsum(is_start) - 1
+        for array in (self.order, self.starts, self.codes, self.row_cluster):
+            array.flags.writeable = False
+
+    @property
+    def n_clusters(self) -> int:
+        """Number of clusters."""
+        return len(self.codes)
+
+    def sizes(self) -> np.ndarray:
+        """Rows per cluster."""
+        return np.diff(np.append(self.starts, len(self.order)))
+
+    def means(self, values: np.ndarray) -> np.ndarray:
+        """
+        Mean of every column within every cluster, skipping NaN.
+
+        Parameters
+        ----------
+        values : np.ndarray
+            (rows x columns) float block, one row per indexed row
+
+        Returns
+        -------
+        np.ndarray
+            (clusters x columns) means; NaN where a cluster has no values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if self.n_clusters == 0:
+            return np.empty((0,) + values.shape[1:])
+        # Reduce along contiguous memory: (columns x sorted rows)
+        block = values.T.take(self.order, axis=-1)
+        present = ~np.isnan(block)
+        if present.all():
+            sums = np.add.reduceat(block, self.starts, axis=-1)
+            counts = self.sizes()
+        else:
+            sums = np.add.reduceat(np.where(present, block, 0.0), self.starts, axis=-1)
+            counts = np.add.reduceat(present.astype(np.int64), self.starts, axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (sums / counts).T
+
+    def position(self, codes: np.ndarray) -> np.ndarray:
+        """Cluster positions of codes (MISSING_CODE if not a cluster here)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        if self.n_clusters == 0:
+            return np.full(len(codes), MISSING_CODE, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.codes, codes), self.n_clusters - 1)
+        return np.where((codes >= 0) & (self.codes[pos] == codes), pos, MISSING_CODE)
+
+    def broadcast(
+        self,
+        cluster_values: np.ndarray,
+        row_cluster: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Per-cluster values for every row (NaN for rows without a cluster).
+
+        Parameters
+        ----------
+        cluster_values : np.ndarray
+            (clusters x columns) values, e.g. from means
+        row_cluster : np.ndarray, optional
+            Cluster position of each row (default: the indexed rows;
+            use position() for the rows of another frame)
+
+        Returns
+        -------
+        np.ndarray
+            (rows x columns) values
+        """
+        rows = self.row_cluster if row_cluster is None else row_cluster
+        if self.n_clusters == 0:
+            return np.full((len(rows),) + cluster_values.shape[1:], np.nan)
+        out = cluster_values.T.take(np.maximum(rows, 0), axis=-1).T
+        out[rows < 0] = np.nan
+        return out
+
+
+# Recently built cluster indexes, by content of the cluster codes
+_CLUSTER_INDEX_CACHE: "OrderedDict[bytes, ClusterIndex]" = OrderedDict()
+_CLUSTER_INDEX_CACHE_SIZE = 8
+
+
+def cluster_index(ids) -> ClusterIndex:
+    """
+    ClusterIndex of geographic IDs, reused for IDs seen recently.
+
+    Parameters
+    ----------
+    ids : array-like
+        Geographic IDs of every row (strings, numbers or categorical)
+
+    Returns
+    -------
+    ClusterIndex
+        Shared, read-only index
+    """
+    codes = parse_geo_codes(ids)
+    key = hashlib.blake2b(codes.tobytes(), digest_size=16).digest()
+
+    index = _CLUSTER_INDEX_CACHE.get(key)
+    if index is None:
+        index = ClusterIndex(codes)
+        _CLUSTER_INDEX_CACHE[key] = index
+        if len(_CLUSTER_INDEX_CACHE) > _CLUSTER_INDEX_CACHE_SIZE:
+            _CLUSTER_INDEX_CACHE.popitem(last=False)
+    else:
+        _CLUSTER_INDEX_CACHE.move_to_end(key)
+    return index
@@ -0,0 +1,293 @@
+# =============================================================================
+# instrument.py - Pipeline Stage Instrumentation
+# =============================================================================
+"""
+Timing, memory and row-count instrumentation for pipeline stages.
+
+A RunLog records, for every stage: wall time, CPU time (including worker
+processes), peak resident memory and the number of input and output rows.
+Model fits inside a stage are recorded as sub-stages ("two_level_models/m2").
+The log is written as JSON (run metadata + records) and Parquet (records),
+and each stage can optionally be profiled with cProfile.
+
+Peak memory is the process high-water mark (VmHWM) during the stage. On
+Linux it is reset at the start of every stage; where that is not possible
+it is the peak of the whole run so far.
+
+Classes:
+    StageRecord: Measurements of one stage
+    RunLog: Collect and write stage measurements
+Functions:
+    active_log: The RunLog of the running pipeline, if any
+    count_rows: Number of rows in a stage input or output
+"""
+
+import json
+import os
+import sys
+import time
+import dataclasses
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import RUN_LOG_DIR
+
+
+# The RunLog of the running pipeline (see RunLog.activate)
+_ACTIVE_LOG: Optional["RunLog"] = None
+
+
+def active_log() -> Optional["RunLog"]:
+    """The RunLog activated by the running pipeline, or None."""
+    return _ACTIVE_LOG
+
+
+# =============================================================================
+# Measurements
+# =============================================================================
+
+@dataclass
+class StageRecord:
+    """Measurements of one pipeline stage."""
+    stage: str
+    started: str                        # ISO timestamp
+    wall_seconds: float
+    cpu_seconds: Optional[float]        # This process + finished workers
+    peak_rss_mb: Optional[float]
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    cached: bool = False                # Result served from the stage cache
+    profile: Optional[str] = None       # cProfile dump, if profiled
+
+
+def _cpu_seconds() -> float:
+    """CPU time of this process and its terminated children."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS counter (Linux); False if unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _is_table(obj: Any) -> bool:
+    """True for DataFrames and Series (without importing pandas)."""
+    return hasattr(obj, "shape") and hasattr(obj, "index") and hasattr(obj, "iloc")
+
+
+def count_rows(obj: Any) -> Optional[int]:
+    """
+    Number of rows in a stage input or output.
+
+    DataFrames and Series count their rows, dicts and lists the rows of
+    their DataFrame values, fitted models their observations (nobs), and
+    result dataclasses the count of their first countable field.
+    """
+    if _is_table(obj):
+        return len(obj)
+    if isinstance(obj, dict):
+        obj = list(obj.values())
+    if isinstance(obj, (list, tuple)):
+        counts = [len(v) for v in obj if _is_table(v)]
+        return sum(counts) if counts else None
+    if hasattr(obj, "nobs"):
+        return int(obj.nobs)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        for field in dataclasses.fields(obj):
+            value = getattr(obj, field.name)
+            if _is_table(value) or hasattr(value, "nobs"):
+                return count_rows(value)
+    return None
+
+
+# =============================================================================
+# Run Log
+# =============================================================================
+
+class RunLog:
+    """
+    Record wall time, CPU time, peak memory and rows for pipeline stages.
+
+    Parameters
+    ----------
+    profile_dir : Path, optional
+        If given, every stage runs under cProfile and its stats are dumped
+        to <profile_dir>/<stage>.prof (view with snakeviz or pstats)
+
+    Examples
+    --------
+    >>> run_log = RunLog()
+    >>> with run_log.activate():
+    ...     merged = run_log.run("merge", merge_survey_admin, survey, admin)
+    >>> run_log.write()
+    """
+
+    def __init__(self, profile_dir: Optional[Path] = None):
+        self.records: List[StageRecord] = []
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.started = datetime.now()
+        self._stack: List[str] = []
+
+    # -------------------------------------------------------------------------
+    # Recording
+    # -------------------------------------------------------------------------
+
+    @contextmanager
+    def activate(self):
+        """Make this the active log (for model-fit records) inside the block."""
+        global _ACTIVE_LOG
+        previous, _ACTIVE_LOG = _ACTIVE_LOG, self
+        try:
+            yield self
+        finally:
+            _ACTIVE_LOG = previous
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None):
+        """
+        Measure the enclosed block as one stage.
+
+        Yields the StageRecord so the caller can set rows_out or cached.
+        """
+        profiler = None
+        profile_path = None
+        if self.profile_dir is not None:
+            import cProfile
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+            profile_path = self.profile_dir / f"{name.replace('/', '_')}.prof"
+            profiler = cProfile.Profile()
+
+        record = StageRecord(
+            stage=name, started=datetime.now().isoformat(timespec="seconds"),
+            wall_seconds=0.0, cpu_seconds=None, peak_rss_mb=None, rows_in=rows_in,
+            profile=str(profile_path) if profile_path else None
+        )
+        _reset_peak_rss()
+        self._stack.append(name)
+        wall, cpu = time.perf_counter(), _cpu_seconds()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+            record.wall_seconds = time.perf_counter() - wall
+            record.cpu_seconds = _cpu_seconds() - cpu
+            record.peak_rss_mb = _peak_rss_mb()
+            self._stack.pop()
+            self.records.append(record)
+
+    def run(self, name: str, func: Callable, *args, **kwargs) -> Any:
+        """Call func(*args, **kwargs) as a stage and return its result."""
+        rows_in = next((count_rows(a) for a in args if count_rows(a) is not None), None)
+        with self.stage(name, rows_in=rows_in) as record:
+            result = func(*args, **kwargs)
+            record.rows_out = count_rows(result)
+        return result
+
+    def add_substage(
+        self,
+        name: str,
+        wall_seconds: float,
+        cpu_seconds: Optional[float] = None,
+        rows: Optional[int] = None
+    ) -> None:
+        """
+        Record work timed elsewhere (e.g. a model fit in a worker process)
+        under the current stage.
+        """
+        prefix = "/".join(self._stack)
+        self.records.append(StageRecord(
+            stage=f"{prefix}/{name}" if prefix else name,
+            started=datetime.now().isoformat(timespec="seconds"),
+            wall_seconds=wall_seconds, cpu_seconds=cpu_seconds,
+            peak_rss_mb=None, rows_in=rows, rows_out=None
+        ))
+
+    # -------------------------------------------------------------------------
+    # Output
+    # -------------------------------------------------------------------------
+
+    def to_frame(self):
+        """Stage records as a DataFrame."""
+        import pandas as pd
+        return pd.DataFrame(
+            [asdict(r) for r in self.records],
+            columns=[f.name for f in dataclasses.fields(StageRecord)]
+        )
+
+    def summary(self) -> str:
+        """One line per stage: wall/CPU seconds, peak memory, rows."""
+        lines = ["Stage timings:"]
+        for r in self.records:
+            cpu = f"{r.cpu_seconds:7.2f}" if r.cpu_seconds is not None else "      -"
+            rss = f"{r.peak_rss_mb:8.0f} MB" if r.peak_rss_mb is not None else "          -"
+            rows = f"{r.rows_out}" if r.rows_out is not None else (
+                f"{r.rows_in}" if r.rows_in is not None else "-")
+            cached = " (cached)" if r.cached else ""
+            lines.append(f"  {r.stage:<34} {r.wall_seconds:7.2f}s wall {cpu}s cpu "
+                         f"{rss} {rows:>9} rows{cached}")
+        return "\n".join(lines)
+
+    def write(self, output_dir: Path = RUN_LOG_DIR) -> Path:
+        """
+        Write the run log as run-<timestamp>.json and .parquet.
+
+        Returns
+        -------
+        Path
+            Path of the JSON file
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"run-{self.started:%Y%m%d-%H%M%S}"
+
+        json_path = output_dir / f"{stem}.json"
+        with open(json_path, "w") as f:
+            json.dump({
+                "started": self.started.isoformat(timespec="seconds"),
+                "argv": sys.argv,
+                "python": sys.version.split()[0],
+                "total_wall_seconds": sum(
+                    r.wall_seconds for r in self.records if "/" not in r.stage
+                ),
+                "stages": [asdict(r) for r in self.records],
+            }, f, indent=2)
+
+        try:
+            self.to_frame().to_parquet(output_dir / f"{stem}.parquet", index=False)
+        except ImportError:
+            pass  # pyarrow missing: the JSON log has the same records
+
+        print(f"  Run log written to {json_path}")
+        return json_path
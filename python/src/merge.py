@@ -6,6 +6,7 @@ Functions for merging survey and administrative data at multiple geographic leve
 
 Functions:
     merge_survey_admin: Left join survey with admin at all levels
+    merge_survey_admin_chunked: Streaming merge written to Parquet
     validate_merge: Check match rates at each level
     analyze_missingness: Detailed missingness analysis
     compare_matched_unmatched: Test for systematic differences
@@ -15,19 +16,44 @@ Functions:
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Union
 from dataclasses import dataclass
-from scipy import stats
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import INDIVIDUAL_CONTROLS, BUURT_CONTROLS, MIN_CLUSTER_SIZE
+from config import (
+    INDIVIDUAL_CONTROLS, BUURT_CONTROLS, MIN_CLUSTER_SIZE,
+    MERGE_CHUNK_SIZE, MERGED_DATA_PATH
+)
+from src.geoindex import GeoIndex, GEO_LEVELS
 
 
 # =============================================================================
 # Data Merging
 # =============================================================================
 
+def _attach_admin(survey: pd.DataFrame, index: GeoIndex) -> pd.DataFrame:
+    """
+    Left join survey rows with every admin level in one concatenation.
+
+    Equivalent to successive merge(..., how="left") calls on the (unique)
+    geographic IDs: each level is one encode and one take per indicator,
+    and the wide frame is built only once.
+    """
+    survey = survey.reset_index(drop=True)
+    parts = [survey] + [
+        index.attach(survey, level) for level in GEO_LEVELS
+        if index.columns[level] and GEO_LEVELS[level][0] in survey.columns
+    ]
+    return pd.concat(parts, axis=1)
+
+
+def _report_levels(index: GeoIndex) -> None:
+    for level in GEO_LEVELS:
+        if index.columns[level]:
+            print(f"  + {level.capitalize()}: {index.n_units(level)} units")
+
+
 def merge_survey_admin(
     survey: pd.DataFrame,
     admin_by_level: Dict[str, pd.DataFrame]
@@ -35,10 +61,10 @@ def merge_survey_admin(
     """
     Merge survey with administrative data at all three geographic levels.
 
-    Performs sequential left joins:
+    Left joins:
     1. survey + buurt (on buurt_id)
-    2. result + wijk (on wijk_id)
-    3. result + gemeente (on gemeente_id)
+    2. survey + wijk (on wijk_id)
+    3. survey + gemeente (on gemeente_id)
 
     Parameters
     ----------
@@ -54,33 +80,69 @@ def merge_survey_admin(
     """
     print("Merging survey with administrative data...")
 
-    merged = survey.copy()
-    initial_n = len(merged)
+    index = GeoIndex.from_admin_by_level(admin_by_level)
+    _report_levels(index)
 
-    # Merge buurt level
-    if "buurt" in admin_by_level and len(admin_by_level["buurt"]) > 0:
-        buurt_data = admin_by_level["buurt"]
-        merged = merged.merge(buurt_data, on="buurt_id", how="left")
-        print(f"  + Buurt: {len(buurt_data)} units")
+    merged = _attach_admin(survey, index)
 
-    # Merge wijk level
-    if "wijk" in admin_by_level and len(admin_by_level["wijk"]) > 0:
-        wijk_data = admin_by_level["wijk"]
-        merged = merged.merge(wijk_data, on="wijk_id", how="left")
-        print(f"  + Wijk: {len(wijk_data)} units")
+    print(f"  Final merged data: {len(merged)} rows, {len(merged.columns)} columns")
+    return merged
 
-    # Merge gemeente level
-    if "gemeente" in admin_by_level and len(admin_by_level["gemeente"]) > 0:
-        gemeente_data = admin_by_level["gemeente"]
-        merged = merged.merge(gemeente_data, on="gemeente_id", how="left")
-        print(f"  + Gemeente: {len(gemeente_data)} units")
 
-    # Check row count didn't change
-    if len(merged) != initial_n:
-        print(f"  Warning: Row count changed from {initial_n} to {len(merged)}")
+def merge_survey_admin_chunked(
+    survey: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    admin_by_level: Dict[str, pd.DataFrame],
+    output_path: Path = MERGED_DATA_PATH,
+    chunksize: int = MERGE_CHUNK_SIZE
+) -> Path:
+    """
+    Merge survey with administrative data chunk by chunk, writing Parquet.
 
-    print(f"  Final merged data: {len(merged)} rows, {len(merged.columns)} columns")
-    return merged
+    The admin tables are indexed once (GeoIndex); each survey chunk is
+    joined against them and appended to the output file as a row group, so only one chunk
+    of merged rows is in memory at a time. The result equals
+    merge_survey_admin on the concatenated survey.
+
+    Parameters
+    ----------
+    survey : pd.DataFrame or iterable of pd.DataFrame
+        Survey data with geographic IDs, or chunks of it, e.g.
+        (create_geo_ids(c) for c in iter_survey_chunks(path))
+    admin_by_level : dict
+        Dictionary with 'buurt', 'wijk', 'gemeente' DataFrames
+    output_path : Path
+        Output .parquet file (read back with load_analysis_data)
+    chunksize : int
+        Rows per chunk when survey is a single DataFrame
+
+    Returns
+    -------
+    Path
+        Path the merged data was written to
+
+    Raises
+    ------
+    ValueError
+        If survey has no chunks (no file is written)
+    """
+    from src.storage import ParquetChunkWriter
+
+    print(f"Merging survey with administrative data (chunked) to {output_path}...")
+
+    index = GeoIndex.from_admin_by_level(admin_by_level)
+    _report_levels(index)
+
+    if isinstance(survey, pd.DataFrame):
+        chunks = (survey.iloc[i:i + chunksize] for i in range(0, len(survey), chunksize))
+    else:
+        chunks = survey
+
+    with ParquetChunkWriter(output_path) as writer:
+        for chunk in chunks:
+            writer.write(_attach_admin(chunk, index))
+
+    print(f"  Wrote {writer.n_rows} rows in {writer.n_chunks} chunks")
+    return Path(output_path)
 
 
 # =============================================================================
@@ -223,6 +285,8 @@ def compare_matched_unmatched(data: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         Comparison statistics
     """
+    from scipy import stats
+
     print("\nComparing matched vs unmatched cases...")
 
     if "b_pop_total" not in data.columns:
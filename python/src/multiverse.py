@@ -0,0 +1,423 @@
+# =============================================================================
+# multiverse.py - Specification-Curve (Multiverse) Analysis
+# =============================================================================
+"""
+Functions for running the key-coefficient model over every combination of
+defensible analytic choices (a specification curve / multiverse analysis).
+
+Choices enumerated:
+- Dependent variable: DV_single, 2-item or 3-item composite
+- Individual controls: every subset of INDIVIDUAL_CONTROLS
+- Buurt controls: every subset of BUURT_CONTROLS
+- Key predictor: % low-income households, income ratio, income polarization
+- Sample: all respondents, Dutch-born only, buurten with several respondents
+
+The models are fitted in batches through the specification-grid engine in
+analyze.py (shared design, optional process pool). Each finished batch is
+written as a Parquet part file, so an interrupted run resumes where it
+stopped and results can be read while the run is still going.
+
+Functions:
+    build_multiverse: Enumerate all combinations of analytic choices
+    run_multiverse: Fit the multiverse in resumable, parallel batches
+    load_multiverse_results: Read the streamed results table
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import itertools
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import (
+    INDIVIDUAL_CONTROLS, BUURT_CONTROLS, MIN_CLUSTER_SIZE,
+    MULTIVERSE_DIR, MULTIVERSE_BATCH_SIZE, N_JOBS
+)
+from src.analyze import SensitivitySpec, iter_specification_grid
+
+
+# Dependent variable choices: label -> column
+MULTIVERSE_DVS = {
+    "DV_single": "DV_single",
+    "2-item": "DV_2item_scaled",
+    "3-item": "DV_3item_scaled",
+}
+
+# File in the output directory with the fingerprint of the stored results
+FINGERPRINT_FILE = "fingerprint.txt"
+
+# Key predictor choices
+MULTIVERSE_KEY_PREDICTORS = [
+    "b_perc_low40_hh",
+    "b_income_ratio",
+    "b_income_polarization",
+]
+
+
+# =============================================================================
+# Enumeration
+# =============================================================================
+
+@dataclass
+class MultiverseSpec:
+    """One point in the multiverse, with its analytic choices."""
+    spec_id: str
+    dv: str
+    key_var: str
+    ind_controls: List[str]
+    buurt_controls: List[str]
+    sample: str
+    query: Optional[str]
+
+    def to_sensitivity_spec(self) -> SensitivitySpec:
+        """Convert to a specification the grid engine can fit."""
+        return SensitivitySpec(
+            label=self.spec_id,
+            dv=self.dv,
+            key_var=self.key_var,
+            controls=self.ind_controls + self.buurt_controls,
+            query=self.query
+        )
+
+
+def _subsets(items: List[str]) -> List[List[str]]:
+    """All subsets of items (including the empty set), in a stable order."""
+    return [list(combo)
+            for size in range(len(items) + 1)
+            for combo in itertools.combinations(items, size)]
+
+
+def _sample_filters(data: pd.DataFrame) -> Dict[str, Optional[str]]:
+    """Sample filter choices: label -> DataFrame.query string."""
+    filters = {"all": None}
+
+    if "born_in_nl" in data.columns:
+        # born_in_nl may be coded as max value = born in NL, or binary (1 = yes)
+        max_val = data["born_in_nl"].max()
+        dutch_value = max_val if max_val > 1 else 1
+        filters["dutch_born"] = f"born_in_nl == {float(dutch_value)!r}"
+
+    filters["multi_respondent_buurt"] = f"buurt_n >= {max(MIN_CLUSTER_SIZE, 2)}"
+    return filters
+
+
+def build_multiverse(
+    data: pd.DataFrame,
+    dvs: Optional[Dict[str, str]] = None,
+    key_predictors: Optional[List[str]] = None,
+    individual_sets: Optional[List[List[str]]] = None,
+    buurt_sets: Optional[List[List[str]]] = None,
+    sample_filters: Optional[Dict[str, Optional[str]]] = None
+) -> List[MultiverseSpec]:
+    """
+    Enumerate every combination of analytic choices.
+
+    Choices whose variables are missing from the data are left out. By
+    default every subset of INDIVIDUAL_CONTROLS and BUURT_CONTROLS is used.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data (used to check which variables exist)
+    dvs : dict, optional
+        Dependent variable choices (label -> column)
+    key_predictors : list, optional
+        Key predictor choices
+    individual_sets, buurt_sets : list of lists, optional
+        Control-set choices
+    sample_filters : dict, optional
+        Sample choices (label -> DataFrame.query string or None)
+
+    Returns
+    -------
+    list of MultiverseSpec
+    """
+    dvs = dvs or MULTIVERSE_DVS
+    dvs = {label: col for label, col in dvs.items() if col in data.columns}
+
+    key_predictors = key_predictors or MULTIVERSE_KEY_PREDICTORS
+    key_predictors = [v for v in key_predictors if v in data.columns]
+
+    if individual_sets is None:
+        individual_sets = _subsets([v for v in INDIVIDUAL_CONTROLS if v in data.columns])
+    if buurt_sets is None:
+        buurt_sets = _subsets([v for v in BUURT_CONTROLS if v in data.columns])
+    if sample_filters is None:
+        sample_filters = _sample_filters(data)
+
+    specs = []
+    for dv, key_var, ind_set, buurt_set, (sample, query) in itertools.product(
+        dvs.values(), key_predictors, individual_sets, buurt_sets,
+        sample_filters.items()
+    ):
+        # The Dutch-born subsample has no variation in born_in_nl
+        if sample == "dutch_born" and "born_in_nl" in ind_set:
+            continue
+
+        key = "|".join([dv, key_var, ",".join(ind_set), ",".join(buurt_set), str(query)])
+        spec_id = hashlib.sha1(key.encode()).hexdigest()[:12]
+
+        specs.append(MultiverseSpec(
+            spec_id=spec_id,
+            dv=dv,
+            key_var=key_var,
+            ind_controls=list(ind_set),
+            buurt_controls=list(buurt_set),
+            sample=sample,
+            query=query
+        ))
+
+    return specs
+
+
+# =============================================================================
+# Resumable Execution
+# =============================================================================
+
+@dataclass
+class MultiverseRun:
+    """Summary of a multiverse run."""
+    results: pd.DataFrame
+    n_total: int
+    n_resumed: int      # Already in the results table before this run
+    n_fitted: int       # Fitted in this run
+    n_failed: int
+    elapsed: float      # Seconds spent fitting in this run
+    models_per_sec: float
+
+
+def _run_fingerprint(data: pd.DataFrame) -> str:
+    """
+    Hash of everything a stored result depends on besides its spec.
+
+    Covers the input data, the config settings used by the fitting modules
+    and their source code.
+    """
+    import importlib
+    import inspect
+    import config
+
+    h = hashlib.sha256()
+    h.update(repr(list(data.columns)).encode())
+    h.update(repr([str(t) for t in data.dtypes]).encode())
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    for name in ["src.reml", "src.analyze", __name__]:
+        module = importlib.import_module(name)
+        h.update(inspect.getsource(module).encode())
+        for setting in sorted(vars(module)):
+            if setting.isupper() and hasattr(config, setting):
+                h.update(f"{setting}={getattr(config, setting)!r}".encode())
+    return h.hexdigest()[:16]
+
+
+def _start_or_resume(output_dir: Path, fingerprint: str) -> None:
+    """
+    Make output_dir resumable for this fingerprint.
+
+    Part files written for other data, settings or code are moved to a
+    stale-<fingerprint> subdirectory, so they are neither counted as done
+    nor mixed into the results.
+    """
+    marker = output_dir / FINGERPRINT_FILE
+    stored = marker.read_text().strip() if marker.exists() else None
+    parts = sorted(output_dir.glob("part-*.parquet"))
+
+    if parts and stored != fingerprint:
+        stale_dir = output_dir / f"stale-{stored or 'unknown'}"
+        stale_dir.mkdir(exist_ok=True)
+        for part in parts:
+            part.replace(stale_dir / part.name)
+        print(f"  Inputs changed since the stored results: moved {len(parts)} "
+              f"part files to {stale_dir.name}/ and starting over")
+    marker.write_text(fingerprint + "\n")
+
+
+def _completed_spec_ids(output_dir: Path) -> set:
+    """Spec IDs already stored in the results table."""
+    parts = sorted(output_dir.glob("part-*.parquet"))
+    if not parts:
+        return set()
+    done = pd.concat(
+        [pd.read_parquet(p, columns=["spec_id"]) for p in parts],
+        ignore_index=True
+    )
+    return set(done["spec_id"])
+
+
+def _write_part(rows: List[Dict[str, Any]], output_dir: Path) -> Path:
+    """Write one batch of results as a new Parquet part file."""
+    existing = sorted(output_dir.glob("part-*.parquet"))
+    part_no = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+    path = output_dir / f"part-{part_no:05d}.parquet"
+
+    # Write to a temporary file first so a crash never leaves half a part
+    tmp_path = path.with_suffix(".tmp")
+    pd.DataFrame(rows).to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+    return path
+
+
+def _format_duration(seconds: float) -> str:
+    """Format seconds as h:mm:ss."""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def run_multiverse(
+    data: pd.DataFrame,
+    specs: Optional[List[MultiverseSpec]] = None,
+    output_dir: Path = MULTIVERSE_DIR,
+    batch_size: int = MULTIVERSE_BATCH_SIZE,
+    n_jobs: int = N_JOBS
+) -> MultiverseRun:
+    """
+    Fit all multiverse specifications, streaming results to Parquet.
+
+    Specifications already present in output_dir are skipped, so rerunning
+    after an interruption continues where the previous run stopped. Results
+    are only reused if the data, the model settings and the fitting code
+    are unchanged (see _run_fingerprint); otherwise the run starts over. After
+    each batch a part file is written and progress (models done, models per
+    second, estimated time remaining) is printed.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data (full data, before complete-case filtering)
+    specs : list of MultiverseSpec, optional
+        Specifications to fit (default: build_multiverse(data))
+    output_dir : Path
+        Directory for the Parquet part files
+    batch_size : int
+        Specifications per batch (one checkpoint per batch)
+    n_jobs : int
+        Number of worker processes (1 = sequential, -1 = all cores)
+
+    Returns
+    -------
+    MultiverseRun
+        All results in output_dir plus throughput statistics
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("pyarrow not installed. Run: pip install pyarrow")
+
+    print("\nRunning multiverse analysis...")
+
+    # Cluster sizes for the multi-respondent-buurt sample filter
+    data = data.assign(buurt_n=data.groupby("buurt_id")["buurt_id"].transform("size"))
+
+    if specs is None:
+        specs = build_multiverse(data)
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    _start_or_resume(output_dir, _run_fingerprint(data))
+
+    done = _completed_spec_ids(output_dir)
+    pending = [spec for spec in specs if spec.spec_id not in done]
+    n_resumed = len(specs) - len(pending)
+
+    print(f"  Specifications: {len(specs)} total, {n_resumed} already done, "
+          f"{len(pending)} to fit")
+
+    by_id = {spec.spec_id: spec for spec in pending}
+    n_fitted = 0
+    n_failed = 0
+    start = time.perf_counter()
+
+    grid = iter_specification_grid(
+        data,
+        [spec.to_sensitivity_spec() for spec in pending],
+        n_jobs=n_jobs,
+        batch_size=batch_size
+    )
+    # Convergence warnings from thousands of fits would drown the progress output
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for batch in grid:
+            rows = []
+            for grid_spec, outcome in batch:
+                spec = by_id[grid_spec.label]
+                row = {
+                    "spec_id": spec.spec_id,
+                    "dv": spec.dv,
+                    "key_var": spec.key_var,
+                    "ind_controls": ",".join(spec.ind_controls),
+                    "buurt_controls": ",".join(spec.buurt_controls),
+                    "n_controls": len(spec.ind_controls) + len(spec.buurt_controls),
+                    "sample": spec.sample,
+                    "N": np.nan,
+                    "coefficient": np.nan,
+                    "SE": np.nan,
+                    "significant": False,
+                    "error": outcome.get("error") or outcome.get("skipped"),
+                }
+                if outcome["rows"]:
+                    key_row = outcome["rows"][0]
+                    row.update({k: key_row[k] for k in ["N", "coefficient", "SE", "significant"]})
+                else:
+                    n_failed += 1
+                rows.append(row)
+
+            _write_part(rows, output_dir)
+            n_fitted += len(rows)
+
+            elapsed = time.perf_counter() - start
+            rate = n_fitted / elapsed if elapsed > 0 else 0.0
+            remaining = (len(pending) - n_fitted) / rate if rate > 0 else 0.0
+            print(f"  [{n_resumed + n_fitted}/{len(specs)}] "
+                  f"{rate:.2f} models/s, ETA {_format_duration(remaining)}")
+
+    elapsed = time.perf_counter() - start
+    results = load_multiverse_results(output_dir)
+
+    run = MultiverseRun(
+        results=results,
+        n_total=len(specs),
+        n_resumed=n_resumed,
+        n_fitted=n_fitted,
+        n_failed=n_failed,
+        elapsed=elapsed,
+        models_per_sec=n_fitted / elapsed if elapsed > 0 else 0.0
+    )
+
+    print(f"  Fitted {n_fitted} models in {_format_duration(elapsed)} "
+          f"({run.models_per_sec:.2f} models/s), {n_failed} failed or skipped")
+    if len(results) > 0:
+        ok = results.dropna(subset=["coefficient"])
+        print(f"  Key coefficient across {len(ok)} specifications: "
+              f"median={ok['coefficient'].median():.3f}, "
+              f"{ok['significant'].mean() * 100:.1f}% significant")
+
+    return run
+
+
+def load_multiverse_results(output_dir: Path = MULTIVERSE_DIR) -> pd.DataFrame:
+    """
+    Read all multiverse results written so far.
+
+    Parameters
+    ----------
+    output_dir : Path
+        Directory with Parquet part files
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per specification, sorted by coefficient (specification curve order)
+    """
+    parts = sorted(Path(output_dir).glob("part-*.parquet"))
+    if not parts:
+        return pd.DataFrame()
+
+    results = pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True)
+    results = results.drop_duplicates("spec_id", keep="last")
+    return results.sort_values("coefficient").reset_index(drop=True)
@@ -0,0 +1,535 @@
+# =============================================================================
+# recode.py - Compiled Survey Recode Plans
+# =============================================================================
+"""
+Declarative survey recodes, compiled into a plan that runs on NumPy arrays.
+
+The survey is described in config.py by a codebook (SURVEY_CODEBOOK:
+source column, labels, valid range, missing codes, dtype) and a list of
+derived measures (SURVEY_MEASURES). survey_recodes turns these into a
+recode spec (mask missing codes, rescale, row mean, code map, z-score,
+...) once per process. compile_recode_plan keeps the operations whose
+source columns are available and turns code maps into lookup arrays. RecodePlan.apply then evaluates every operation once on column
+arrays and writes the results into a shallow copy of the input, so the
+input frame is neither copied nor modified.
+
+Z-scores use the data's own mean and SD by default. For chunked data,
+RecodePlan.fit collects the moments over all chunks first, so every
+chunk is standardized with the same statistics.
+
+Classes:
+    MaskCodes, Affine, RowMean, RowSum, CodeMap, ZScore, Cast, AtLeast,
+    IsIn: Recode operations
+    RecodePlan: Compiled, reusable recode plan
+Functions:
+    survey_recodes: Recode spec of the configured codebook (cached)
+    spec_from_schema: Recode spec of a codebook and list of measures
+    compile_recode_plan: Compile a recode spec for a set of input columns (cached)
+    count_invalid_codes: Survey values outside the codebook
+"""
+
+import pandas as pd
+import numpy as np
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import SURVEY_CODEBOOK, SURVEY_MEASURES
+
+
+# Source column -> float array
+Getter = Callable[[str], np.ndarray]
+
+
+# =============================================================================
+# Recode Operations
+# =============================================================================
+
+@dataclass(frozen=True)
+class MaskCodes:
+    """Set the given codes of a column to missing (e.g. 8 = don't know)."""
+    column: str
+    codes: Tuple[float, ...]
+
+    @property
+    def target(self) -> str:
+        return self.column
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.column,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        values = get(self.column).copy()
+        values[np.isin(values, self.codes)] = np.nan
+        return values
+
+
+@dataclass(frozen=True)
+class Affine:
+    """target = (source - subtract) / divide * multiply + add."""
+    target: str
+    source: str
+    subtract: float = 0.0
+    divide: float = 1.0
+    multiply: float = 1.0
+    add: float = 0.0
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.source,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        return (get(self.source) - self.subtract) / self.divide * self.multiply + self.add
+
+
+@dataclass(frozen=True)
+class RowMean:
+    """Mean of the sources per row, ignoring missing values."""
+    target: str
+    sources: Tuple[str, ...]
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        total = np.zeros(len(get(self.sources[0])))
+        count = np.zeros(len(total))
+        for source in self.sources:
+            values = get(source)
+            valid = ~np.isnan(values)
+            total += np.where(valid, values, 0.0)
+            count += valid
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(count > 0, total / count, np.nan)
+
+
+@dataclass(frozen=True)
+class RowSum:
+    """Sum of the sources per row, missing counted as 0.
+
+    Uses whichever sources are available (at least one).
+    """
+    target: str
+    sources: Tuple[str, ...]
+    partial = True
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        total = None
+        for source in self.sources:
+            values = np.nan_to_num(get(source), nan=0.0)
+            total = values if total is None else total + values
+        return total
+
+
+@dataclass(frozen=True)
+class CodeMap:
+    """
+    Map integer codes to labels (categorical) or numbers via a lookup array.
+
+    Codes that are missing, fractional or not in the map become missing.
+    With categories=None a categorical's categories are the sorted labels
+    present in the data (as pd.Categorical infers them).
+    """
+    target: str
+    source: str
+    mapping: Tuple[Tuple[int, Any], ...]
+    categories: Optional[Tuple[str, ...]] = None
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.source,)
+
+    @property
+    def numeric(self) -> bool:
+        return all(isinstance(v, (int, float, np.number)) for _, v in self.mapping)
+
+    def lookup_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(lookup array: code -> label position or -1, labels)."""
+        labels = np.array([v for _, v in self.mapping],
+                          dtype=float if self.numeric else object)
+        table = np.full(max(int(k) for k, _ in self.mapping) + 1, -1, dtype=np.int32)
+        for i, (code, _) in enumerate(self.mapping):
+            table[int(code)] = i
+        return table, labels
+
+    def positions(self, values: np.ndarray, table: np.ndarray) -> np.ndarray:
+        """Label position of every value (-1 if unmapped)."""
+        with np.errstate(invalid="ignore"):
+            valid = (values >= 0) & (values < len(table)) & (values == np.floor(values))
+        positions = np.full(len(values), -1, dtype=np.int32)
+        positions[valid] = table[values[valid].astype(np.int64)]
+        return positions
+
+    def evaluate(self, get: Getter, stats: Dict, compiled=None):
+        table, labels = compiled if compiled is not None else self.lookup_table()
+        positions = self.positions(get(self.source), table)
+
+        if self.numeric:
+            out = np.append(labels, np.nan)[positions]
+            # As Series.map: integer labels stay integer when nothing is missing
+            if positions.min(initial=0) >= 0 and all(float(v).is_integer() for v in labels):
+                out = out.astype(np.int64)
+            return out
+
+        if self.categories is not None:
+            order = {label: i for i, label in enumerate(self.categories)}
+            remap = np.array([order.get(label, -1) for label in labels] + [-1], dtype=np.int32)
+            return pd.Categorical.from_codes(remap[positions], categories=list(self.categories))
+
+        present = np.flatnonzero(np.bincount(positions[positions >= 0], minlength=len(labels)))
+        sorted_present = present[np.argsort(labels[present])]
+        remap = np.full(len(labels) + 1, -1, dtype=np.int32)
+        remap[sorted_present] = np.arange(len(sorted_present))
+        return pd.Categorical.from_codes(remap[positions],
+                                         categories=list(labels[sorted_present]))
+
+
+@dataclass(frozen=True)
+class ZScore:
+    """(source - mean) / SD, with the data's or fitted statistics."""
+    target: str
+    source: str
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.source,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        values = get(self.source)
+        if self.target in stats:
+            mean, sd = stats[self.target]
+        else:
+            series = pd.Series(values, copy=False)
+            mean, sd = series.mean(), series.std()
+        return (values - mean) / sd
+
+
+@dataclass(frozen=True)
+class Cast:
+    """Convert a column to another dtype."""
+    column: str
+    dtype: str
+
+    @property
+    def target(self) -> str:
+        return self.column
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.column,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        return get(self.column).astype(self.dtype)
+
+
+@dataclass(frozen=True)
+class AtLeast:
+    """1 where source >= threshold, else 0."""
+    target: str
+    source: str
+    threshold: float
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.source,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        return (get(self.source) >= self.threshold).astype(int)
+
+
+@dataclass(frozen=True)
+class IsIn:
+    """1 where source is one of the codes, else 0."""
+    target: str
+    source: str
+    codes: Tuple[float, ...]
+
+    @property
+    def sources(self) -> Tuple[str, ...]:
+        return (self.source,)
+
+    def evaluate(self, get: Getter, stats: Dict) -> np.ndarray:
+        return np.isin(get(self.source), self.codes).astype(int)
+
+
+# =============================================================================
+# Schema Compilation
+# =============================================================================
+
+def _codebook_labels(codebook: Dict, measure: Dict) -> Tuple[Tuple[int, Any], ...]:
+    """Code -> label pairs of a "labels" measure."""
+    if "labels" in measure:
+        labels = measure["labels"]
+    else:
+        variable = measure.get("labels_of", measure["from"])
+        if "labels" not in codebook.get(variable, {}):
+            raise ValueError(f"No codebook labels for {variable} (measure {measure['name']})")
+        labels = codebook[variable]["labels"]
+    return tuple((int(code), label) for code, label in labels.items())
+
+
+def _measure_operation(measure: Dict, codebook: Dict):
+    """Recode operation of one SURVEY_MEASURES entry."""
+    name, op = measure["name"], measure["op"]
+
+    if op == "rescale":
+        (low, high), (to_low, to_high) = measure["range"], measure["to"]
+        return Affine(name, measure["from"], subtract=float(low), divide=float(high - low),
+                      multiply=float(to_high - to_low), add=float(to_low))
+    if op == "affine":
+        return Affine(name, measure["from"], **{
+            key: float(measure[key])
+            for key in ("subtract", "divide", "multiply", "add") if key in measure
+        })
+    if op == "mean":
+        return RowMean(name, tuple(measure["of"]))
+    if op == "sum":
+        return RowSum(name, tuple(measure["of"]))
+    if op == "labels":
+        mapping = _codebook_labels(codebook, measure)
+        categories = (tuple(label for _, label in mapping)
+                      if measure.get("categories") == "all" else None)
+        return CodeMap(name, measure["from"], mapping, categories)
+    if op == "map":
+        return CodeMap(name, measure["from"],
+                       tuple((int(code), value) for code, value in measure["values"].items()))
+    if op == "zscore":
+        return ZScore(name, measure["from"])
+    if op == "at_least":
+        return AtLeast(name, measure["from"], float(measure["threshold"]))
+    if op == "isin":
+        return IsIn(name, measure["from"], tuple(float(c) for c in measure["codes"]))
+    raise ValueError(f"Unknown recode op {op!r} for measure {name}")
+
+
+def spec_from_schema(codebook: Dict, measures: List[Dict]) -> Tuple:
+    """
+    Recode spec for a survey codebook and list of derived measures.
+
+    Missing codes of the codebook are masked first, then the measures are
+    evaluated in order, then the codebook dtypes are applied.
+
+    Parameters
+    ----------
+    codebook : dict
+        Variable -> codebook entry (see SURVEY_CODEBOOK in config.py)
+    measures : list of dict
+        Derived measures (see SURVEY_MEASURES in config.py)
+
+    Returns
+    -------
+    tuple
+        Recode operations in evaluation order
+    """
+    masks = [
+        MaskCodes(variable, tuple(float(c) for c in entry["missing"]))
+        for variable, entry in codebook.items() if entry.get("missing")
+    ]
+    casts = [
+        Cast(variable, entry["dtype"])
+        for variable, entry in codebook.items() if entry.get("dtype")
+    ]
+    return tuple(masks + [_measure_operation(m, codebook) for m in measures] + casts)
+
+
+@lru_cache(maxsize=None)
+def survey_recodes() -> Tuple:
+    """
+    Recode spec of SURVEY_CODEBOOK and SURVEY_MEASURES (built once).
+
+    Call survey_recodes.cache_clear() after changing them at runtime.
+    """
+    return spec_from_schema(SURVEY_CODEBOOK, SURVEY_MEASURES)
+
+
+@lru_cache(maxsize=None)
+def _code_checks() -> Tuple[Tuple[str, np.ndarray, Optional[Tuple[float, float]]], ...]:
+    """(variable, known codes, valid range) of every checkable codebook entry."""
+    checks = []
+    for variable, entry in SURVEY_CODEBOOK.items():
+        known = [float(c) for c in entry.get("labels", {})] + \
+                [float(c) for c in entry.get("missing", [])]
+        valid = entry.get("valid")
+        if known and valid is None:
+            checks.append((variable, np.array(sorted(known)), None))
+        elif valid is not None:
+            checks.append((variable, np.array(sorted(known)), tuple(map(float, valid))))
+    return tuple(checks)
+
+
+def count_invalid_codes(data: pd.DataFrame) -> Dict[str, int]:
+    """
+    Non-missing values outside the codebook, per survey variable.
+
+    A value is valid if it is a labelled or missing code, or lies in the
+    variable's valid range.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Survey data with English column names
+
+    Returns
+    -------
+    dict
+        Variable -> number of invalid values (variables with none omitted)
+    """
+    counts = {}
+    for variable, known, valid in _code_checks():
+        if variable not in data.columns:
+            continue
+        values = pd.to_numeric(data[variable], errors="coerce").to_numpy(
+            dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        ok = np.isin(values, known)
+        if valid is not None:
+            ok |= (values >= valid[0]) & (values <= valid[1])
+        n_invalid = int(len(values) - ok.sum())
+        if n_invalid:
+            counts[variable] = n_invalid
+    return counts
+
+
+# =============================================================================
+# Compiled Plan
+# =============================================================================
+
+class RecodePlan:
+    """
+    Recode operations compiled for a set of input columns.
+
+    Parameters
+    ----------
+    operations : list
+        Operations whose sources are available, in evaluation order
+    """
+
+    def __init__(self, operations: Sequence):
+        self.operations = list(operations)
+        # Lookup arrays of the code maps, built once per plan
+        self._tables = {
+            id(op): op.lookup_table() for op in self.operations if isinstance(op, CodeMap)
+        }
+
+    @property
+    def targets(self) -> List[str]:
+        """Columns the plan writes, in order."""
+        return list(dict.fromkeys(op.target for op in self.operations))
+
+    def _evaluate(self, data: pd.DataFrame, stats: Dict) -> Dict[str, Any]:
+        """Evaluate every operation; returns target -> array."""
+        results: Dict[str, Any] = {}
+        raw: Dict[str, np.ndarray] = {}
+
+        def get(name: str) -> np.ndarray:
+            if name in results:
+                return results[name]
+            if name not in raw:
+                raw[name] = data[name].to_numpy(dtype=float, na_value=np.nan)
+            return raw[name]
+
+        for op in self.operations:
+            if isinstance(op, CodeMap):
+                results[op.target] = op.evaluate(get, stats, self._tables[id(op)])
+            else:
+                results[op.target] = op.evaluate(get, stats)
+        return results
+
+    def apply(self, data: pd.DataFrame, stats: Optional[Dict] = None) -> pd.DataFrame:
+        """
+        Recode a frame (or one chunk of it).
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            Survey rows with the plan's source columns
+        stats : dict, optional
+            Target -> (mean, SD) for the z-scores (see fit); by default
+            they are computed from data
+
+        Returns
+        -------
+        pd.DataFrame
+            data's columns (recoded in place where a column is recoded)
+            followed by the new columns
+        """
+        results = self._evaluate(data, stats or {})
+        # Shallow copy: assigning a column replaces it, data is not modified
+        df = data.copy(deep=False)
+        for target, values in results.items():
+            df[target] = values
+        return df
+
+    def fit(self, chunks: Iterable[pd.DataFrame]) -> Dict[str, Tuple[float, float]]:
+        """
+        Z-score statistics over all chunks, for apply(chunk, stats).
+
+        Moments of the chunks are combined exactly (Chan et al.), so the
+        result equals the mean and SD (ddof=1) of the concatenated data.
+
+        Returns
+        -------
+        dict
+            ZScore target -> (mean, SD)
+        """
+        zscores = [op for op in self.operations if isinstance(op, ZScore)]
+        moments = {op.target: (0, 0.0, 0.0) for op in zscores}  # (n, mean, M2)
+
+        for chunk in chunks:
+            results = self._evaluate(chunk, {})
+            for op in zscores:
+                values = results.get(op.source)
+                if values is None:
+                    values = chunk[op.source].to_numpy(dtype=float, na_value=np.nan)
+                values = values[~np.isnan(values)]
+                if len(values) == 0:
+                    continue
+                n_a, mean_a, m2_a = moments[op.target]
+                n_b, mean_b = len(values), values.mean()
+                m2_b = ((values - mean_b) ** 2).sum()
+                n = n_a + n_b
+                delta = mean_b - mean_a
+                moments[op.target] = (
+                    n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n
+                )
+
+        return {
+            target: (mean, np.sqrt(m2 / (n - 1)) if n > 1 else np.nan)
+            for target, (n, mean, m2) in moments.items()
+        }
+
+
+@lru_cache(maxsize=64)
+def compile_recode_plan(spec: Tuple, columns: Tuple[str, ...]) -> RecodePlan:
+    """
+    Compile a recode spec for the given input columns.
+
+    An operation is kept when all its sources are input columns or targets
+    of earlier operations (RowSum: at least one). RowSum is narrowed to the
+    available sources. Plans are cached per (spec, columns), so chunks and
+    reruns with the same columns reuse the compiled plan.
+
+    Parameters
+    ----------
+    spec : tuple
+        Recode operations in evaluation order (e.g. survey_recodes())
+    columns : tuple of str
+        Columns of the frames the plan will be applied to
+
+    Returns
+    -------
+    RecodePlan
+    """
+    available = set(columns)
+    operations = []
+    for op in spec:
+        present = tuple(s for s in op.sources if s in available)
+        if getattr(op, "partial", False) and present:
+            if present != op.sources:
+                op = type(op)(op.target, present)
+        elif present != op.sources:
+            continue
+        operations.append(op)
+        available.add(op.target)
+    return RecodePlan(operations)
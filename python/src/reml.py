@@ -0,0 +1,658 @@
+# =============================================================================
+# reml.py - Closed-Form Random-Intercept REML Estimator
+# =============================================================================
+"""
+Fast REML estimation of linear random-intercept models.
+
+For y_ij = x_ij'b + u_j + e_ij with u_j ~ N(0, tau2) and e_ij ~ N(0, sigma2),
+the marginal covariance of cluster j is sigma2 * (I + lam * 11') with
+lam = tau2 / sigma2. Its inverse and determinant have closed forms, so the
+REML criterion depends on the data only through per-cluster sufficient
+statistics (cluster sizes and means, and the within-cluster cross-products).
+The fixed effects and sigma2 are profiled out, leaving a one-dimensional
+search over lam. After one pass over the data, each evaluation costs
+O(G p^2) for G clusters and p fixed effects, independent of N.
+
+Nested random intercepts (buurt within wijk within gemeente) work the same
+way: each level adds a rank-one term per unit, so V^-1 and log|V| follow
+from applying Sherman-Morrison bottom-up through the hierarchy, one
+aggregation per level. The search is then over one ratio per level.
+
+Results mimic the parts of statsmodels' MixedLMResults used in this
+project (params, bse, cov_re, scale, random_effects, resid, ...), so they
+can be passed to create_model_table, calculate_icc and _extract_key_coef.
+
+Functions:
+    fit_random_intercept: Fit a random-intercept model by REML
+    fit_nested_random_intercepts: Fit nested random intercepts by REML
+    profile_from_cross_products: Profiled REML likelihood from V^-1 cross-products
+    maximize_ratio: Maximize the profiled likelihood over tau2 / sigma2
+Classes:
+    RandomInterceptResults: Fitted model (MixedLMResults-compatible subset)
+"""
+
+import pandas as pd
+import numpy as np
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+from scipy import linalg, optimize, sparse, stats
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+# Name of the random-intercept variance in params (as in statsmodels tables)
+GROUP_VAR_NAME = "Group Var"
+
+# Search grid for log(lam) = log(tau2 / sigma2); lam = 0 is checked separately
+_LOG_LAM_GRID = np.linspace(-12.0, 8.0, 41)
+
+
+# =============================================================================
+# Sufficient Statistics
+# =============================================================================
+
+class _NestedStats:
+    """
+    Sufficient statistics of (y, X) for nested random intercepts.
+
+    The lowest level keeps cluster sizes and means plus the pooled
+    within-cluster cross-products. Writing X'V^-1 X as within + between
+    parts avoids the cancellation that X'X - sum(w_j sx_j sx_j') suffers
+    for cluster-level predictors when lam * n_j is large. Higher levels
+    only need a sparse map from each unit to its parent.
+
+    Parameters
+    ----------
+    y, X : np.ndarray
+        Response and fixed-effects design
+    codes : np.ndarray
+        Lowest-level unit of every observation (0..G-1)
+    parents : list of np.ndarray
+        For each higher level, bottom-up, the parent of every unit one
+        level below
+    """
+
+    def __init__(
+        self,
+        y: np.ndarray,
+        X: np.ndarray,
+        codes: np.ndarray,
+        parents: Sequence[np.ndarray]
+    ):
+        self.n_obs, self.k_fe = X.shape
+        n_units = int(codes.max()) + 1
+        self.sizes = np.bincount(codes, minlength=n_units).astype(float)
+
+        # Cluster sums in one pass over sorted rows; y is the last column
+        U = np.column_stack([X, y])
+        order = np.argsort(codes, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(self.sizes[:-1])]).astype(np.intp)
+        self.means = np.add.reduceat(U[order], starts, axis=0) / self.sizes[:, None]
+
+        U_within = U - self.means[codes]
+        self.within = U_within.T @ U_within
+
+        # Unit -> parent aggregation matrices, bottom-up
+        self.aggregators = []
+        for parent in parents:
+            n_parents = int(parent.max()) + 1
+            self.aggregators.append(sparse.csr_matrix(
+                (np.ones(len(parent)), (parent, np.arange(len(parent)))),
+                shape=(n_parents, len(parent))
+            ))
+
+    @property
+    def n_levels(self) -> int:
+        return 1 + len(self.aggregators)
+
+    def sweep(self, lams: np.ndarray, values: Optional[np.ndarray] = None):
+        """
+        Apply V^-1 bottom-up (lams ordered bottom-up).
+
+        Returns Q = sigma2 * U'V^-1 U for U = [X, y], log|V / sigma2| and,
+        per level, a = 1'V_unit^-1 1 and s = U'V_unit^-1 1 (or the same
+        sums of `values` when given, one value per observation summed
+        into the lowest-level units beforehand).
+        """
+        lam = lams[0]
+        shrink = 1.0 / (1.0 + self.sizes * lam)
+        a = self.sizes * shrink
+        if values is None:
+            s = self.means * a[:, None]
+            Q = self.within + self.means.T @ s
+        else:
+            s = values * shrink
+            Q = None
+        logdet = float(np.sum(np.log1p(self.sizes * lam)))
+        per_level = [(a, s)]
+
+        for lam, aggregate in zip(lams[1:], self.aggregators):
+            a = aggregate @ a
+            s = aggregate @ s
+            if Q is not None:
+                Q = Q - s.T @ _scale_rows(s, lam / (1.0 + lam * a))
+            logdet += float(np.sum(np.log1p(lam * a)))
+            shrink = 1.0 / (1.0 + lam * a)
+            a = a * shrink
+            s = _scale_rows(s, shrink)
+            per_level.append((a, s))
+
+        return Q, logdet, per_level
+
+    def profile(self, lams: np.ndarray) -> Dict[str, Any]:
+        """Profiled REML log-likelihood and estimates (lams bottom-up)."""
+        Q, logdet, _ = self.sweep(np.asarray(lams, dtype=float))
+        return profile_from_cross_products(Q, logdet, self.n_obs)
+
+
+def profile_from_cross_products(Q: np.ndarray, logdet: float, n_obs: float) -> Dict[str, Any]:
+    """
+    Profiled REML log-likelihood from Q = sigma2 * [X y]'V^-1 [X y].
+
+    Parameters
+    ----------
+    Q : np.ndarray
+        (p+1) x (p+1) cross-products, response in the last row/column
+    logdet : float
+        log|V / sigma2|
+    n_obs : float
+        Number of observations
+
+    Returns
+    -------
+    dict
+        llf, beta, scale (sigma2) and A = sigma2 * X'V^-1 X
+    """
+    p = Q.shape[0] - 1
+    A, b, c = Q[:p, :p], Q[:p, p], Q[p, p]
+
+    chol = np.linalg.cholesky(A)
+    beta = np.linalg.solve(A, b)
+    df_resid = n_obs - p
+    scale = max(c - float(b @ beta), 0.0) / df_resid
+
+    llf = -0.5 * (
+        df_resid * (1.0 + np.log(2.0 * np.pi * scale))
+        + logdet
+        + 2.0 * np.sum(np.log(np.diag(chol)))
+    )
+    return {"llf": llf, "beta": beta, "scale": scale, "A": A}
+
+
+def _scale_rows(values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Multiply each row (or element) of values by the matching weight."""
+    return values * (weights[:, None] if values.ndim == 2 else weights)
+
+
+# =============================================================================
+# Results
+# =============================================================================
+
+class RandomInterceptResults:
+    """
+    REML fit of a (nested) random-intercept model.
+
+    Attribute names follow statsmodels' MixedLMResults. `params` holds the
+    fixed effects followed by the unscaled variance of each random
+    intercept (tau2 / sigma2); `bse` holds their standard errors. AIC and
+    BIC are NaN, as for statsmodels REML fits.
+
+    `random_effects` holds the lowest level (e.g. buurt); all levels are in
+    `random_effects_by_level`, and `variance_components` gives tau2 per
+    level, top-down.
+    """
+
+    method = "REML"
+
+    def __init__(
+        self,
+        y: pd.Series,
+        X: pd.DataFrame,
+        stats_: _NestedStats,
+        codes: np.ndarray,
+        level_names: List[str],
+        level_labels: List[np.ndarray],
+        lams: np.ndarray,
+        lam_cov: np.ndarray,
+        fit: Dict[str, Any],
+        n_evals: int,
+        converged: bool
+    ):
+        # Levels are stored top-down (e.g. gemeente, wijk, buurt)
+        self._y = y
+        self._X = X
+        self._stats = stats_
+        self._codes = codes
+        self.level_names = level_names
+        self.level_labels = level_labels
+
+        self.nobs = float(len(y))
+        self.k_fe = X.shape[1]
+        self.n_groups = len(level_labels[-1])
+        self.scale = fit["scale"]
+        self.llf = fit["llf"]
+        self.aic = np.nan
+        self.bic = np.nan
+        self.converged = converged
+        self.n_iter = n_evals
+        self.warm_started = False
+
+        names = list(X.columns)
+        if len(level_names) == 1:
+            self.group_name = "Group"
+            var_names = [GROUP_VAR_NAME]
+        else:
+            self.group_name = level_names[-1]
+            var_names = [f"{name} Var" for name in level_names]
+
+        self.fe_params = pd.Series(fit["beta"], index=names)
+        self.cov_re_unscaled = pd.DataFrame(
+            np.diag(lams), index=level_names, columns=level_names
+        )
+        if len(level_names) == 1:
+            self.cov_re_unscaled.index = self.cov_re_unscaled.columns = [self.group_name]
+        self.cov_re = self.cov_re_unscaled * self.scale
+        self.variance_components = pd.Series(lams * self.scale, index=level_names)
+
+        k = self.k_fe + len(lams)
+        cov = np.zeros((k, k))
+        cov[:self.k_fe, :self.k_fe] = self.scale * np.linalg.inv(fit["A"])
+        cov[self.k_fe:, self.k_fe:] = lam_cov
+        self._cov = pd.DataFrame(cov, index=names + var_names, columns=names + var_names)
+
+        self.params = pd.concat([self.fe_params, pd.Series(lams, index=var_names)])
+        self.bse = pd.Series(np.sqrt(np.diag(cov)), index=self.params.index)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.tvalues = self.params / self.bse
+        self.pvalues = pd.Series(
+            2 * stats.norm.sf(np.abs(self.tvalues)), index=self.params.index
+        )
+
+    def cov_params(self) -> pd.DataFrame:
+        """
+        Covariance matrix of params.
+
+        The fixed-effect block is sigma2 * (X'V^-1 X)^-1. The variance
+        ratios' block comes from the curvature of the profiled REML
+        likelihood; their covariance with the fixed effects is set to zero
+        (it is asymptotically zero for balanced designs and negligible in
+        practice).
+        """
+        return self._cov.copy()
+
+    @property
+    def exog(self) -> pd.DataFrame:
+        """Fixed-effects design matrix."""
+        return self._X
+
+    @property
+    def endog(self) -> pd.Series:
+        """Response."""
+        return self._y
+
+    @property
+    def groups(self) -> np.ndarray:
+        """Lowest-level group label of every observation."""
+        return self.level_labels[-1][self._codes]
+
+    def conf_int(self, alpha: float = 0.05) -> pd.DataFrame:
+        """Wald confidence intervals for params."""
+        z = stats.norm.ppf(1 - alpha / 2)
+        return pd.DataFrame({
+            0: self.params - z * self.bse,
+            1: self.params + z * self.bse
+        })
+
+    @cached_property
+    def _blups(self) -> Dict[str, Any]:
+        """
+        Posterior means of the random intercepts per level, top-down.
+
+        With r = y - Xb and the bottom-up sums from V^-1, the top level is
+        u_top = lam * s_top and each lower unit is
+        u = lam * (s - a * (sum of the predicted intercepts above it)).
+        """
+        lams = np.diag(self.cov_re_unscaled.to_numpy())[::-1]
+        marginal_resid = self._y.to_numpy() - self._X.to_numpy() @ self.fe_params.to_numpy()
+        sums = np.bincount(self._codes, weights=marginal_resid,
+                           minlength=len(self._stats.sizes))
+        _, _, per_level = self._stats.sweep(lams, values=sums)
+
+        # Walk top-down; `above` is the sum of predicted intercepts of ancestors
+        levels = []
+        above = np.zeros(len(per_level[-1][0]))
+        for level in range(len(per_level) - 1, -1, -1):
+            a, s = per_level[level]
+            u = lams[level] * (s - a * above)
+            levels.append(u)
+            above = above + u
+            if level > 0:
+                above = self._stats.aggregators[level - 1].T @ above
+        return {"levels": levels, "unit_total": above}
+
+    @cached_property
+    def random_effects_by_level(self) -> Dict[str, pd.Series]:
+        """Predicted random intercepts per level, indexed by unit label."""
+        return {
+            name: pd.Series(values, index=pd.Index(labels, name=name))
+            for name, labels, values in zip(
+                self.level_names, self.level_labels, self._blups["levels"]
+            )
+        }
+
+    @cached_property
+    def random_effects(self) -> Dict[Any, pd.Series]:
+        """Predicted lowest-level random intercept, keyed by group label."""
+        return {
+            label: pd.Series([value], index=[self.group_name])
+            for label, value in zip(self.level_labels[-1], self._blups["levels"][-1])
+        }
+
+    @cached_property
+    def fittedvalues(self) -> pd.Series:
+        """Fixed-effect prediction plus the predicted random intercepts."""
+        fitted = self._X.to_numpy() @ self.fe_params.to_numpy()
+        fitted = fitted + self._blups["unit_total"][self._codes]
+        return pd.Series(fitted, index=self._y.index)
+
+    @cached_property
+    def resid(self) -> pd.Series:
+        """Conditional residuals (y minus fittedvalues)."""
+        return self._y - self.fittedvalues
+
+
+# =============================================================================
+# Estimation
+# =============================================================================
+
+def maximize_ratio(cluster_stats: _NestedStats, start_ratio: Optional[float]):
+    """
+    Maximize the profiled REML log-likelihood over a single lam.
+
+    A coarse grid over log(lam) brackets the maximum, which is then refined
+    with bounded Brent search; lam = 0 (no clustering) is always checked.
+    A start value narrows the grid to its neighbourhood.
+
+    `cluster_stats` is anything with a profile([lam]) method returning the
+    dict of profile_from_cross_products (e.g. bootstrap replicates).
+
+    Returns
+    -------
+    tuple
+        (lams, fit, n_evals, converged)
+    """
+    n_evals = 0
+
+    def llf_at(log_lam: float) -> float:
+        nonlocal n_evals
+        n_evals += 1
+        return cluster_stats.profile([np.exp(log_lam)])["llf"]
+
+    grid = _LOG_LAM_GRID
+    if start_ratio is not None and start_ratio > 0:
+        center = np.log(start_ratio)
+        grid = np.linspace(center - 2.0, center + 2.0, 9)
+
+    values = np.array([llf_at(t) for t in grid])
+    best = int(np.argmax(values))
+    if grid is not _LOG_LAM_GRID and best in (0, len(grid) - 1):
+        # Optimum outside the warm-start window: search the full range
+        grid = _LOG_LAM_GRID
+        values = np.array([llf_at(t) for t in grid])
+        best = int(np.argmax(values))
+
+    lower = grid[max(best - 1, 0)]
+    upper = grid[min(best + 1, len(grid) - 1)]
+    refined = optimize.minimize_scalar(
+        lambda t: -llf_at(t),
+        bounds=(lower, upper),
+        method="bounded",
+        options={"xatol": 1e-10}
+    )
+    lams = np.array([np.exp(refined.x)])
+    fit = cluster_stats.profile(lams)
+
+    boundary = cluster_stats.profile([0.0])
+    n_evals += 1
+    if boundary["llf"] >= fit["llf"]:
+        lams, fit = np.zeros(1), boundary
+
+    return lams, fit, n_evals, bool(refined.success)
+
+
+def _maximize_nested(cluster_stats: _NestedStats, start: Optional[np.ndarray]):
+    """
+    Maximize the profiled REML log-likelihood over one lam per level.
+
+    L-BFGS-B over sqrt(lam) >= 0, so a level can shrink to zero variance.
+    """
+    n_evals = 0
+
+    def objective(theta: np.ndarray) -> float:
+        nonlocal n_evals
+        n_evals += 1
+        return -cluster_stats.profile(theta ** 2)["llf"]
+
+    if start is None:
+        start = np.full(cluster_stats.n_levels, 0.05)
+    theta0 = np.sqrt(np.maximum(np.asarray(start, dtype=float), 1e-4))
+
+    result = optimize.minimize(
+        objective,
+        theta0,
+        method="L-BFGS-B",
+        bounds=[(0.0, None)] * len(theta0),
+        options={"ftol": 1e-12, "gtol": 1e-8}
+    )
+    lams = result.x ** 2
+    return lams, cluster_stats.profile(lams), n_evals, bool(result.success)
+
+
+def _ratio_covariance(cluster_stats: _NestedStats, lams: np.ndarray) -> np.ndarray:
+    """Covariance of the lams from the curvature of the profiled likelihood."""
+    k = len(lams)
+    cov = np.full((k, k), np.nan)
+    interior = lams > 0
+    if not interior.any():
+        return cov
+
+    idx = np.flatnonzero(interior)
+    steps = 1e-4 * lams[idx]
+
+    def llf(shift: np.ndarray) -> float:
+        point = lams.copy()
+        point[idx] += shift
+        return cluster_stats.profile(point)["llf"]
+
+    m = len(idx)
+    hessian = np.zeros((m, m))
+    f0 = llf(np.zeros(m))
+    for i in range(m):
+        e_i = np.zeros(m)
+        e_i[i] = steps[i]
+        hessian[i, i] = (llf(e_i) - 2 * f0 + llf(-e_i)) / steps[i] ** 2
+        for j in range(i):
+            e_j = np.zeros(m)
+            e_j[j] = steps[j]
+            hessian[i, j] = hessian[j, i] = (
+                llf(e_i + e_j) - llf(e_i - e_j) - llf(-e_i + e_j) + llf(-e_i - e_j)
+            ) / (4 * steps[i] * steps[j])
+
+    try:
+        sub = np.linalg.inv(-hessian)
+    except np.linalg.LinAlgError:
+        return cov
+    if np.all(np.diag(sub) > 0):
+        cov[np.ix_(idx, idx)] = sub
+    return cov
+
+
+def _full_rank_columns(X: np.ndarray, tol: float = 1e-10) -> np.ndarray:
+    """
+    Positions of the columns of X that are not aliased with earlier ones.
+
+    A sequential Cholesky of the column-normalized X'X: a column is kept
+    if its residual against the kept columns before it is above tol, so
+    all-zero columns (e.g. a category that does not occur in the sample)
+    and later copies of earlier columns are dropped, as R's lm does.
+    """
+    norms = np.sqrt(np.einsum("ij,ij->j", X, X))
+    nonzero = np.flatnonzero(norms > 0)
+    Xn = X[:, nonzero] / norms[nonzero]
+    gram = Xn.T @ Xn
+
+    kept = []
+    L = np.zeros_like(gram)
+    for j in range(len(nonzero)):
+        row = gram[j, kept] if kept else np.empty(0)
+        # Solve against the kept block of L for the projection coefficients
+        coef = linalg.solve_triangular(L[np.ix_(kept, kept)], row, lower=True) if kept else row
+        residual = gram[j, j] - coef @ coef
+        if residual > tol:
+            L[j, kept] = coef
+            L[j, j] = np.sqrt(residual)
+            kept.append(j)
+    return nonzero[kept]
+
+
+def _design(formula: str, data: pd.DataFrame, levels: List[str]):
+    """
+    Patsy design with rows missing a model variable or level dropped.
+
+    Columns that are all zero or aliased with other columns in the
+    remaining rows are dropped, so the fixed effects stay identified.
+    """
+    import patsy
+
+    y, X = patsy.dmatrices(formula, data, return_type="dataframe", NA_action="drop")
+    y = y.iloc[:, 0]
+
+    keys = data.loc[X.index, levels]
+    keep = keys.notna().all(axis=1).to_numpy()
+    if not keep.all():
+        y, X, keys = y[keep], X[keep], keys[keep]
+
+    columns = _full_rank_columns(X.to_numpy(dtype=float))
+    if len(columns) < X.shape[1]:
+        X = X.iloc[:, columns]
+
+    if len(y) <= X.shape[1]:
+        raise ValueError(f"Not enough observations ({len(y)}) for {X.shape[1]} fixed effects")
+    return y, X, keys
+
+
+def fit_nested_random_intercepts(
+    formula: str,
+    data: pd.DataFrame,
+    levels: Sequence[str] = ("gemeente_id", "wijk_id", "buurt_id"),
+    start: Optional[Sequence[float]] = None
+) -> RandomInterceptResults:
+    """
+    Fit nested random intercepts by REML.
+
+    Equivalent to lme4's lmer(y ~ x + (1|gemeente/wijk/buurt), REML=TRUE):
+    units are identified by their full path, so a buurt code that appears
+    under two wijken counts as two buurten.
+
+    Parameters
+    ----------
+    formula : str
+        Patsy formula for the fixed part
+    data : pd.DataFrame
+        Model data; rows with missing model variables or levels are dropped
+    levels : sequence of str
+        Grouping columns, outermost first
+    start : sequence of float, optional
+        Starting values for tau2 / sigma2 per level (outermost first),
+        e.g. from a nested model
+
+    Returns
+    -------
+    RandomInterceptResults
+        Fitted model
+    """
+    levels = list(levels)
+    y, X, keys = _design(formula, data, levels)
+
+    # Unit codes per level, identified by the full path from the top
+    level_codes, level_labels = [], []
+    for depth in range(len(levels)):
+        path = keys[levels[:depth + 1]]
+        if depth == 0:
+            codes, labels = pd.factorize(path.iloc[:, 0], sort=True)
+        else:
+            codes, uniques = pd.factorize(
+                pd.MultiIndex.from_frame(path.astype(str)), sort=True
+            )
+            labels = uniques.get_level_values(-1)
+        level_codes.append(codes)
+        level_labels.append(np.asarray(labels))
+
+    # Parent of every unit one level down, bottom-up
+    parents = []
+    for depth in range(len(levels) - 1, 0, -1):
+        n_units = len(level_labels[depth])
+        parent = np.empty(n_units, dtype=np.intp)
+        parent[level_codes[depth]] = level_codes[depth - 1]
+        parents.append(parent)
+
+    cluster_stats = _NestedStats(
+        y.to_numpy(dtype=float), X.to_numpy(dtype=float), level_codes[-1], parents
+    )
+
+    bottom_up_start = None if start is None else np.asarray(start, dtype=float)[::-1]
+    if len(levels) == 1:
+        start_ratio = None if start is None else float(bottom_up_start[0])
+        lams, fit, n_evals, converged = maximize_ratio(cluster_stats, start_ratio)
+    else:
+        lams, fit, n_evals, converged = _maximize_nested(cluster_stats, bottom_up_start)
+
+    lam_cov = _ratio_covariance(cluster_stats, lams)
+
+    return RandomInterceptResults(
+        y=y,
+        X=X,
+        stats_=cluster_stats,
+        codes=level_codes[-1],
+        level_names=levels,
+        level_labels=level_labels,
+        lams=lams[::-1],
+        lam_cov=lam_cov[::-1, ::-1],
+        fit=fit,
+        n_evals=n_evals,
+        converged=converged
+    )
+
+
+def fit_random_intercept(
+    formula: str,
+    data: pd.DataFrame,
+    groups: str = "buurt_id",
+    start_ratio: Optional[float] = None
+) -> RandomInterceptResults:
+    """
+    Fit a linear random-intercept model by REML.
+
+    Equivalent to smf.mixedlm(formula, data, groups=groups).fit(reml=True),
+    but computed from cluster sufficient statistics.
+
+    Parameters
+    ----------
+    formula : str
+        Patsy formula for the fixed part
+    data : pd.DataFrame
+        Model data; rows with missing model variables are dropped
+    groups : str
+        Column identifying the clusters
+    start_ratio : float, optional
+        Starting value for tau2 / sigma2 (e.g. from a nested model)
+
+    Returns
+    -------
+    RandomInterceptResults
+        Fitted model
+    """
+    start = None if start_ratio is None else [start_ratio]
+    return fit_nested_random_intercepts(formula, data, [groups], start)
@@ -28,7 +28,8 @@ from config import TABLES_DIR, FIGURES_DIR
 
 def create_model_table(
     models,
-    output_path: Optional[Path] = None
+    output_path: Optional[Path] = None,
+    bootstrap=None
 ) -> str:
     """
     Create publication-ready regression table.
@@ -39,6 +40,9 @@ def create_model_table(
         Fitted multilevel models
     output_path : Path, optional
         Path to save HTML table
+    bootstrap : BootstrapResult, optional
+        Cluster bootstrap of the final model; adds percentile CIs below
+        its coefficients and a bootstrapped ICC row
 
     Returns
     -------
@@ -64,7 +68,7 @@ def create_model_table(
 
     # Remove intercept for cleaner display, keep it separate
     all_params.discard("Intercept")
-    all_params.discard("Group Var")
+    all_params = {p for p in all_params if not p.endswith(" Var")}
 
     # Sort parameters
     param_order = [
@@ -107,9 +111,15 @@ def create_model_table(
             else:
                 row.append("")
         rows.append(row)
+        if bootstrap is not None and param in bootstrap.summary.index:
+            rows.append(["", "", "", "", _format_boot_ci(bootstrap, param)])
 
     # Add model statistics
     rows.append(["---", "---", "---", "---", "---"])
+    if bootstrap is not None and "ICC" in bootstrap.summary.index:
+        icc = bootstrap.summary.loc["ICC", "estimate"]
+        rows.append(["ICC", f"{icc:.3f}", "", "", ""])
+        rows.append(["", _format_boot_ci(bootstrap, "ICC"), "", "", ""])
     rows.append(["N"] + [str(int(m.nobs)) for _, m in model_list])
     rows.append(["Groups"] + [str(len(m.random_effects)) for _, m in model_list])
     rows.append(["AIC"] + [f"{m.aic:.1f}" for _, m in model_list])
@@ -119,6 +129,11 @@ def create_model_table(
     headers = ["Variable"] + [name for name, _ in model_list]
     table_str = tabulate(rows, headers=headers, tablefmt="html")
 
+    boot_note = ""
+    if bootstrap is not None:
+        boot_note = (f" Brackets: {bootstrap.confidence_level:.0%} cluster (buurt) "
+                     f"bootstrap percentile intervals, {bootstrap.n_boot} replicates.")
+
     # Add styling
     html = f"""
     <html>
@@ -135,7 +150,7 @@ def create_model_table(
         <h2>Multilevel Regression Results</h2>
         <p><em>DV: Redistribution Preferences (0-100 scale)</em></p>
         {table_str}
-        <p><small>* p&lt;0.05, ** p&lt;0.01, *** p&lt;0.001. Standard errors in parentheses.</small></p>
+        <p><small>* p&lt;0.05, ** p&lt;0.01, *** p&lt;0.001. Standard errors in parentheses.{boot_note}</small></p>
     </body>
     </html>
     """
@@ -151,6 +166,12 @@ def create_model_table(
     return html
 
 
+def _format_boot_ci(bootstrap, term: str) -> str:
+    """Bootstrap percentile interval as "[lower, upper]"."""
+    row = bootstrap.summary.loc[term]
+    return f"[{row['ci_lower']:.3f}, {row['ci_upper']:.3f}]"
+
+
 def create_four_level_table(
     models,
     output_path: Optional[Path] = None
@@ -189,7 +210,7 @@ def create_four_level_table(
         all_params.update(model.params.index)
 
     all_params.discard("Intercept")
-    all_params.discard("Group Var")
+    all_params = {p for p in all_params if not p.endswith(" Var")}
 
     # Sort parameters - key predictors first
     param_order = [
@@ -244,6 +265,15 @@ def create_four_level_table(
     rows.append(["---"] * 6)
     rows.append(["N"] + [str(int(m.nobs)) for _, m in model_list])
     rows.append(["Groups (buurt)"] + [str(len(m.random_effects)) for _, m in model_list])
+
+    # Variance components of nested random intercepts (reml engine)
+    if all(hasattr(m, "variance_components") for _, m in model_list):
+        for level in model_list[0][1].variance_components.index:
+            name = level.replace("_id", "")
+            rows.append([f"Var ({name})"] + [
+                f"{m.variance_components.get(level, np.nan):.2f}" for _, m in model_list
+            ])
+        rows.append(["Var (residual)"] + [f"{m.scale:.2f}" for _, m in model_list])
     rows.append(["AIC"] + [f"{m.aic:.1f}" for _, m in model_list])
     rows.append(["BIC"] + [f"{m.bic:.1f}" for _, m in model_list])
 
@@ -0,0 +1,280 @@
+# =============================================================================
+# storage.py - Processed Data Storage Module
+# =============================================================================
+"""
+Functions for saving and loading the processed analysis dataset.
+
+The pipeline's primary artifact is a Parquet file. Parquet keeps column
+types, so geographic IDs keep their leading zeros and come back as
+categoricals, and readers can load only the columns they need. CSV is
+still supported for exports and older files.
+
+Functions:
+    save_analysis_data: Write analysis data (format chosen by file suffix)
+    load_analysis_data: Read analysis data, optionally a subset of columns
+Classes:
+    ParquetChunkWriter: Append DataFrame chunks to one Parquet file
+"""
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from typing import List, Optional
+
+import sys
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import PROCESSED_DATA_PATH
+from src.geoindex import parse_geo_codes, geo_codes_to_categorical
+
+
+# Geographic ID columns and their zero-padded code lengths
+GEO_ID_COLUMNS = {
+    "buurt_id": 8,
+    "wijk_id": 6,
+    "gemeente_id": 4,
+}
+
+
+# =============================================================================
+# Geographic ID Typing
+# =============================================================================
+
+def _type_geo_ids(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert geographic ID columns to categoricals of zero-padded strings.
+
+    IDs read back from CSV are often parsed as floats (e.g. 3630000.0 for
+    "03630000"); these are converted back to their padded string form.
+    """
+    df = data.copy(deep=False)
+
+    for col, id_length in GEO_ID_COLUMNS.items():
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values):
+            df[col] = geo_codes_to_categorical(parse_geo_codes(values), id_length)
+            continue
+
+        # Old outputs stringified missing IDs as "nan"
+        rendered = values.astype(str).str.strip()
+        valid = values.notna() & ~rendered.isin(["nan", "None", ""])
+        values = rendered.where(valid, np.nan)
+
+        df[col] = pd.Categorical(values)
+
+    return df
+
+
+# =============================================================================
+# Save / Load
+# =============================================================================
+
+def save_analysis_data(
+    data: pd.DataFrame,
+    path: Path = PROCESSED_DATA_PATH
+) -> Path:
+    """
+    Save the analysis dataset.
+
+    Files ending in .parquet are written as Parquet (geographic IDs stored
+    as dictionary-encoded categoricals); anything else is written as CSV.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data
+    path : Path
+        Output path
+
+    Returns
+    -------
+    Path
+        Path the data was written to
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("pyarrow not installed. Run: pip install pyarrow")
+
+        _type_geo_ids(data).to_parquet(path, index=False)
+    else:
+        data.to_csv(path, index=False)
+
+    print(f"  Saved {len(data)} rows, {len(data.columns)} columns to {path}")
+    return path
+
+
+def load_analysis_data(
+    path: Path = PROCESSED_DATA_PATH,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Load the analysis dataset.
+
+    Parameters
+    ----------
+    path : Path
+        Path to a .parquet or .csv file
+    columns : list, optional
+        Columns to load. Parquet reads only these columns from disk.
+
+    Returns
+    -------
+    pd.DataFrame
+        Analysis data with categorical geographic IDs
+    """
+    path = Path(path)
+
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("pyarrow not installed. Run: pip install pyarrow")
+
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        # Read geographic IDs as strings so leading zeros survive
+        geo_dtypes = {col: str for col in GEO_ID_COLUMNS}
+        df = pd.read_csv(path, usecols=columns, dtype=geo_dtypes)
+
+    return _type_geo_ids(df)
+
+
+# =============================================================================
+# Incremental Writing
+# =============================================================================
+
+class ParquetChunkWriter:
+    """
+    Append DataFrame chunks to one Parquet file, one row group per chunk.
+
+    Each column's type comes from the first chunk in which it has values
+    (chunks are held back until every column has had one); later chunks
+    are cast to that schema.
+    Geographic IDs are written as plain strings (chunks would otherwise
+    carry different category sets) and come back as categoricals from
+    load_analysis_data. The file is written under a temporary name and
+    moved into place on close, so an interrupted run leaves no partial file.
+
+    Parameters
+    ----------
+    path : Path
+        Output .parquet path
+
+    Examples
+    --------
+    >>> with ParquetChunkWriter(path) as writer:
+    ...     for chunk in chunks:
+    ...         writer.write(chunk)
+    """
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("pyarrow not installed. Run: pip install pyarrow")
+
+        self.path = Path(path)
+        self.n_rows = 0
+        self.n_chunks = 0
+        self._tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self._writer = None
+        self._schema = None
+        self._pending: List[pd.DataFrame] = []
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        """Append one chunk."""
+        df = chunk.copy(deep=False)
+        for col in GEO_ID_COLUMNS:
+            if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(object)
+        self.n_rows += len(df)
+        self.n_chunks += 1
+
+        if self._writer is not None:
+            self._write_table(df)
+            return
+
+        # Until every column has had a value, its type is unknown: keep the
+        # chunks and open the file once the schema is complete
+        self._pending.append(df)
+        schema = self._pending_schema(final=False)
+        if schema is not None:
+            self._open(schema)
+
+    def _pending_schema(self, final: bool):
+        """
+        Schema of the held chunks, each column typed by the first chunk in
+        which it has values; None while a column is still all missing
+        (unless final, where such columns become strings).
+        """
+        import pyarrow as pa
+
+        schema = pa.Schema.from_pandas(self._pending[0], preserve_index=False)
+        for i, field in enumerate(schema):
+            if not pa.types.is_null(field.type):
+                continue
+            for df in self._pending[1:]:
+                later = pa.Schema.from_pandas(df[[field.name]], preserve_index=False)[0]
+                if not pa.types.is_null(later.type):
+                    schema = schema.set(i, field.with_type(later.type))
+                    break
+            else:
+                if not final:
+                    return None
+                # Never had a value: the only such columns here are string codes
+                schema = schema.set(i, field.with_type(pa.string()))
+        return schema
+
+    def _open(self, schema) -> None:
+        """Open the file with the given schema and write the held chunks."""
+        import pyarrow.parquet as pq
+
+        self._schema = schema
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._writer = pq.ParquetWriter(self._tmp_path, schema)
+        for df in self._pending:
+            self._write_table(df)
+        self._pending = []
+
+    def _write_table(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self) -> Path:
+        """
+        Finish the file and move it into place.
+
+        Raises
+        ------
+        ValueError
+            If no chunks were written (no file is created)
+        """
+        if self._writer is None and self._pending:
+            self._open(self._pending_schema(final=True))
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._tmp_path.replace(self.path)
+        elif self.n_chunks == 0:
+            raise ValueError(f"No chunks were written to {self.path}")
+        return self.path
+
+    def __enter__(self) -> "ParquetChunkWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._tmp_path.unlink(missing_ok=True)
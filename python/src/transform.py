@@ -9,16 +9,25 @@ Functions:
     prepare_admin_by_level: Split admin data by geographic level
     recode_survey_variables: Create DVs and recode demographics
     standardize_context_vars: Z-score standardize neighborhood variables
+    decompose_between_within: Cluster means and within-cluster deviations
 """
 
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from config import SURVEY_YEAR
+from config import (
+    ADMIN_MMAP_DIR, STANDARDIZE_WEIGHTING, STANDARDIZE_CENTER_WITHIN,
+    DECOMPOSE_VARIABLES, DECOMPOSE_LEVELS
+)
+from src.recode import survey_recodes, compile_recode_plan
+from src.geoindex import (
+    GeoIndex, ClusterIndex, GEO_LEVELS, MISSING_CODE,
+    parse_geo_codes, geo_codes_to_categorical, cluster_index
+)
 
 
 # =============================================================================
@@ -42,29 +51,23 @@ def create_geo_ids(survey: pd.DataFrame) -> pd.DataFrame:
     Returns
     -------
     pd.DataFrame
-        Survey with buurt_id, wijk_id, gemeente_id columns
+        Survey with buurt_id, wijk_id, gemeente_id columns (categoricals
+        of zero-padded code strings)
     """
     print("Creating geographic IDs...")
 
     df = survey.copy()
 
-    # Ensure Buurtcode is string, pad to 8 digits
-    df["buurt_id"] = (
-        df["Buurtcode"]
-        .astype(str)
-        .str.replace(r"\.0$", "", regex=True)  # Remove decimal if present
-        .str.zfill(8)
-    )
-
-    # Handle missing values
-    df.loc[df["Buurtcode"].isna(), "buurt_id"] = np.nan
+    # CBS codes are nested integers: wijk = buurt // 100, gemeente =
+    # buurt // 10000. Derive all levels arithmetically and render only the
+    # distinct codes as zero-padded strings (categorical columns).
+    buurt_code = parse_geo_codes(df["Buurtcode"])
+    missing = buurt_code == MISSING_CODE
 
-    # Create wijk (6 digits) and gemeente (4 digits) codes
-    df["wijk_id"] = df["buurt_id"].str[:6]
-    df["gemeente_id"] = df["buurt_id"].str[:4]
-
-    # Set to NaN where buurt_id is NaN
-    df.loc[df["buurt_id"].isna(), ["wijk_id", "gemeente_id"]] = np.nan
+    for level, divisor in [("buurt", 1), ("wijk", 100), ("gemeente", 10000)]:
+        id_col, id_length, _ = GEO_LEVELS[level]
+        level_code = np.where(missing, MISSING_CODE, buurt_code // divisor)
+        df[id_col] = geo_codes_to_categorical(level_code, id_length)
 
     # Report
     n_valid = df["buurt_id"].notna().sum()
@@ -80,7 +83,44 @@ def create_geo_ids(survey: pd.DataFrame) -> pd.DataFrame:
 # Admin Data Preparation
 # =============================================================================
 
-def prepare_admin_by_level(admin: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+# CBS column names -> standard indicator names
+# Based on actual CBS 84286NED column names (2018+)
+ADMIN_COLUMN_RENAME = {
+    "AantalInwoners_5": "pop_total",
+    "k_65JaarOfOuder_12": "pop_over_65",
+    "WestersTotaal_17": "pop_west",
+    "NietWestersTotaal_18": "pop_nonwest",
+    "Bevolkingsdichtheid_33": "pop_dens",
+    "GemiddeldeWoningwaarde_35": "avg_home_value",
+    "GemiddeldInkomenPerInkomensontvanger_68": "avg_inc_recip",
+    "GemiddeldInkomenPerInwoner_69": "avg_inc_pers",
+    "k_40PersonenMetLaagsteInkomen_70": "perc_low40_pers",
+    "k_20PersonenMetHoogsteInkomen_71": "perc_high20_pers",
+    "k_40HuishoudensMetLaagsteInkomen_73": "perc_low40_hh",
+    "k_20HuishoudensMetHoogsteInkomen_74": "perc_high20_hh",
+    "HuishoudensMetEenLaagInkomen_75": "perc_low_inc_hh",
+    "HuishoudensTot110VanSociaalMinimum_77": "perc_soc_min_hh",
+}
+
+# Indicators kept in the level tables (common indicators)
+ADMIN_INDICATORS = [
+    "pop_total", "pop_over_65", "pop_west", "pop_nonwest", "pop_dens",
+    "avg_home_value", "avg_inc_recip", "avg_inc_pers",
+    "perc_low40_pers", "perc_high20_pers", "perc_low40_hh", "perc_high20_hh",
+    "perc_low_inc_hh", "perc_soc_min_hh"
+]
+
+# Level table prefixes
+LEVEL_PREFIXES = {"buurt": "b_", "wijk": "w_", "gemeente": "g_"}
+
+# Who counts once when standardizing context variables
+STANDARDIZE_WEIGHTINGS = ("respondent", "unit")
+
+
+def prepare_admin_by_level(
+    admin: pd.DataFrame,
+    mmap_dir: Optional[Path] = ADMIN_MMAP_DIR
+) -> Dict[str, pd.DataFrame]:
     """
     Split admin data into separate DataFrames by geographic level.
 
@@ -89,20 +129,26 @@ def prepare_admin_by_level(admin: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     - Wijk: w_*
     - Gemeente: g_*
 
+    The admin frame is not copied: the region codes are classified once
+    (BU/WK/GM prefix), the indicator columns are read into one float64
+    matrix, and each level table is a row selection of that matrix.
+
     Parameters
     ----------
     admin : pd.DataFrame
-        CBS administrative data with region_type and region_id columns
+        CBS administrative data with a region code column
+    mmap_dir : Path, optional
+        If given, each level's indicator matrix is written there as a .npy
+        file and the returned tables are backed by read-only memory maps
 
     Returns
     -------
     dict
         Dictionary with 'buurt', 'wijk', 'gemeente' DataFrames
+        (ID column as categorical of zero-padded codes, float64 indicators)
     """
     print("Preparing admin data by geographic level...")
 
-    admin = admin.copy()
-
     # Find the region code column
     region_col = None
     for col in ["region_code", "Codering_3", "WijkenEnBuurten"]:
@@ -113,86 +159,54 @@ def prepare_admin_by_level(admin: pd.DataFrame) -> Dict[str, pd.DataFrame]:
     if region_col is None:
         raise ValueError("Cannot identify region code column in admin data")
 
-    # Create region_type from the code prefix (BU/WK/GM)
-    admin["region_code_clean"] = admin[region_col].astype(str).str.strip()
-    admin["region_type"] = admin["region_code_clean"].str[:2].map({
-        "BU": "Buurt",
-        "WK": "Wijk",
-        "GM": "Gemeente"
-    })
-    admin["region_id"] = admin["region_code_clean"].str[2:].str.strip()
-
-    # Map CBS column names to standard names
-    # Based on actual CBS 84286NED column names (2018+)
-    col_rename = {
-        "AantalInwoners_5": "pop_total",
-        "k_65JaarOfOuder_12": "pop_over_65",
-        "WestersTotaal_17": "pop_west",
-        "NietWestersTotaal_18": "pop_nonwest",
-        "Bevolkingsdichtheid_33": "pop_dens",
-        "GemiddeldeWoningwaarde_35": "avg_home_value",
-        "GemiddeldInkomenPerInkomensontvanger_68": "avg_inc_recip",
-        "GemiddeldInkomenPerInwoner_69": "avg_inc_pers",
-        "k_40PersonenMetLaagsteInkomen_70": "perc_low40_pers",
-        "k_20PersonenMetHoogsteInkomen_71": "perc_high20_pers",
-        "k_40HuishoudensMetLaagsteInkomen_73": "perc_low40_hh",
-        "k_20HuishoudensMetHoogsteInkomen_74": "perc_high20_hh",
-        "HuishoudensMetEenLaagInkomen_75": "perc_low_inc_hh",
-        "HuishoudensTot110VanSociaalMinimum_77": "perc_soc_min_hh",
-    }
-
-    # Rename columns that exist
-    admin = admin.rename(columns={k: v for k, v in col_rename.items() if k in admin.columns})
-
-    # Variables to keep (common indicators)
-    indicator_vars = [
-        "pop_total", "pop_over_65", "pop_west", "pop_nonwest", "pop_dens",
-        "avg_home_value", "avg_inc_recip", "avg_inc_pers",
-        "perc_low40_pers", "perc_high20_pers", "perc_low40_hh", "perc_high20_hh",
-        "perc_low_inc_hh", "perc_soc_min_hh"
-    ]
-
-    # Filter to available indicators
-    available_indicators = [v for v in indicator_vars if v in admin.columns]
+    # Classify every row once: BU/WK/GM prefix and numeric code
+    region_code = admin[region_col].astype(str).str.strip()
+    prefix = region_code.str[:2].to_numpy(dtype=object)
+    codes = parse_geo_codes(region_code.str[2:].str.strip())
+
+    # Indicator columns under their standard names (raw names take
+    # precedence over already-renamed ones, as with DataFrame.rename)
+    source = {name: name for name in ADMIN_INDICATORS if name in admin.columns}
+    source.update({new: old for old, new in ADMIN_COLUMN_RENAME.items() if old in admin.columns})
+    available_indicators = [v for v in ADMIN_INDICATORS if v in source]
     print(f"  Available indicators: {len(available_indicators)}")
 
-    result = {}
+    values = np.column_stack([
+        pd.to_numeric(admin[source[v]], errors="coerce").to_numpy(dtype=float)
+        for v in available_indicators
+    ]) if available_indicators else np.empty((len(admin), 0))
 
-    for level, prefix, id_length in [
-        ("Buurt", "b_", 8),
-        ("Wijk", "w_", 6),
-        ("Gemeente", "g_", 4)
-    ]:
-        # Filter to this level
-        level_data = admin[admin["region_type"] == level].copy()
-
-        if len(level_data) == 0:
-            print(f"  Warning: No {level} data found")
-            result[level.lower()] = pd.DataFrame()
-            continue
+    if mmap_dir is not None:
+        mmap_dir = Path(mmap_dir)
+        mmap_dir.mkdir(parents=True, exist_ok=True)
+
+    result = {}
 
-        # Create ID column with correct length
-        id_col = f"{level.lower()}_id"
-        level_data[id_col] = level_data["region_id"].str.zfill(id_length)
+    for level, (id_col, id_length, level_prefix) in GEO_LEVELS.items():
+        rows = np.flatnonzero((prefix == level_prefix) & (codes != MISSING_CODE))
 
-        # Select and rename columns with prefix
-        cols_to_keep = [id_col]
-        rename_dict = {}
+        if len(rows) == 0:
+            print(f"  Warning: No {level.capitalize()} data found")
+            result[level] = pd.DataFrame()
+            continue
 
-        for var in available_indicators:
-            if var in level_data.columns:
-                new_name = f"{prefix}{var}"
-                rename_dict[var] = new_name
-                cols_to_keep.append(new_name)
+        # Drop duplicates (keep the first row of each unit)
+        _, first = np.unique(codes[rows], return_index=True)
+        rows = rows[np.sort(first)]
 
-        level_data = level_data.rename(columns=rename_dict)
-        level_data = level_data[[id_col] + list(rename_dict.values())]
+        # Indicators x units, so the frame below can use it without copying
+        block = np.ascontiguousarray(values[rows].T)
+        if mmap_dir is not None:
+            block_path = mmap_dir / f"admin_{level}.npy"
+            np.save(block_path, block)
+            block = np.load(block_path, mmap_mode="r")
 
-        # Drop duplicates
-        level_data = level_data.drop_duplicates(subset=[id_col])
+        columns = [f"{LEVEL_PREFIXES[level]}{v}" for v in available_indicators]
+        level_data = pd.DataFrame(block.T, columns=columns, copy=False)
+        level_data.insert(0, id_col, geo_codes_to_categorical(codes[rows], id_length))
 
-        result[level.lower()] = level_data
-        print(f"  {level}: {len(level_data)} units")
+        result[level] = level_data
+        print(f"  {level.capitalize()}: {len(level_data)} units")
 
     return result
 
@@ -201,7 +215,10 @@ def prepare_admin_by_level(admin: pd.DataFrame) -> Dict[str, pd.DataFrame]:
 # Variable Recoding
 # =============================================================================
 
-def recode_survey_variables(data: pd.DataFrame) -> pd.DataFrame:
+def recode_survey_variables(
+    data: pd.DataFrame,
+    stats: Optional[Dict[str, tuple]] = None
+) -> pd.DataFrame:
     """
     Recode survey variables and create analysis-ready measures.
 
@@ -211,10 +228,17 @@ def recode_survey_variables(data: pd.DataFrame) -> pd.DataFrame:
     - age, education: Standardized (z-score)
     - sex, employment_status, occupation: Categorical
 
+    The recodes are declared in config.py (SURVEY_CODEBOOK, SURVEY_MEASURES)
+    and run as one compiled plan on column arrays (see src/recode.py);
+    data is not copied or modified.
+
     Parameters
     ----------
     data : pd.DataFrame
-        Merged survey data
+        Merged survey data (or one chunk of it)
+    stats : dict, optional
+        Mean and SD for the z-scores, from RecodePlan.fit over all chunks;
+        by default they are computed from data
 
     Returns
     -------
@@ -223,131 +247,18 @@ def recode_survey_variables(data: pd.DataFrame) -> pd.DataFrame:
     """
     print("Recoding survey variables...")
 
-    df = data.copy()
-
-    # -------------------------------------------------------------------------
-    # Dependent Variables
-    # -------------------------------------------------------------------------
-
-    # Filter out missing/refused (coded as 8)
-    dv_vars = ["gov_int", "red_inc_diff", "union_pref"]
-    for var in dv_vars:
-        if var in df.columns:
-            df.loc[df[var] == 8, var] = np.nan
+    df = compile_recode_plan(survey_recodes(), tuple(data.columns)).apply(data, stats)
 
-    # DV_single: Primary DV - redistribution support (red_inc_diff)
-    # Scale from 1-7 to 0-100
-    if "red_inc_diff" in df.columns:
-        df["DV_single"] = (df["red_inc_diff"] - 1) / 6 * 100
+    if "DV_single" in df.columns:
         print(f"  DV_single: mean={df['DV_single'].mean():.1f}, "
               f"sd={df['DV_single'].std():.1f}")
-
-    # DV_2item: Average of gov_int and red_inc_diff
-    if "gov_int" in df.columns and "red_inc_diff" in df.columns:
-        df["DV_2item"] = df[["gov_int", "red_inc_diff"]].mean(axis=1)
-        df["DV_2item_scaled"] = (df["DV_2item"] - 1) / 6 * 100
-
-    # DV_3item: Average of all three items
-    if all(v in df.columns for v in dv_vars):
-        df["DV_3item"] = df[dv_vars].mean(axis=1)
-        df["DV_3item_scaled"] = (df["DV_3item"] - 1) / 6 * 100
-
-    # -------------------------------------------------------------------------
-    # Demographics
-    # -------------------------------------------------------------------------
-
-    # Sex (categorical)
-    if "sex" in df.columns:
-        df["sex"] = df["sex"].map({1: "Male", 2: "Female", 3: "Other"})
-        df["sex"] = pd.Categorical(df["sex"], categories=["Male", "Female", "Other"])
-
-    # Age (from birth year)
-    if "birth_year" in df.columns:
-        df["age_raw"] = SURVEY_YEAR - df["birth_year"]
-        # Standardize
-        df["age"] = (df["age_raw"] - df["age_raw"].mean()) / df["age_raw"].std()
-        print(f"  Age: mean={df['age_raw'].mean():.1f}, range={df['age_raw'].min():.0f}-{df['age_raw'].max():.0f}")
-
-    # Education (standardized years)
-    if "educyrs" in df.columns:
-        df["education"] = (df["educyrs"] - df["educyrs"].mean()) / df["educyrs"].std()
-
-    # -------------------------------------------------------------------------
-    # Employment
-    # -------------------------------------------------------------------------
-
-    if "work_status" in df.columns:
-        employment_map = {
-            1: "Employed",
-            2: "Self-employed",
-            3: "Unemployed",
-            4: "Student",
-            5: "Retired",
-            6: "Homemaker",
-            7: "Disabled",
-            8: "Other"
-        }
-        df["employment_status"] = df["work_status"].map(employment_map)
-        df["employment_status"] = pd.Categorical(df["employment_status"])
-
-    if "work_type" in df.columns:
-        occupation_map = {
-            1: "Modern professional",
-            2: "Clerical",
-            3: "Senior manager",
-            4: "Technical",
-            5: "Semi-routine manual",
-            6: "Routine manual",
-            7: "Middle manager",
-            8: "Traditional professional"
-        }
-        df["occupation"] = df["work_type"].map(occupation_map)
-        df["occupation"] = pd.Categorical(df["occupation"])
-
-    # -------------------------------------------------------------------------
-    # Migration background
-    # -------------------------------------------------------------------------
-
-    if "born_in_nl" in df.columns:
-        df["born_in_nl"] = df["born_in_nl"].astype(float)
-
-    # -------------------------------------------------------------------------
-    # Wealth/Income Proxy Variables (for H3 moderation test)
-    # -------------------------------------------------------------------------
-
-    # Create wealth index from asset ownership
-    wealth_vars = ["owns_home", "owns_property", "has_savings", "owns_stocks"]
-    available_wealth_vars = [v for v in wealth_vars if v in df.columns]
-
-    if available_wealth_vars:
-        # Sum of assets owned (0-4 scale)
-        df["wealth_index"] = df[available_wealth_vars].fillna(0).sum(axis=1)
-
-        # Binary: High wealth (2+ assets) vs. low wealth
-        df["high_wealth"] = (df["wealth_index"] >= 2).astype(int)
-
+    if "age_raw" in df.columns:
+        print(f"  Age: mean={df['age_raw'].mean():.1f}, "
+              f"range={df['age_raw'].min():.0f}-{df['age_raw'].max():.0f}")
+    if "wealth_index" in df.columns:
         print(f"  Wealth index: mean={df['wealth_index'].mean():.2f}, "
               f"high_wealth={df['high_wealth'].mean()*100:.1f}%")
-
-    # Create occupation class (socioeconomic status proxy)
-    if "occupation_class" in df.columns:
-        # Higher class = professional/managerial occupations (codes 1, 3, 7, 8)
-        higher_class_codes = [1.0, 3.0, 7.0, 8.0]
-        df["professional_class"] = df["occupation_class"].isin(higher_class_codes).astype(int)
-
-        # Detailed class ranking (1=highest, 8=lowest)
-        class_rank_map = {
-            3.0: 1,  # Senior management → highest
-            8.0: 2,  # Traditional professional
-            1.0: 3,  # Modern professional
-            7.0: 4,  # Middle management
-            4.0: 5,  # Technical
-            2.0: 6,  # Clerical
-            5.0: 7,  # Semi-routine
-            6.0: 8   # Routine → lowest
-        }
-        df["occupation_rank"] = df["occupation_class"].map(class_rank_map)
-
+    if "professional_class" in df.columns:
         print(f"  Professional class: {df['professional_class'].mean()*100:.1f}%")
 
     print(f"  Recoding complete. {len(df)} observations")
@@ -358,19 +269,54 @@ def recode_survey_variables(data: pd.DataFrame) -> pd.DataFrame:
 # Standardization
 # =============================================================================
 
+def _column_moments(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and SD (ddof=1) of every column, skipping NaN (as pandas does)."""
+    present = ~np.isnan(values)
+    count = present.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(present, values, 0.0).sum(axis=0) / count
+        squares = np.where(present, values - mean, 0.0) ** 2
+        sd = np.sqrt(squares.sum(axis=0) / (count - 1))
+    return mean, np.where(count > 1, sd, np.nan)
+
+
 def standardize_context_vars(
     data: pd.DataFrame,
-    prefixes: list = ["b_", "w_", "g_"]
+    prefixes: list = ["b_", "w_", "g_"],
+    weighting: str = STANDARDIZE_WEIGHTING,
+    level_tables: Optional[Dict[str, pd.DataFrame]] = None,
+    center_within: Optional[str] = STANDARDIZE_CENTER_WITHIN
 ) -> pd.DataFrame:
     """
     Z-score standardize neighborhood-level context variables.
 
+    All numeric columns with a matching prefix are standardized together,
+    one float block per geographic level. With weighting="respondent" the
+    mean and SD are taken over respondents, so a buurt counts as often as
+    it has respondents. With weighting="unit" every buurt, wijk or gemeente
+    counts once: the moments come from the level tables of
+    prepare_admin_by_level (all CBS units) or, for columns not in those
+    tables, from the distinct units in data.
+
+    With center_within, variables of levels below that level are centered
+    on the mean of their enclosing unit (e.g. a buurt's deviation from its
+    gemeente mean) and scaled by the SD of those deviations. Rows whose
+    enclosing unit is missing are left out of those moments and set to NaN.
+
     Parameters
     ----------
     data : pd.DataFrame
         Data with neighborhood variables
     prefixes : list
         Variable name prefixes to standardize (default: buurt, wijk, gemeente)
+    weighting : str
+        "respondent" or "unit"; columns whose prefix is not a geographic
+        level are always standardized over respondents
+    level_tables : dict, optional
+        Level name -> table from prepare_admin_by_level (used with "unit")
+    center_within : str, optional
+        Higher level ("wijk" or "gemeente") to center within;
+        None = center on the overall mean
 
     Returns
     -------
@@ -379,19 +325,179 @@ def standardize_context_vars(
     """
     print("Standardizing context variables...")
 
-    df = data.copy()
-
+    if weighting not in STANDARDIZE_WEIGHTINGS:
+        raise ValueError(f"weighting must be one of {STANDARDIZE_WEIGHTINGS}, got {weighting!r}")
+    if center_within is not None:
+        if center_within not in GEO_LEVELS:
+            raise ValueError(f"center_within must be one of {list(GEO_LEVELS)}, got {center_within!r}")
+        center_id = GEO_LEVELS[center_within][0]
+        if center_id not in data.columns:
+            raise ValueError(f"center_within={center_within!r} needs a {center_id} column")
+        row_groups = parse_geo_codes(data[center_id])
+    level_rank = {level: rank for rank, level in enumerate(GEO_LEVELS)}
+    level_tables = level_tables or {}
+
+    # Numeric columns with a matching prefix, grouped by geographic level
+    numeric = set(data.select_dtypes(include="number").columns)
+    by_level = {}
+    for col in data.columns:
+        if col in numeric and col.startswith(tuple(prefixes)):
+            level = next((lvl for lvl, p in LEVEL_PREFIXES.items() if col.startswith(p)), None)
+            by_level.setdefault(level, []).append(col)
+
+    df = data.copy(deep=False)
     standardized_count = 0
-    for col in df.columns:
-        if any(col.startswith(p) for p in prefixes):
-            if df[col].dtype in [np.float64, np.int64, float, int]:
-                mean_val = df[col].mean()
-                std_val = df[col].std()
-                if std_val > 0:
-                    df[col] = (df[col] - mean_val) / std_val
-                    standardized_count += 1
+
+    for level, columns in by_level.items():
+        values = data[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        centered = (center_within is not None and level is not None
+                    and level_rank[level] < level_rank[center_within])
+
+        # Reference rows for the moments: (column positions, values, groups)
+        if weighting == "respondent" or level is None or GEO_LEVELS[level][0] not in data.columns:
+            references = [(np.arange(len(columns)), values,
+                           row_groups if centered else None)]
+        else:
+            id_col, width, _ = GEO_LEVELS[level]
+            unit_codes = parse_geo_codes(data[id_col])
+            # One row per unit, taken from rows that know the enclosing unit
+            known = unit_codes != MISSING_CODE
+            if centered:
+                known &= row_groups != MISSING_CODE
+            rows = np.flatnonzero(known)
+            _, first = np.unique(unit_codes[rows], return_index=True)
+            first = rows[first]
+
+            table = level_tables.get(level)
+            in_table = np.array([table is not None and col in table.columns for col in columns])
+            references = []
+            if in_table.any():
+                table_cols = [col for col, t in zip(columns, in_table) if t]
+                table_groups = None
+                if centered:
+                    # Enclosing unit from the code (wijk = buurt // 100, ...)
+                    shift = 10 ** (width - GEO_LEVELS[center_within][1])
+                    table_codes = parse_geo_codes(table[id_col])
+                    table_groups = np.where(table_codes != MISSING_CODE,
+                                            table_codes // shift, MISSING_CODE)
+                references.append((
+                    np.flatnonzero(in_table),
+                    table[table_cols].to_numpy(dtype=np.float64, na_value=np.nan),
+                    table_groups,
+                ))
+            if (~in_table).any():
+                positions = np.flatnonzero(~in_table)
+                references.append((
+                    positions,
+                    values[np.ix_(first, positions)],
+                    row_groups[first] if centered else None,
+                ))
+
+        z = np.full(values.shape, np.nan, order="F")
+        for positions, reference, groups in references:
+            if groups is None:
+                mean, sd = _column_moments(reference)
+                deviations = values[:, positions] - mean
+            else:
+                # Rows without an enclosing unit (MISSING_CODE) are in no
+                # cluster: left out of the moments and NaN after centering
+                index = ClusterIndex(groups)
+                group_means = index.means(reference)
+                _, sd = _column_moments(reference - index.broadcast(group_means))
+                deviations = values[:, positions] - index.broadcast(
+                    group_means, index.position(row_groups)
+                )
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z[:, positions] = deviations / sd
+            z[:, positions[~(sd > 0)]] = np.nan
+            for j in positions[sd > 0]:
+                df[columns[j]] = z[:, j]
+                standardized_count += 1
 
     print(f"  Standardized {standardized_count} context variables")
+    if weighting != "respondent" or center_within is not None:
+        within = f", centered within {center_within}" if center_within else ""
+        print(f"  Weighting: {weighting}{within}")
+    return df
+
+
+# =============================================================================
+# Between/Within Decomposition
+# =============================================================================
+
+def decompose_between_within(
+    data: pd.DataFrame,
+    variables: List[str] = DECOMPOSE_VARIABLES,
+    levels: List[str] = DECOMPOSE_LEVELS
+) -> pd.DataFrame:
+    """
+    Split individual variables into cluster means and within-cluster deviations.
+
+    For every variable and cluster level this adds <var>_between (the mean
+    of the variable in the respondent's cluster) and <var>_within (the
+    respondent's deviation from it), for contextual-effect models. All
+    variables are handled as one float block: per level the rows are sorted
+    by cluster once (cached, see geoindex.cluster_index) and the means of
+    every column come from one sorted reduce.
+
+    Rows without a cluster get NaN in both columns; a missing value gets
+    NaN in <var>_within and is left out of its cluster's mean.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Analysis data (cluster means are taken over these rows, so pass
+        the analysis sample to match the models)
+    variables : list
+        Numeric individual-level variables
+    levels : list
+        Cluster ID columns (buurt_id, wijk_id, gemeente_id); with more than
+        one, columns are named <var>_between_<level> and <var>_within_<level>
+
+    Returns
+    -------
+    pd.DataFrame
+        Data with the between/within columns added
+    """
+    print("Decomposing variables into between- and within-cluster parts...")
+
+    id_levels = {id_col: level for level, (id_col, _, _) in GEO_LEVELS.items()}
+    unknown = [col for col in levels if col not in id_levels]
+    if unknown:
+        raise ValueError(f"levels must be geographic ID columns {list(id_levels)}, got {unknown}")
+    missing = [col for col in list(variables) + list(levels) if col not in data.columns]
+    if missing:
+        raise ValueError(f"Columns not in data: {missing}")
+    non_numeric = [v for v in variables if not pd.api.types.is_numeric_dtype(data[v])
+                   or pd.api.types.is_bool_dtype(data[v])]
+    if non_numeric:
+        raise ValueError(f"Variables must be numeric: {non_numeric}")
+
+    # Column-major, so each variable is contiguous for the sorted reduce
+    values = np.asfortranarray(
+        data[list(variables)].to_numpy(dtype=np.float64, na_value=np.nan)
+    )
+    k = len(variables)
+    names = []
+    # (rows x columns) output in column-major order, so the frame below
+    # holds it as one block without copying
+    parts = np.empty((len(data), 2 * k * len(levels)), order="F")
+
+    for i, id_col in enumerate(levels):
+        index = cluster_index(data[id_col])
+        between = parts[:, 2 * k * i:2 * k * (i + 1):2]
+        between[:] = index.broadcast(index.means(values))
+        np.subtract(values, between, out=parts[:, 2 * k * i + 1:2 * k * (i + 1):2])
+
+        suffix = f"_{id_levels[id_col]}" if len(levels) > 1 else ""
+        names += [f"{v}_{part}{suffix}" for v in variables for part in ["between", "within"]]
+        print(f"  {id_col}: {index.n_clusters} clusters, "
+              f"{index.sizes().mean() if index.n_clusters else 0:.1f} rows per cluster")
+
+    parts = pd.DataFrame(parts, columns=names, index=data.index, copy=False)
+    df = pd.concat([data.drop(columns=[n for n in names if n in data.columns]), parts], axis=1)
+
+    print(f"  Added {len(names)} columns for {len(variables)} variables")
     return df
 
 
@@ -476,57 +582,16 @@ def add_geographic_names_from_admin(
         print("  Warning: Cannot find region code column in admin data")
         return df
 
-    # Use region_code or create it
-    admin = admin_data.copy()
-    if 'region_code' not in admin.columns:
-        for col in ['Codering_3', 'WijkenEnBuurten']:
-            if col in admin.columns:
-                admin['region_code'] = admin[col].astype(str).str.strip()
-                break
-
-    # Create lookups for each level
-    name_col = 'WijkenEnBuurten' if 'WijkenEnBuurten' in admin.columns else None
-    gemeente_name_col = 'gemeente_name' if 'gemeente_name' in admin.columns else None
-
-    # Buurt names
-    if name_col:
-        buurt_rows = admin[admin['region_code'].str.startswith('BU', na=False)].copy()
-        if len(buurt_rows) > 0:
-            buurt_rows['buurt_id'] = buurt_rows['region_code'].str[2:].str.strip()
-            buurt_rows['buurt_name'] = buurt_rows[name_col].str.strip()
-            buurt_lookup = buurt_rows[['buurt_id', 'buurt_name']].drop_duplicates('buurt_id')
-
-            df['buurt_id'] = df['buurt_id'].astype(str).str.strip()
-            df = df.merge(buurt_lookup, on='buurt_id', how='left')
-            n_matched = df['buurt_name'].notna().sum()
-            print(f"  Buurt names: {n_matched}/{len(df)} matched")
-
-    # Wijk names
-    if name_col:
-        wijk_rows = admin[admin['region_code'].str.startswith('WK', na=False)].copy()
-        if len(wijk_rows) > 0:
-            wijk_rows['wijk_id'] = wijk_rows['region_code'].str[2:].str.strip()
-            wijk_rows['wijk_name'] = wijk_rows[name_col].str.strip()
-            wijk_lookup = wijk_rows[['wijk_id', 'wijk_name']].drop_duplicates('wijk_id')
-
-            df['wijk_id'] = df['wijk_id'].astype(str).str.strip()
-            df = df.merge(wijk_lookup, on='wijk_id', how='left')
-            n_matched = df['wijk_name'].notna().sum()
-            print(f"  Wijk names: {n_matched}/{len(df)} matched")
-
-    # Gemeente names (from buurt rows or gemeente rows)
-    if gemeente_name_col and 'gemeente_name' not in df.columns:
-        # Get from buurt rows (they have gemeente_name)
-        if name_col:
-            buurt_rows = admin[admin['region_code'].str.startswith('BU', na=False)].copy()
-            if len(buurt_rows) > 0 and gemeente_name_col in buurt_rows.columns:
-                buurt_rows['gemeente_id'] = buurt_rows['region_code'].str[2:6].str.strip()
-                buurt_rows['gemeente_name'] = buurt_rows[gemeente_name_col].str.strip()
-                gemeente_lookup = buurt_rows[['gemeente_id', 'gemeente_name']].drop_duplicates('gemeente_id')
-
-                df['gemeente_id'] = df['gemeente_id'].astype(str).str.strip()
-                df = df.merge(gemeente_lookup, on='gemeente_id', how='left')
-                n_matched = df['gemeente_name'].notna().sum()
-                print(f"  Gemeente names: {n_matched}/{len(df)} matched")
+    index = GeoIndex.from_admin_names(admin_data)
+
+    # Buurt and wijk names (from WijkenEnBuurten), gemeente names from the
+    # buurt rows' gemeente_name; each is one take over the encoded IDs
+    for level, name_col in [("buurt", "buurt_name"), ("wijk", "wijk_name"),
+                            ("gemeente", "gemeente_name")]:
+        if name_col not in index.columns[level] or name_col in df.columns:
+            continue
+        df[name_col] = index.attach(df, level, [name_col])[name_col]
+        n_matched = df[name_col].notna().sum()
+        print(f"  {level.capitalize()} names: {n_matched}/{len(df)} matched")
 
     return df
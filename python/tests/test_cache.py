@@ -0,0 +1,62 @@
+# =============================================================================
+# test_cache.py - Stage Cache Keys
+# =============================================================================
+"""
+Regression tests for src/cache.py: a stage's cache key must change when any
+src module the stage can run is edited, including modules imported inside
+function bodies and modules reached only through other src modules.
+
+Run from python/:  python -m pytest tests
+"""
+
+import importlib.util
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import src.cache
+from src.cache import StageCache, _stage_source
+
+
+SRC = Path(src.cache.__file__).parent
+
+
+def test_stage_source_follows_function_local_imports():
+    """merge imports storage and analyze imports reml inside functions."""
+    import src.analyze
+    import src.merge
+
+    assert (SRC / "storage.py").read_text() in _stage_source(src.merge)
+    assert (SRC / "reml.py").read_text() in _stage_source(src.analyze)
+
+
+def test_editing_indirect_dependency_changes_key(tmp_path, monkeypatch):
+    """stage -> helper (inside a function) -> deep: editing deep changes the key."""
+    package = tmp_path / "src"
+    package.mkdir()
+    (package / "stage.py").write_text(
+        "def stage():\n"
+        "    from src.helper import helper\n"
+        "    return helper()\n"
+    )
+    (package / "helper.py").write_text(
+        "from src.deep import deep\n"
+        "\n"
+        "def helper():\n"
+        "    return deep()\n"
+    )
+    deep = package / "deep.py"
+    deep.write_text("def deep():\n    return 1\n")
+    monkeypatch.setattr(src.cache, "SRC_DIR", package)
+
+    spec = importlib.util.spec_from_file_location("stage_under_test", package / "stage.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setitem(sys.modules, spec.name, module)
+
+    cache = StageCache(cache_dir=tmp_path / "cache", enabled=False)
+    before = cache._stage_key("stage", module.stage, (), {})
+    assert cache._stage_key("stage", module.stage, (), {}) == before
+
+    deep.write_text("def deep():\n    return 2  # changed\n")
+    assert cache._stage_key("stage", module.stage, (), {}) != before
@@ -0,0 +1,112 @@
+# =============================================================================
+# test_reml.py - Closed-Form REML Engine vs statsmodels MixedLM
+# =============================================================================
+"""
+Regression tests for src/reml.py: the closed-form estimator must agree with
+statsmodels MixedLM, including designs that are rank deficient in the
+sample (a categorical level that does not occur).
+
+Run from python/:  python -m pytest tests
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.reml import fit_random_intercept
+from src.analyze import ModelSpec, _fit_spec_engine
+
+
+STATUS_LEVELS = ["Employed", "Unemployed", "Retired", "Student", "Other"]
+
+
+def _model_data(n: int = 3000, n_clusters: int = 150, seed: int = 0) -> pd.DataFrame:
+    """Clustered data with a context predictor and a categorical control."""
+    rng = np.random.default_rng(seed)
+    cluster = rng.integers(0, n_clusters, n)
+    context = rng.normal(20, 5, n_clusters)
+    status = pd.Categorical(rng.choice(STATUS_LEVELS, n), categories=STATUS_LEVELS)
+    status_effect = pd.Series([0.0, 4.0, -2.0, 3.0, 1.0], index=STATUS_LEVELS)
+    y = (50 + 0.3 * context[cluster]
+         + status_effect[np.asarray(status)].to_numpy()
+         + rng.normal(0, 8, n_clusters)[cluster] + rng.normal(0, 15, n))
+    return pd.DataFrame({
+        "DV_single": y,
+        "b_perc_low40_hh": context[cluster],
+        "employment_status": status,
+        "buurt_id": pd.Categorical([f"{c:08d}" for c in cluster]),
+    })
+
+
+def _statsmodels_fit(formula: str, data: pd.DataFrame):
+    import statsmodels.formula.api as smf
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return smf.mixedlm(formula, data, groups="buurt_id").fit(reml=True)
+
+
+FORMULA = "DV_single ~ b_perc_low40_hh + C(employment_status)"
+
+
+def test_matches_statsmodels():
+    data = _model_data()
+    reml = fit_random_intercept(FORMULA, data)
+    reference = _statsmodels_fit(FORMULA, data)
+
+    fe = reference.fe_params.index
+    np.testing.assert_allclose(reml.fe_params[fe], reference.fe_params, rtol=1e-4, atol=1e-6)
+    np.testing.assert_allclose(reml.bse[fe], reference.bse_fe, rtol=1e-3)
+    np.testing.assert_allclose(reml.scale, reference.scale, rtol=1e-4)
+
+
+def test_missing_category_level():
+    # The sample lacks one employment level: its dummy column is all zero
+    data = _model_data()
+    subsample = data[data["employment_status"] != "Retired"]
+    assert "Retired" in subsample["employment_status"].cat.categories
+
+    reml = fit_random_intercept(FORMULA, subsample)
+    assert not any("Retired" in name for name in reml.fe_params.index)
+
+    # statsmodels on the same rows, without the empty level
+    reference = _statsmodels_fit(
+        FORMULA,
+        subsample.assign(employment_status=subsample["employment_status"]
+                         .cat.remove_unused_categories())
+    )
+    key = "b_perc_low40_hh"
+    assert reml.fe_params[key] == pytest.approx(reference.fe_params[key], rel=1e-4)
+    assert reml.bse[key] == pytest.approx(reference.bse[key], rel=1e-3)
+
+
+def test_aliased_column_dropped():
+    data = _model_data()
+    data["b_copy"] = 2 * data["b_perc_low40_hh"]
+    reml = fit_random_intercept("DV_single ~ b_perc_low40_hh + b_copy", data)
+    reference = _statsmodels_fit("DV_single ~ b_perc_low40_hh", data)
+
+    assert list(reml.fe_params.index) == ["Intercept", "b_perc_low40_hh"]
+    assert reml.fe_params["b_perc_low40_hh"] == pytest.approx(
+        reference.fe_params["b_perc_low40_hh"], rel=1e-4
+    )
+
+
+def test_engine_falls_back_to_statsmodels(monkeypatch):
+    import src.analyze
+
+    def singular(*args, **kwargs):
+        raise np.linalg.LinAlgError("Matrix is not positive definite")
+
+    monkeypatch.setattr(src.analyze, "fit_nested_random_intercepts", singular)
+    spec = ModelSpec(name="m1", formula="DV_single ~ b_perc_low40_hh")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        result = _fit_spec_engine(spec, _model_data(), np.array([[0.1]]), engine="reml")
+
+    assert type(result).__name__.startswith("MixedLMResults")
+    assert "b_perc_low40_hh" in result.params.index
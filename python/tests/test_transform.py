@@ -0,0 +1,54 @@
+# =============================================================================
+# test_transform.py - Context Variable Standardization
+# =============================================================================
+"""
+Regression tests for src/transform.py: centering within a higher level must
+not treat respondents without that level's code as one more unit.
+
+Run from python/:  python -m pytest tests
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.transform import standardize_context_vars
+
+
+def _data() -> pd.DataFrame:
+    """Two gemeenten with two buurten each, plus rows without a gemeente."""
+    return pd.DataFrame({
+        "gemeente_id": ["0001", "0001", None, None, "0002", "0002", None],
+        "buurt_id": ["00010001", "00010002", None, None,
+                     "00020001", "00020002", "00020002"],
+        "b_x": [1.0, 3.0, 100.0, 200.0, 5.0, 9.0, 9.0],
+    })
+
+
+@pytest.mark.parametrize("weighting", ["respondent", "unit"])
+def test_missing_centering_level_is_not_a_group(weighting):
+    data = _data()
+    result = standardize_context_vars(
+        data, prefixes=["b_"], weighting=weighting, center_within="gemeente"
+    )
+
+    # Deviations from the gemeente means are -1, 1, -2, 2
+    expected = np.array([-1.0, 1.0, -2.0, 2.0]) / np.std([-1.0, 1.0, -2.0, 2.0], ddof=1)
+    known = data["gemeente_id"].notna().to_numpy()
+    np.testing.assert_allclose(result["b_x"].to_numpy()[known], expected)
+    assert result["b_x"][~known].isna().all()
+
+
+def test_unit_reference_uses_rows_with_enclosing_unit():
+    """A buurt whose first respondent lacks the gemeente still counts once."""
+    data = _data().iloc[[0, 1, 6, 4, 5]].reset_index(drop=True)
+    result = standardize_context_vars(
+        data, prefixes=["b_"], weighting="unit", center_within="gemeente"
+    )
+
+    expected = np.array([-1.0, 1.0, -2.0, 2.0]) / np.std([-1.0, 1.0, -2.0, 2.0], ddof=1)
+    np.testing.assert_allclose(result["b_x"].to_numpy()[[0, 1, 3, 4]], expected)
+    assert np.isnan(result["b_x"][2])